@@ -0,0 +1,334 @@
+"""
+Sales and bookings rollups for the admin dashboard.
+
+Payment attempts and results are added to small rollup tables right after
+the transaction that records them commits: per day and order type, per artist
+and per exhibition, plus all-time totals. Keeping them out of the payment
+transaction means the hot totals rows are never locked while a payment is
+saved, and a failed rollup write cannot undo a payment. The dashboard reads
+only those tables, so a load costs the same however much order history exists.
+
+The rollups count every order in its current status: a status change adds the
+order to its new status and takes it off the old one. Completed and failed
+orders are bucketed by the day the order was placed and attempts by the day
+the payment was requested, so a rebuild gives the same numbers.
+
+Rollups for existing data (or after a manual correction) are rebuilt from the
+order, booking and transaction tables with:
+
+    python analytics.py --rebuild
+"""
+
+import os
+import sys
+import argparse
+from datetime import date, timedelta
+from decimal import Decimal
+from database import get_db_connection
+from mysql.connector import Error
+from logging_setup import get_logger
+
+logger = get_logger('analytics')
+
+ANALYTICS_MAX_DAYS = int(os.environ.get('ANALYTICS_MAX_DAYS', '366'))
+ANALYTICS_TOP_N = 10
+
+ORDER_TYPES = ("artwork", "exhibition")
+
+# order type -> (orders table, units sold per completed order, date placed)
+ORDER_TABLES = {
+    "artwork": ("artwork_orders", "1", "order_date"),
+    "exhibition": ("exhibition_bookings", "slots", "booking_date"),
+}
+
+ROLLUP_TABLES = ("sales_daily", "sales_totals", "sales_by_artist", "sales_by_exhibition")
+
+_COUNTER_UPDATES = """
+        attempts = attempts + VALUES(attempts),
+        completed = completed + VALUES(completed),
+        failed = failed + VALUES(failed),
+        units = units + VALUES(units),
+        revenue = revenue + VALUES(revenue)
+"""
+
+UPSERT_DAILY = f"""
+    INSERT INTO sales_daily (day, order_type, attempts, completed, failed, units, revenue)
+    VALUES (COALESCE(%s, CURDATE()), %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE {_COUNTER_UPDATES}
+"""
+
+UPSERT_TOTALS = f"""
+    INSERT INTO sales_totals (order_type, attempts, completed, failed, units, revenue)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE {_COUNTER_UPDATES}
+"""
+
+# Per-dimension rows are keyed by the artwork's artist / the booking's exhibition
+UPSERT_ARTIST = f"""
+    INSERT INTO sales_by_artist (artist, attempts, completed, failed, units, revenue, last_sale_at)
+    SELECT a.artist, %s, %s, %s, %s, %s, IF(%s > 0, NOW(), NULL)
+    FROM artwork_orders o
+    JOIN artworks a ON a.id = o.artwork_id
+    WHERE o.id = %s
+    ON DUPLICATE KEY UPDATE {_COUNTER_UPDATES},
+        last_sale_at = COALESCE(VALUES(last_sale_at), last_sale_at)
+"""
+
+UPSERT_EXHIBITION = f"""
+    INSERT INTO sales_by_exhibition (exhibition_id, attempts, completed, failed, units, revenue, last_sale_at)
+    SELECT b.exhibition_id, %s, %s, %s, %s, %s, IF(%s > 0, NOW(), NULL)
+    FROM exhibition_bookings b
+    WHERE b.id = %s
+    ON DUPLICATE KEY UPDATE {_COUNTER_UPDATES},
+        last_sale_at = COALESCE(VALUES(last_sale_at), last_sale_at)
+"""
+
+def _add(cursor, order_type, order_id, day=None, attempts=0, completed=0, failed=0, units=0, revenue=0):
+    counters = (attempts, completed, failed, units, revenue)
+    cursor.execute(UPSERT_DAILY, (day, order_type) + counters)
+    cursor.execute(UPSERT_TOTALS, (order_type,) + counters)
+    upsert = UPSERT_ARTIST if order_type == "artwork" else UPSERT_EXHIBITION
+    cursor.execute(upsert, counters + (completed, order_id))
+
+def _status_counters(payment_status, units, revenue):
+    """(completed, failed, units, revenue) an order counts for in this status"""
+    if payment_status == "completed":
+        return (1, 0, units, revenue)
+    if payment_status == "failed":
+        return (0, 1, 0, 0)
+    return (0, 0, 0, 0)
+
+def record_payment_attempt(connection, order_type, order_id):
+    """Count a payment attempt; call after the transaction that saves it has committed"""
+    if order_type not in ORDER_TABLES:
+        return
+    cursor = connection.cursor()
+    try:
+        _add(cursor, order_type, order_id, attempts=1)
+        connection.commit()
+    except Error as e:
+        # The payment is already saved; a missed count is corrected by --rebuild
+        connection.rollback()
+        logger.error("Error recording payment attempt for %s %s: %s", order_type, order_id, e)
+    finally:
+        cursor.close()
+
+def record_payment_result(connection, order_type, order_id, payment_status, previous_status):
+    """Move an order from its previous status to its new one in the rollups; call after the change has committed"""
+    if order_type not in ORDER_TABLES or payment_status == previous_status:
+        return
+    table, units, placed = ORDER_TABLES[order_type]
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT DATE({placed}), total_amount, {units} FROM {table} WHERE id = %s", (order_id,))
+        row = cursor.fetchone()
+        if not row:
+            return
+        day, total, sold = row
+        new = _status_counters(payment_status, sold, total)
+        old = _status_counters(previous_status, sold, total)
+        delta = [a - b for a, b in zip(new, old)]
+        if any(delta):
+            _add(cursor, order_type, order_id, day, 0, *delta)
+            connection.commit()
+    except Error as e:
+        connection.rollback()
+        logger.error("Error recording payment result for %s %s: %s", order_type, order_id, e)
+    finally:
+        cursor.close()
+
+def _number(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+def _counters(row, offset=0):
+    attempts, completed, failed, units, revenue = row[offset:offset + 5]
+    return {
+        "attempts": int(attempts),
+        "completed": int(completed),
+        "failed": int(failed),
+        "units": int(units),
+        "revenue": _number(revenue),
+        "conversion": round(completed / attempts, 4) if attempts else None
+    }
+
+def get_sales_analytics(days=30):
+    """Return totals, a daily series for the last `days` days and the top artists and exhibitions"""
+    days = max(1, min(days, ANALYTICS_MAX_DAYS))
+    since = date.today() - timedelta(days=days - 1)
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        totals = {order_type: _counters((0, 0, 0, 0, 0)) for order_type in ORDER_TYPES}
+        cursor.execute("SELECT order_type, attempts, completed, failed, units, revenue FROM sales_totals")
+        for row in cursor.fetchall():
+            totals[row[0]] = _counters(row, 1)
+
+        cursor.execute("""
+            SELECT day, order_type, attempts, completed, failed, units, revenue
+            FROM sales_daily
+            WHERE day >= %s
+            ORDER BY day, order_type
+        """, (since,))
+        daily = [dict(_counters(row, 2), date=row[0].isoformat(), orderType=row[1]) for row in cursor.fetchall()]
+
+        window = {order_type: [0, 0, 0, 0, 0] for order_type in ORDER_TYPES}
+        for day in daily:
+            sums = window.setdefault(day["orderType"], [0, 0, 0, 0, 0])
+            for i, key in enumerate(("attempts", "completed", "failed", "units", "revenue")):
+                sums[i] += day[key]
+
+        cursor.execute("""
+            SELECT artist, attempts, completed, failed, units, revenue
+            FROM sales_by_artist
+            ORDER BY revenue DESC
+            LIMIT %s
+        """, (ANALYTICS_TOP_N,))
+        top_artists = [dict(_counters(row, 1), artist=row[0]) for row in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT s.exhibition_id, e.title, s.attempts, s.completed, s.failed, s.units, s.revenue
+            FROM sales_by_exhibition s
+            LEFT JOIN exhibitions e ON e.id = s.exhibition_id
+            ORDER BY s.revenue DESC
+            LIMIT %s
+        """, (ANALYTICS_TOP_N,))
+        top_exhibitions = [
+            dict(_counters(row, 2), exhibitionId=str(row[0]), title=row[1])
+            for row in cursor.fetchall()
+        ]
+
+        return {
+            "days": days,
+            "since": since.isoformat(),
+            "totals": totals,
+            "window": {order_type: _counters(sums) for order_type, sums in window.items()},
+            "daily": daily,
+            "topArtists": top_artists,
+            "topExhibitions": top_exhibitions
+        }
+    except Exception as e:
+        logger.error("Error getting sales analytics: %s", e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+REBUILD_STATEMENTS = [
+    # Attempts come from payment transactions, by the day they were requested
+    """
+    INSERT INTO sales_daily (day, order_type, attempts)
+    SELECT DATE(transaction_date), order_type, COUNT(*)
+    FROM mpesa_transactions
+    WHERE order_type IN ('artwork', 'exhibition')
+    GROUP BY DATE(transaction_date), order_type
+    """,
+    # Results come from each order's current status, by the day it was placed
+    """
+    INSERT INTO sales_daily (day, order_type, completed, failed, units, revenue)
+    SELECT DATE(order_date), 'artwork', SUM(payment_status = 'completed'), SUM(payment_status = 'failed'),
+           SUM(payment_status = 'completed'), SUM(IF(payment_status = 'completed', total_amount, 0))
+    FROM artwork_orders
+    WHERE payment_status IN ('completed', 'failed')
+    GROUP BY DATE(order_date)
+    ON DUPLICATE KEY UPDATE completed = VALUES(completed), failed = VALUES(failed),
+        units = VALUES(units), revenue = VALUES(revenue)
+    """,
+    """
+    INSERT INTO sales_daily (day, order_type, completed, failed, units, revenue)
+    SELECT DATE(booking_date), 'exhibition', SUM(payment_status = 'completed'), SUM(payment_status = 'failed'),
+           SUM(IF(payment_status = 'completed', slots, 0)), SUM(IF(payment_status = 'completed', total_amount, 0))
+    FROM exhibition_bookings
+    WHERE payment_status IN ('completed', 'failed')
+    GROUP BY DATE(booking_date)
+    ON DUPLICATE KEY UPDATE completed = VALUES(completed), failed = VALUES(failed),
+        units = VALUES(units), revenue = VALUES(revenue)
+    """,
+    """
+    INSERT INTO sales_totals (order_type, attempts, completed, failed, units, revenue)
+    SELECT order_type, SUM(attempts), SUM(completed), SUM(failed), SUM(units), SUM(revenue)
+    FROM sales_daily
+    GROUP BY order_type
+    """,
+    """
+    INSERT INTO sales_by_artist (artist, attempts, completed, failed, units, revenue, last_sale_at)
+    SELECT a.artist,
+           COALESCE(SUM(t.attempts), 0), SUM(o.payment_status = 'completed'), SUM(o.payment_status = 'failed'),
+           SUM(o.payment_status = 'completed'),
+           SUM(IF(o.payment_status = 'completed', o.total_amount, 0)),
+           MAX(IF(o.payment_status = 'completed', o.order_date, NULL))
+    FROM artwork_orders o
+    JOIN artworks a ON a.id = o.artwork_id
+    LEFT JOIN (
+        SELECT order_id, COUNT(*) AS attempts
+        FROM mpesa_transactions
+        WHERE order_type = 'artwork'
+        GROUP BY order_id
+    ) t ON t.order_id = o.id
+    GROUP BY a.artist
+    """,
+    """
+    INSERT INTO sales_by_exhibition (exhibition_id, attempts, completed, failed, units, revenue, last_sale_at)
+    SELECT b.exhibition_id,
+           COALESCE(SUM(t.attempts), 0), SUM(b.payment_status = 'completed'), SUM(b.payment_status = 'failed'),
+           SUM(IF(b.payment_status = 'completed', b.slots, 0)),
+           SUM(IF(b.payment_status = 'completed', b.total_amount, 0)),
+           MAX(IF(b.payment_status = 'completed', b.booking_date, NULL))
+    FROM exhibition_bookings b
+    LEFT JOIN (
+        SELECT order_id, COUNT(*) AS attempts
+        FROM mpesa_transactions
+        WHERE order_type = 'exhibition'
+        GROUP BY order_id
+    ) t ON t.order_id = b.id
+    GROUP BY b.exhibition_id
+    """,
+]
+
+def rebuild_rollups():
+    """Recompute every rollup table from the order, booking and transaction tables"""
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        # DELETE rather than TRUNCATE so the rebuild is one transaction
+        for table in ROLLUP_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+        for statement in REBUILD_STATEMENTS:
+            cursor.execute(statement)
+        connection.commit()
+        cursor.execute("SELECT COUNT(*) FROM sales_daily")
+        return {"days": cursor.fetchone()[0]}
+    except Exception as e:
+        connection.rollback()
+        logger.error("Error rebuilding sales rollups: %s", e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the sales analytics rollups")
+    parser.add_argument('--rebuild', action='store_true', help="recompute all rollups from the order tables")
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.print_help()
+        return 1
+    result = rebuild_rollups()
+    if "error" in result:
+        print(f"Rebuild failed: {result['error']}")
+        return 1
+    print(f"Rebuilt sales rollups ({result['days']} day rows)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,6 +2,10 @@ from database import get_db_connection, dict_from_row, json_dumps
 from auth import verify_token
 import json
 from decimal import Decimal
+from logging_setup import get_logger
+from bulk_ops import patch_item
+
+logger = get_logger('artwork')
 
 def get_all_artworks():
     """Get all artworks from the database"""
@@ -14,7 +18,7 @@ def get_all_artworks():
     try:
         query = """
         SELECT id, title, artist, description, price, image_url, 
-               dimensions, medium, year, status
+               dimensions, medium, year, status, version
         FROM artworks
         ORDER BY created_at DESC
         """
@@ -40,7 +44,7 @@ def get_all_artworks():
         
         return {"artworks": artworks}
     except Exception as e:
-        print(f"Error getting artworks: {e}")
+        logger.error("Error getting artworks: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
@@ -58,7 +62,7 @@ def get_artwork(artwork_id):
     try:
         query = """
         SELECT id, title, artist, description, price, image_url, 
-               dimensions, medium, year, status
+               dimensions, medium, year, status, version
         FROM artworks
         WHERE id = %s
         """
@@ -82,7 +86,7 @@ def get_artwork(artwork_id):
         
         return artwork
     except Exception as e:
-        print(f"Error getting artwork: {e}")
+        logger.error("Error getting artwork: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
@@ -96,12 +100,10 @@ def get_artwork_by_id(artwork_id):
 
 def create_artwork(auth_header, artwork_data):
     """Create a new artwork (admin only)"""
-    print(f"\n--- Create Artwork Request ---")
-    print(f"Auth Header: {auth_header}")
-    print(f"Artwork Data: {artwork_data}")
+    logger.debug("Create artwork request")
     
     if not auth_header:
-        print("ERROR: Authentication header missing")
+        logger.error("Authentication header missing")
         return {"error": "Authentication required"}
     
     # Extract token from header - handle both formats
@@ -114,25 +116,23 @@ def create_artwork(auth_header, artwork_data):
             token = parts[1]
     
     if not token:
-        print("ERROR: No token found in header")
+        logger.error("No token found in header")
         return {"error": "Invalid authentication token"}
     
     # Verify token and check if user is admin
-    print(f"Verifying token: {token[:20]}...")
     payload = verify_token(token)
-    print(f"Token verification result: {payload}")
     
     # Check if verification returned an error
     if isinstance(payload, dict) and "error" in payload:
-        print(f"ERROR: Token verification failed: {payload['error']}")
+        logger.warning("Token verification failed: %s", payload['error'])
         return {"error": f"Authentication failed: {payload['error']}"}
     
     # Check if user is admin
     is_admin = payload.get("is_admin", False)
-    print(f"Is admin: {is_admin}")
+    logger.debug("Is admin: %s", is_admin)
     
     if not is_admin:
-        print("ERROR: Access denied - Not an admin user")
+        logger.warning("Access denied - Not an admin user")
         return {"error": "Unauthorized access: Admin privileges required"}
     
     # Continue with artwork creation
@@ -148,10 +148,10 @@ def create_artwork(auth_header, artwork_data):
             try:
                 artwork_data = json.loads(artwork_data)
             except json.JSONDecodeError as e:
-                print(f"ERROR: Failed to parse artwork data: {e}")
+                logger.error("Failed to parse artwork data: %s", e)
                 return {"error": f"Invalid artwork data format: {str(e)}"}
         
-        print(f"Inserting artwork data: {artwork_data}")
+        logger.debug("Inserting artwork: %s", artwork_data.get("title"))
         query = """
         INSERT INTO artworks (title, artist, description, price, image_url,
                            dimensions, medium, year, status)
@@ -172,18 +172,18 @@ def create_artwork(auth_header, artwork_data):
         
         # Return the newly created artwork
         new_artwork_id = cursor.lastrowid
-        print(f"Artwork created successfully with ID: {new_artwork_id}")
+        logger.debug("Artwork created successfully with ID: %s", new_artwork_id)
         return get_artwork(new_artwork_id)
     except Exception as e:
-        print(f"ERROR creating artwork: {e}")
+        logger.error("Error creating artwork: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
             cursor.close()
             connection.close()
 
-def update_artwork(auth_header, artwork_id, artwork_data):
-    """Update an existing artwork (admin only)"""
+def update_artwork(auth_header, artwork_id, artwork_data, expected_version=None):
+    """Update an existing artwork (admin only), optionally only if it is still at expected_version"""
     if not auth_header:
         return {"error": "Authentication required"}
     
@@ -192,12 +192,8 @@ def update_artwork(auth_header, artwork_id, artwork_data):
     if not token:
         return {"error": "Invalid authentication token"}
     
-    # Debug token verification
-    print(f"Verifying token for update_artwork: {token}")
-    
     # Verify token and check if user is admin
     payload = verify_token(token)
-    print(f"Token verification result: {payload}")
     
     # Check if verification returned an error
     if isinstance(payload, dict) and "error" in payload:
@@ -206,7 +202,7 @@ def update_artwork(auth_header, artwork_id, artwork_data):
     # Check if user is admin
     is_admin = payload.get("is_admin")
     if not is_admin:
-        print("Access denied: Not an admin user")
+        logger.warning("Access denied: Not an admin user")
         return {"error": "Unauthorized access: Not an admin"}
     
     connection = get_db_connection()
@@ -219,10 +215,11 @@ def update_artwork(auth_header, artwork_id, artwork_data):
         query = """
         UPDATE artworks
         SET title = %s, artist = %s, description = %s, price = %s,
-            image_url = %s, dimensions = %s, medium = %s, year = %s, status = %s
+            image_url = %s, dimensions = %s, medium = %s, year = %s, status = %s,
+            version = version + 1
         WHERE id = %s
         """
-        cursor.execute(query, (
+        params = [
             artwork_data.get("title"),
             artwork_data.get("artist"),
             artwork_data.get("description"),
@@ -233,23 +230,55 @@ def update_artwork(auth_header, artwork_id, artwork_data):
             artwork_data.get("year"),
             artwork_data.get("status"),
             artwork_id
-        ))
+        ]
+        # Optimistic concurrency: only update the version the client last read
+        if expected_version is not None:
+            query += " AND version = %s"
+            params.append(expected_version)
+        cursor.execute(query, tuple(params))
         connection.commit()
         
         # Check if artwork was found and updated
         if cursor.rowcount == 0:
+            cursor.execute("SELECT version FROM artworks WHERE id = %s", (artwork_id,))
+            row = cursor.fetchone()
+            if row:
+                return {"error": "Version conflict", "version": row[0]}
             return {"error": "Artwork not found"}
         
         # Return the updated artwork
         return get_artwork(artwork_id)
     except Exception as e:
-        print(f"Error updating artwork: {e}")
+        logger.error("Error updating artwork: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
             cursor.close()
             connection.close()
 
+def patch_artwork(auth_header, artwork_id, changes, expected_version=None):
+    """Update only the supplied fields of an artwork (admin only), optionally only if it is still at expected_version"""
+    if not auth_header:
+        return {"error": "Authentication required"}
+    
+    # Extract token from header
+    token = auth_header.split(" ")[1] if len(auth_header.split(" ")) > 1 else None
+    if not token:
+        return {"error": "Invalid authentication token"}
+    
+    # Verify token and check if user is admin
+    payload = verify_token(token)
+    if isinstance(payload, dict) and "error" in payload:
+        return {"error": f"Token verification failed: {payload['error']}"}
+    if not payload.get("is_admin"):
+        logger.warning("Access denied: Not an admin user")
+        return {"error": "Unauthorized access: Not an admin"}
+    
+    result = patch_item('artworks', artwork_id, changes, expected_version)
+    if result.get("error") == "Not found":
+        return {"error": "Artwork not found"}
+    return result
+
 def delete_artwork(auth_header, artwork_id):
     """Delete an artwork (admin only)"""
     if not auth_header:
@@ -260,12 +289,8 @@ def delete_artwork(auth_header, artwork_id):
     if not token:
         return {"error": "Invalid authentication token"}
     
-    # Debug token verification
-    print(f"Verifying token for delete_artwork: {token}")
-    
     # Verify token and check if user is admin
     payload = verify_token(token)
-    print(f"Token verification result: {payload}")
     
     # Check if verification returned an error
     if isinstance(payload, dict) and "error" in payload:
@@ -274,7 +299,7 @@ def delete_artwork(auth_header, artwork_id):
     # Check if user is admin
     is_admin = payload.get("is_admin")
     if not is_admin:
-        print("Access denied: Not an admin user")
+        logger.warning("Access denied: Not an admin user")
         return {"error": "Unauthorized access: Not an admin"}
     
     connection = get_db_connection()
@@ -294,7 +319,7 @@ def delete_artwork(auth_header, artwork_id):
         
         return {"success": True, "message": "Artwork deleted successfully"}
     except Exception as e:
-        print(f"Error deleting artwork: {e}")
+        logger.error("Error deleting artwork: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
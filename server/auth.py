@@ -4,6 +4,11 @@ from database import get_db_connection, json_dumps
 import jwt
 import datetime
 from decimal import Decimal
+from functools import wraps
+from flask import request, jsonify
+from logging_setup import get_logger
+
+logger = get_logger('auth')
 
 # Secret key for JWT token generation - replace with a secure random string
 SECRET_KEY = "your_secret_key_replace_this_with_a_secure_random_string"
@@ -47,7 +52,7 @@ def register_user(name, email, password, phone):
             "name": name
         }
     except Exception as e:
-        print(f"Error registering user: {e}")
+        logger.error("Error registering user: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
@@ -82,7 +87,7 @@ def login_user(email, password):
             "name": name
         }
     except Exception as e:
-        print(f"Error logging in user: {e}")
+        logger.error("Error logging in user: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
@@ -111,7 +116,7 @@ def login_admin(email, password):
         admin_id, name = admin
         token = generate_token(admin_id, name, True)
         
-        print(f"Admin login successful: {name}, admin_id: {admin_id}, token: {token[:20]}...")
+        logger.info("Admin login successful: admin_id %s", admin_id)
         
         return {
             "token": token,
@@ -119,7 +124,7 @@ def login_admin(email, password):
             "name": name
         }
     except Exception as e:
-        print(f"Error logging in admin: {e}")
+        logger.error("Error logging in admin: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
@@ -135,27 +140,69 @@ def generate_token(user_id, name, is_admin):
         "exp": datetime.datetime.utcnow() + datetime.timedelta(days=1)
     }
     
-    print(f"Generating token with payload: {payload}")
+    logger.debug("Generating token for subject %s (admin: %s)", payload["sub"], is_admin)
     token = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
     return token
 
 def verify_token(token):
     """Verify a JWT token"""
     try:
-        print(f"Verifying token: {token[:20]}...")
         payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        print(f"Token decoded successfully: {payload}")
+        logger.debug("Token decoded for subject %s", payload.get("sub"))
         return payload
     except jwt.ExpiredSignatureError:
-        print("Token verification failed: Token expired")
+        logger.info("Token verification failed: Token expired")
         return {"error": "Token expired"}
     except jwt.InvalidTokenError as e:
-        print(f"Token verification failed: Invalid token - {str(e)}")
+        logger.warning("Token verification failed: Invalid token - %s", str(e))
         return {"error": f"Invalid token: {str(e)}"}
     except Exception as e:
-        print(f"Unexpected error during token verification: {str(e)}")
+        logger.error("Unexpected error during token verification: %s", str(e))
         return {"error": f"Token verification error: {str(e)}"}
 
+def verify_auth_header(auth_header):
+    """Verify the bearer token in an Authorization header; return its payload or an error dict"""
+    if not auth_header:
+        return {"error": "Authentication required"}
+
+    token = auth_header.split(" ")[1] if len(auth_header.split(" ")) > 1 else None
+    if not token:
+        return {"error": "Invalid authentication token"}
+
+    payload = verify_token(token)
+    if isinstance(payload, dict) and "error" in payload:
+        return {"error": f"Token verification failed: {payload['error']}"}
+    return payload
+
+def get_user_id_from_token(auth_header):
+    """Return the user id in an Authorization header's token, or None if it is missing or invalid"""
+    payload = verify_auth_header(auth_header)
+    if "error" in payload:
+        return None
+    return payload.get("sub")
+
+def login_required(view):
+    """Reject requests to a Flask view without a valid bearer token"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        payload = verify_auth_header(request.headers.get('Authorization'))
+        if "error" in payload:
+            return jsonify({"status": "error", "message": payload["error"]}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def admin_required(view):
+    """Reject requests to a Flask view unless the bearer token is an admin's"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        payload = verify_auth_header(request.headers.get('Authorization'))
+        if "error" in payload:
+            return jsonify({"status": "error", "message": payload["error"]}), 401
+        if not payload.get("is_admin", False):
+            return jsonify({"status": "error", "message": "Unauthorized access: Admin privileges required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
 def create_admin(name, email, password):
     """Create a new admin (called from terminal/script)"""
     connection = get_db_connection()
@@ -185,7 +232,7 @@ def create_admin(name, email, password):
             "name": name
         }
     except Exception as e:
-        print(f"Error creating admin: {e}")
+        logger.error("Error creating admin: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
@@ -0,0 +1,208 @@
+"""
+As-you-type suggestions for the search box.
+
+Each field (title, artist, medium, location) keeps the distinct values in the
+catalogue with the number of items carrying them, and a sorted array of
+(folded text from each word start, value) pairs. A prefix maps to one
+contiguous slice of that array via bisect, so "mwa" finds "Ané Mwangi" as well as
+"Mwangaza". The most popular values in the slice (by item count) are returned.
+Rankings are memoised per prefix and dropped only for prefixes a change can
+reach; one- and two-letter prefixes, whose slices are the largest, are ranked
+up front and re-ranked by the sync thread after each change, so lookups stay
+well under a millisecond. The structure is kept current by catalogue_sync.
+"""
+
+import os
+import re
+import time
+import heapq
+import bisect
+import threading
+from catalogue_sync import subscribe
+from search import fold
+
+AUTOCOMPLETE_LIMIT = int(os.environ.get('AUTOCOMPLETE_LIMIT', '8'))
+AUTOCOMPLETE_MAX_LIMIT = 20
+# Memoised prefixes kept before the memo is cleared
+AUTOCOMPLETE_CACHE_SIZE = int(os.environ.get('AUTOCOMPLETE_CACHE_SIZE', '10000'))
+# Prefixes up to this length are always kept ranked
+WARM_PREFIX_LENGTH = 2
+
+# Field -> {kind: column} it is built from
+AUTOCOMPLETE_FIELDS = {
+    "title": {"artworks": "title", "exhibitions": "title"},
+    "artist": {"artworks": "artist"},
+    "medium": {"artworks": "medium"},
+    "location": {"exhibitions": "location"},
+}
+
+_WORD_RE = re.compile(r"[0-9a-z]+")
+
+AUTOCOMPLETE_STATS = {
+    "queries": 0,
+    "cache_hits": 0
+}
+
+def normalize(text):
+    """Fold text to lowercase ASCII words separated by single spaces"""
+    return " ".join(_WORD_RE.findall(fold(text))) if text else ""
+
+class PrefixIndex:
+    """Distinct values of one field, searchable by the prefix of any word"""
+
+    def __init__(self):
+        # normalized value -> [display value, item count]
+        self.values = {}
+        # sorted (text from a word start, normalized value)
+        self.entries = []
+        # prefix -> top AUTOCOMPLETE_MAX_LIMIT (display value, count)
+        self.memo = {}
+        # Short prefixes whose memo was invalidated and should be recomputed
+        self.stale = set()
+
+    def _keys(self, key):
+        starts = [0] + [match.start() + 1 for match in re.finditer(" ", key)]
+        return [(key[start:], key) for start in starts]
+
+    def _touch(self, key):
+        """Drop memoised results for every prefix that can reach key"""
+        for text, _ in self._keys(key):
+            for length in range(1, len(text) + 1):
+                prefix = text[:length]
+                if self.memo.pop(prefix, None) is not None and length <= WARM_PREFIX_LENGTH:
+                    self.stale.add(prefix)
+
+    def add(self, value, bulk=False):
+        key = normalize(value)
+        if not key:
+            return
+        entry = self.values.get(key)
+        if entry is not None:
+            entry[1] += 1
+        else:
+            self.values[key] = [value.strip(), 1]
+            if bulk:
+                # Sorted once by load()
+                self.entries.extend(self._keys(key))
+            else:
+                for item in self._keys(key):
+                    bisect.insort(self.entries, item)
+        if not bulk:
+            self._touch(key)
+
+    def remove(self, value):
+        key = normalize(value)
+        entry = self.values.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.values[key]
+            for item in self._keys(key):
+                index = bisect.bisect_left(self.entries, item)
+                if index < len(self.entries) and self.entries[index] == item:
+                    del self.entries[index]
+        self._touch(key)
+
+    def load(self):
+        """Finish a bulk load: sort the entries and precompute the short prefixes"""
+        self.entries.sort()
+        self.memo.clear()
+        self.stale = {text[:length] for text, _ in self.entries for length in range(1, WARM_PREFIX_LENGTH + 1)}
+        self.refresh()
+
+    def refresh(self):
+        """Recompute invalidated short prefixes, whose slices are the slowest to rank"""
+        for prefix in self.stale:
+            self.top(prefix, AUTOCOMPLETE_MAX_LIMIT)
+        self.stale.clear()
+
+    def top(self, prefix, limit):
+        """Return [(display value, count)] for the most popular values matching prefix"""
+        cached = self.memo.get(prefix)
+        if cached is not None:
+            AUTOCOMPLETE_STATS["cache_hits"] += 1
+            return cached[:limit]
+        start = bisect.bisect_left(self.entries, (prefix,))
+        end = bisect.bisect_left(self.entries, (prefix + "\uffff",))
+        keys = {key for _, key in self.entries[start:end]}
+        best = heapq.nsmallest(AUTOCOMPLETE_MAX_LIMIT, keys,
+                               key=lambda key: (-self.values[key][1], len(key), key))
+        result = [(self.values[key][0], self.values[key][1]) for key in best]
+        if len(self.memo) >= AUTOCOMPLETE_CACHE_SIZE:
+            self.memo = {key: value for key, value in self.memo.items() if len(key) <= WARM_PREFIX_LENGTH}
+        self.memo[prefix] = result
+        return result[:limit]
+
+_lock = threading.Lock()
+_indexes = {field: PrefixIndex() for field in AUTOCOMPLETE_FIELDS}
+# (kind, id) -> {field: value} as last indexed, so updates can remove the old value
+_items = {}
+
+def _columns(kind):
+    return [(field, columns[kind]) for field, columns in AUTOCOMPLETE_FIELDS.items() if kind in columns]
+
+def _on_catalogue_change(kind, rows, removed, initial):
+    """catalogue_sync subscriber: apply a delta to the prefix indexes"""
+    columns = _columns(kind)
+    with _lock:
+        if initial:
+            for key in [key for key in _items if key[0] == kind]:
+                for field, value in _items.pop(key).items():
+                    _indexes[field].remove(value)
+            for row in rows:
+                values = {field: row[column] for field, column in columns if row[column]}
+                for field, value in values.items():
+                    _indexes[field].add(value, bulk=True)
+                _items[(kind, row["id"])] = values
+            for field, _ in columns:
+                _indexes[field].load()
+            return
+
+        for row in rows:
+            key = (kind, row["id"])
+            previous = _items.pop(key, {})
+            values = {field: row[column] for field, column in columns if row[column]}
+            for field, value in previous.items():
+                if values.get(field) != value:
+                    _indexes[field].remove(value)
+            for field, value in values.items():
+                if previous.get(field) != value:
+                    _indexes[field].add(value)
+            _items[key] = values
+        for item_id in removed:
+            for field, value in _items.pop((kind, item_id), {}).items():
+                _indexes[field].remove(value)
+        for field, _ in columns:
+            _indexes[field].refresh()
+
+subscribe(_on_catalogue_change)
+
+def suggest(prefix, fields=None, limit=AUTOCOMPLETE_LIMIT):
+    """Return the most popular values starting with prefix, across the given fields"""
+    start = time.perf_counter()
+    prefix = normalize(prefix)
+    limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+    suggestions = []
+    if prefix:
+        with _lock:
+            for field in fields or AUTOCOMPLETE_FIELDS:
+                suggestions.extend(
+                    {"value": value, "field": field, "count": count}
+                    for value, count in _indexes[field].top(prefix, limit)
+                )
+        if len(suggestions) > limit:
+            suggestions = heapq.nsmallest(limit, suggestions, key=lambda item: (-item["count"], len(item["value"])))
+    AUTOCOMPLETE_STATS["queries"] += 1
+    return {
+        "query": prefix,
+        "suggestions": suggestions,
+        "tookMs": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+def get_autocomplete_stats():
+    """Return index sizes and query counters"""
+    stats = dict(AUTOCOMPLETE_STATS)
+    for field, index in _indexes.items():
+        stats[f"{field}_values"] = len(index.values)
+    return stats
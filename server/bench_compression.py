@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Benchmark gzip/brotli levels on catalogue JSON.
+
+Reports compressed size, ratio and CPU time per compression for each level so
+GZIP_LEVEL / BROTLI_QUALITY (and their CACHED_* counterparts) can be tuned.
+
+Usage:
+    python bench_compression.py [--artworks 2000] [--exhibitions 200] [--from-db] [--json]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+
+from compression import compress_body, brotli
+from database import json_dumps
+
+ARTISTS = ["Wangechi Mutu", "Cyrus Kabiru", "Michael Soi", "Peterson Kamwathi",
+           "Beatrice Wanjiku", "Kaafiya Mohamed", "Jak Katarikawe", "Elimo Njau"]
+MEDIUMS = ["Oil on canvas", "Acrylic on canvas", "Mixed media", "Bronze sculpture",
+           "Watercolour", "Charcoal on paper", "Digital print", "Batik"]
+LOCATIONS = ["Nairobi National Museum", "Circle Art Gallery, Nairobi",
+             "Nairobi Gallery", "Kuona Artists Collective", "Mombasa Fort Jesus"]
+WORDS = ("colour light market river city portrait heritage savanna memory "
+         "rhythm figure landscape community texture journey abstract").split()
+
+def synthetic_catalogue(artwork_count, exhibition_count, seed=42):
+    """Build catalogue payloads shaped like the list endpoints' responses"""
+    rng = random.Random(seed)
+    artworks = []
+    for i in range(artwork_count):
+        artworks.append({
+            "id": str(i + 1),
+            "title": " ".join(rng.choice(WORDS).title() for _ in range(3)),
+            "artist": rng.choice(ARTISTS),
+            "description": " ".join(rng.choice(WORDS) for _ in range(30)),
+            "price": float(rng.randrange(5000, 500000, 500)),
+            "imageUrl": f"/static/uploads/2024{rng.randrange(10**9):09d}_image.jpg",
+            "dimensions": f"{rng.randrange(20, 200)} x {rng.randrange(20, 200)} cm",
+            "medium": rng.choice(MEDIUMS),
+            "year": rng.randrange(1970, 2025),
+            "status": rng.choice(["available", "available", "sold"])
+        })
+    exhibitions = []
+    for i in range(exhibition_count):
+        exhibitions.append({
+            "id": str(i + 1),
+            "title": " ".join(rng.choice(WORDS).title() for _ in range(4)),
+            "description": " ".join(rng.choice(WORDS) for _ in range(60)),
+            "location": rng.choice(LOCATIONS),
+            "startDate": "2025-%02d-%02d" % (rng.randrange(1, 13), rng.randrange(1, 29)),
+            "endDate": "2025-%02d-%02d" % (rng.randrange(1, 13), rng.randrange(1, 29)),
+            "ticketPrice": float(rng.randrange(500, 3000, 100)),
+            "imageUrl": f"/static/uploads/2024{rng.randrange(10**9):09d}_image.jpg",
+            "totalSlots": 200,
+            "availableSlots": rng.randrange(0, 200),
+            "status": rng.choice(["upcoming", "ongoing", "past"])
+        })
+    return {"artworks": {"artworks": artworks}, "exhibitions": {"exhibitions": exhibitions}}
+
+def database_catalogue():
+    """Load the real catalogue payloads through the list functions"""
+    from artwork import get_all_artworks
+    from exhibition import get_all_exhibitions
+    return {"artworks": get_all_artworks(), "exhibitions": get_all_exhibitions()}
+
+def measure(body, encoding, level, min_seconds=0.2):
+    """Compress body repeatedly and return size and CPU milliseconds per call"""
+    kwargs = {"gzip_level": level} if encoding == 'gzip' else {"brotli_quality": level}
+    runs = 0
+    start = time.process_time()
+    while True:
+        compressed = compress_body(body, encoding, **kwargs)
+        runs += 1
+        elapsed = time.process_time() - start
+        if elapsed >= min_seconds:
+            break
+    return {
+        "encoding": encoding,
+        "level": level,
+        "bytes": len(compressed),
+        "ratio": round(len(body) / len(compressed), 2),
+        "cpu_ms": round(elapsed / runs * 1000, 3),
+        "mb_per_s": round(len(body) * runs / elapsed / 1e6, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--artworks', type=int, default=2000)
+    parser.add_argument('--exhibitions', type=int, default=200)
+    parser.add_argument('--from-db', action='store_true', help="Use the live catalogue instead of synthetic data")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    if args.from_db:
+        payloads = database_catalogue()
+    else:
+        payloads = synthetic_catalogue(args.artworks, args.exhibitions)
+
+    plans = [('gzip', level) for level in range(1, 10)]
+    if brotli is not None:
+        plans += [('br', quality) for quality in range(0, 12)]
+
+    results = {}
+    for kind, payload in payloads.items():
+        body = json_dumps(payload).encode('utf-8')
+        results[kind] = {
+            "raw_bytes": len(body),
+            "levels": [measure(body, encoding, level) for encoding, level in plans]
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    if brotli is None:
+        print("brotli module not installed; only gzip levels measured\n")
+    for kind, result in results.items():
+        print(f"{kind}: {result['raw_bytes']} bytes uncompressed")
+        print(f"  {'enc':<5}{'level':>6}{'bytes':>10}{'ratio':>8}{'cpu ms':>10}{'MB/s':>8}")
+        for row in result["levels"]:
+            print(f"  {row['encoding']:<5}{row['level']:>6}{row['bytes']:>10}"
+                  f"{row['ratio']:>8}{row['cpu_ms']:>10}{row['mb_per_s']:>8}")
+        print()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+Synthetic data generator for benchmarks.
+
+Seeds a (preferably dedicated) MySQL database with deterministic, realistic
+volumes of users, artworks, exhibitions, orders, bookings, contact messages
+and M-Pesa transactions using batched executemany() inserts.
+
+Usage:
+    python bench_data.py --database artgallery_bench --scale full
+    python bench_data.py --database artgallery_bench --artworks 20000 --messages 50000
+"""
+
+import sys
+import time
+import random
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+
+import mysql.connector
+import database
+import db_setup
+
+ARTISTS = ["Wangechi Mutu", "Cyrus Kabiru", "Michael Soi", "Peterson Kamwathi",
+           "Beatrice Wanjiku", "Kaafiya Mohamed", "Jak Katarikawe", "Elimo Njau",
+           "Ancent Soi", "Sane Wadu", "Joel Oswaggo", "Richard Onyango"]
+MEDIUMS = ["Oil on canvas", "Acrylic on canvas", "Mixed media", "Bronze sculpture",
+           "Watercolour", "Charcoal on paper", "Digital print", "Batik", "Soapstone"]
+LOCATIONS = ["Nairobi National Museum", "Circle Art Gallery, Nairobi",
+             "Nairobi Gallery", "Kuona Artists Collective", "Mombasa Fort Jesus",
+             "GoDown Arts Centre", "Kisumu Museum"]
+WORDS = ("colour light market river city portrait heritage savanna memory "
+         "rhythm figure landscape community texture journey abstract dawn "
+         "dusk harvest rain lake coast highland spirit mother child elder").split()
+
+# Preset volumes; individual flags override them
+SCALES = {
+    "small": {"users": 1000, "artworks": 5000, "exhibitions": 500, "orders": 5000,
+              "bookings": 20000, "messages": 20000, "transactions": 25000},
+    "full": {"users": 20000, "artworks": 100000, "exhibitions": 5000, "orders": 50000,
+             "bookings": 200000, "messages": 1000000, "transactions": 500000}
+}
+
+BATCH_SIZE = 5000
+BENCH_PASSWORD = "benchpass"
+BENCH_ADMIN_EMAIL = "bench-admin@example.com"
+
+def use_database(name):
+    """Point every connection helper at the given database"""
+    database.DB_CONFIG['database'] = name
+    db_setup.DB_CONFIG['database'] = name
+
+def create_database(name):
+    """Create the benchmark database and its tables if missing"""
+    connection = mysql.connector.connect(
+        host=db_setup.DB_CONFIG['host'],
+        user=db_setup.DB_CONFIG['user'],
+        password=db_setup.DB_CONFIG['password']
+    )
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{name}`")
+    cursor.close()
+    connection.close()
+    use_database(name)
+    db_setup.initialize_database()
+
+def _title(rng, words):
+    return " ".join(rng.choice(WORDS).title() for _ in range(words))
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _timestamp(rng, days_back=730):
+    return datetime(2026, 1, 1) - timedelta(seconds=rng.randrange(days_back * 86400))
+
+def _phone(rng):
+    return f"2547{rng.randrange(10**8):08d}"
+
+def user_rows(rng, count):
+    password = hashlib.sha256(BENCH_PASSWORD.encode()).hexdigest()
+    for i in range(count):
+        yield (f"User {i}", f"user{i}@example.com", password, _phone(rng))
+
+def artwork_rows(rng, count):
+    for i in range(count):
+        yield (
+            _title(rng, 3), rng.choice(ARTISTS), _text(rng, 30),
+            rng.randrange(5000, 500000, 500),
+            f"/static/uploads/bench_{i % 500}.jpg",
+            f"{rng.randrange(20, 200)} x {rng.randrange(20, 200)} cm",
+            rng.choice(MEDIUMS), rng.randrange(1970, 2026),
+            "sold" if rng.random() < 0.3 else "available"
+        )
+
+def exhibition_rows(rng, count):
+    for i in range(count):
+        start = _timestamp(rng).date()
+        end = start + timedelta(days=rng.randrange(3, 90))
+        total = rng.choice([50, 100, 200, 500])
+        status = "past" if end < datetime(2026, 1, 1).date() else "ongoing"
+        yield (
+            _title(rng, 4), _text(rng, 60), rng.choice(LOCATIONS), start, end,
+            rng.randrange(500, 3000, 100), f"/static/uploads/bench_ex_{i % 100}.jpg",
+            total, rng.randrange(0, total + 1), status
+        )
+
+def order_rows(rng, count, users, artworks):
+    for i in range(count):
+        user_id = rng.randrange(1, users + 1)
+        yield (
+            user_id, rng.randrange(1, artworks + 1), f"User {user_id - 1}",
+            f"user{user_id - 1}@example.com", _phone(rng), _text(rng, 6), "mpesa",
+            rng.choice(["pending", "completed", "completed", "failed"]),
+            _timestamp(rng), rng.randrange(5000, 500000, 500)
+        )
+
+def booking_rows(rng, count, users, exhibitions):
+    for i in range(count):
+        user_id = rng.randrange(1, users + 1)
+        slots = rng.randrange(1, 5)
+        yield (
+            user_id, rng.randrange(1, exhibitions + 1), f"User {user_id - 1}",
+            f"user{user_id - 1}@example.com", _phone(rng), slots, "mpesa",
+            rng.choice(["pending", "completed", "completed", "failed"]),
+            _timestamp(rng), slots * rng.randrange(500, 3000, 100)
+        )
+
+def message_rows(rng, count):
+    for i in range(count):
+        yield (
+            f"Visitor {i}", f"visitor{i}@example.com", _phone(rng), _text(rng, 40),
+            _timestamp(rng), rng.choice(["new", "read", "replied"]),
+            rng.choice(["contact_form", "chat"])
+        )
+
+def transaction_rows(rng, count, users, orders, bookings):
+    for i in range(count):
+        is_artwork = rng.random() < 0.3
+        yield (
+            f"ws_CO_{i:012d}", f"{rng.randrange(10**5)}-{i}",
+            "artwork" if is_artwork else "exhibition",
+            rng.randrange(1, (orders if is_artwork else bookings) + 1),
+            rng.randrange(1, users + 1), rng.randrange(500, 500000, 100), _phone(rng),
+            rng.choice(["0", "0", "1032", "1"]), "Synthetic transaction",
+            _timestamp(rng), rng.choice(["pending", "completed", "completed", "failed"])
+        )
+
+INSERTS = {
+    "users": "INSERT INTO users (name, email, password, phone) VALUES (%s, %s, %s, %s)",
+    "artworks": """INSERT INTO artworks (title, artist, description, price, image_url,
+                   dimensions, medium, year, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+    "exhibitions": """INSERT INTO exhibitions (title, description, location, start_date, end_date,
+                      ticket_price, image_url, total_slots, available_slots, status)
+                      VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+    "orders": """INSERT INTO artwork_orders (user_id, artwork_id, name, email, phone, delivery_address,
+                 payment_method, payment_status, order_date, total_amount)
+                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+    "bookings": """INSERT INTO exhibition_bookings (user_id, exhibition_id, name, email, phone, slots,
+                   payment_method, payment_status, booking_date, total_amount)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+    "messages": """INSERT INTO contact_messages (name, email, phone, message, date, status, source)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+    "transactions": """INSERT INTO mpesa_transactions (checkout_request_id, merchant_request_id,
+                       order_type, order_id, user_id, amount, phone_number, result_code,
+                       result_desc, transaction_date, status)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+}
+
+def insert_batches(connection, query, rows, batch_size=BATCH_SIZE):
+    """executemany() rows in batches, committing each batch; return the row count"""
+    cursor = connection.cursor()
+    total = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(query, batch)
+                connection.commit()
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(query, batch)
+            connection.commit()
+            total += len(batch)
+    finally:
+        cursor.close()
+    return total
+
+# Every table seed() empties, children before the tables they reference
+SEEDED_TABLES = (
+    "ticket_checkins", "exhibition_waitlist", "exhibition_time_slots", "item_popularity",
+    "sales_daily", "sales_totals", "sales_by_artist", "sales_by_exhibition",
+    "mpesa_transactions", "contact_messages", "exhibition_bookings", "artwork_orders",
+    "exhibitions", "artworks", "users", "admins"
+)
+
+def seed(volumes, seed_value=42, batch_size=BATCH_SIZE, truncate=True):
+    """Seed the current database with the given volumes; return per-table timings"""
+    rng = random.Random(seed_value)
+    connection = database.get_db_connection()
+    if connection is None:
+        raise RuntimeError("Database connection failed")
+
+    cursor = connection.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    if truncate:
+        for table in SEEDED_TABLES:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+    cursor.execute(
+        "INSERT INTO admins (name, email, password) VALUES (%s, %s, %s)",
+        ("Bench Admin", BENCH_ADMIN_EMAIL, hashlib.sha256(BENCH_PASSWORD.encode()).hexdigest())
+    )
+    connection.commit()
+    cursor.close()
+
+    plan = [
+        ("users", user_rows(rng, volumes["users"])),
+        ("artworks", artwork_rows(rng, volumes["artworks"])),
+        ("exhibitions", exhibition_rows(rng, volumes["exhibitions"])),
+        ("orders", order_rows(rng, volumes["orders"], volumes["users"], volumes["artworks"])),
+        ("bookings", booking_rows(rng, volumes["bookings"], volumes["users"], volumes["exhibitions"])),
+        ("messages", message_rows(rng, volumes["messages"])),
+        ("transactions", transaction_rows(rng, volumes["transactions"], volumes["users"],
+                                          max(volumes["orders"], 1), max(volumes["bookings"], 1)))
+    ]
+
+    timings = {}
+    try:
+        for table, rows in plan:
+            start = time.perf_counter()
+            count = insert_batches(connection, INSERTS[table], rows, batch_size)
+            elapsed = time.perf_counter() - start
+            timings[table] = {"rows": count, "seconds": round(elapsed, 2),
+                              "rows_per_second": round(count / elapsed) if elapsed else None}
+            print(f"  {table:<13}{count:>10} rows in {elapsed:7.2f}s")
+    finally:
+        cursor = connection.cursor()
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        cursor.close()
+        connection.close()
+    return timings
+
+def insert_disposable(kind, count, seed_value=0):
+    """Insert count extra artworks or exhibitions for delete benchmarks; return their ids"""
+    rows = artwork_rows if kind == "artworks" else exhibition_rows
+    connection = database.get_db_connection()
+    if connection is None:
+        raise RuntimeError("Database connection failed")
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {kind}")
+        last_id = cursor.fetchone()[0]
+        insert_batches(connection, INSERTS[kind], rows(random.Random(seed_value), count))
+        cursor.execute(f"SELECT id FROM {kind} WHERE id > %s ORDER BY id", (last_id,))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        connection.close()
+
+def volumes_from_args(args):
+    volumes = dict(SCALES[args.scale])
+    for key in volumes:
+        value = getattr(args, key)
+        if value is not None:
+            volumes[key] = value
+    return volumes
+
+def add_volume_arguments(parser):
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    for key in SCALES["small"]:
+        parser.add_argument(f'--{key}', type=int, help=f"Number of {key} (overrides --scale)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='artgallery_bench', help="Database to (re)create and seed")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    volumes = volumes_from_args(args)
+    print(f"Seeding '{args.database}' with {volumes}")
+    create_database(args.database)
+    seed(volumes, args.seed, args.batch_size)
+
+if __name__ == '__main__':
+    sys.exit(main())
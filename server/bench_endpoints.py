@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+"""
+Endpoint benchmark suite.
+
+Seeds a dedicated database (see bench_data.py), then drives every route in
+server.py through the Flask test client and through a real threaded WSGI
+server on 127.0.0.1, recording throughput and latency percentiles. Results are
+written as JSON named after the current git commit so runs can be compared.
+Routes that call external services (Safaricom) are skipped, and routes with no
+scenario are listed so coverage gaps stay visible. Everything runs offline.
+
+Usage:
+    python bench_endpoints.py --seed --scale small
+    python bench_endpoints.py --requests 500 --concurrency 8 --mode both
+    python bench_endpoints.py --compare bench_results/<old>.json bench_results/<new>.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import itertools
+import threading
+import subprocess
+import http.client
+from datetime import datetime
+from urllib.parse import quote
+
+import bench_data
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'bench_results')
+
+# Routes that reach external services and cannot run offline
+SKIPPED_ROUTES = {
+    '/mpesa/stk-push': "calls the Safaricom Daraja API"
+}
+
+class Scenario:
+    """One benchmarked request shape for a route"""
+
+    def __init__(self, rule, method, path, body=None, admin=False, name=None, headers=None, prepare=None):
+        self.rule = rule
+        self.method = method
+        self.path = path
+        self.body = body
+        self.admin = admin
+        self.name = name or f"{method} {rule}"
+        self.headers = headers or {}
+        # Called with the number of requests before a run; its result is ctx["prepared"]
+        self.prepare = prepare
+
+    def build(self, ctx):
+        path = self.path(ctx) if callable(self.path) else self.path
+        body = self.body(ctx) if callable(self.body) else self.body
+        return path, body
+
+# Query words for search and autocomplete scenarios
+SEARCH_WORDS = ["landscape", "portrait", "acrylic", "nairobi", "abstract", "soi", "harvest rain"]
+
+# Conditional writes that apply to whatever version is current
+ANY_VERSION = {"If-Match": "*"}
+
+def build_scenarios(volumes):
+    """Return the scenarios for the seeded volumes"""
+    artwork_ids = lambda ctx: ctx["rng"].randrange(1, volumes["artworks"] + 1)
+    exhibition_ids = lambda ctx: ctx["rng"].randrange(1, volumes["exhibitions"] + 1)
+    message_ids = lambda ctx: ctx["rng"].randrange(1, max(volumes["messages"], 1) + 1)
+    # Deletes remove rows inserted for the run, one per request, so each takes the real path
+    prepared_id = lambda ctx: ctx["prepared"][next(ctx["counter"])]
+    disposable = lambda kind: lambda count: bench_data.insert_disposable(kind, count)
+    artwork_body = {
+        "title": "Bench Piece", "artist": "Bench Artist", "description": "Benchmark artwork",
+        "price": 15000, "imageUrl": "/static/uploads/bench_1.jpg", "dimensions": "50 x 50 cm",
+        "medium": "Oil on canvas", "year": 2024, "status": "available"
+    }
+    exhibition_body = {
+        "title": "Bench Show", "description": "Benchmark exhibition", "location": "Nairobi Gallery",
+        "startDate": "2026-02-01", "endDate": "2026-03-01", "ticketPrice": 1000,
+        "imageUrl": "/static/uploads/bench_ex_1.jpg", "totalSlots": 100, "availableSlots": 100,
+        "status": "upcoming"
+    }
+    from tickets import sign_ticket
+    ticket_codes = lambda ctx: sign_ticket(ctx["rng"].randrange(1, volumes["bookings"] + 1),
+                                           exhibition_ids(ctx), 1, 2 ** 32 - 1)
+    return [
+        Scenario('/', 'GET', '/'),
+        Scenario('/metrics', 'GET', '/metrics'),
+        Scenario('/static/<path:path>', 'GET', '/static/placeholder.svg'),
+        Scenario('/register', 'POST', '/register',
+                 lambda ctx: {"name": "Bench", "email": f"bench{next(ctx['counter'])}-{os.getpid()}@example.com",
+                              "password": "benchpass", "phone": "254700000000"}),
+        Scenario('/login', 'POST', '/login',
+                 lambda ctx: {"email": f"user{ctx['rng'].randrange(volumes['users'])}@example.com",
+                              "password": bench_data.BENCH_PASSWORD}),
+        Scenario('/admin-login', 'POST', '/admin-login',
+                 {"email": bench_data.BENCH_ADMIN_EMAIL, "password": bench_data.BENCH_PASSWORD}),
+        Scenario('/api/artworks', 'GET', '/api/artworks'),
+        Scenario('/api/artworks', 'GET', '/api/artworks?sort=popular', name="GET /api/artworks?sort=popular"),
+        Scenario('/api/artworks/<int:artwork_id>/similar', 'GET',
+                 lambda ctx: f"/api/artworks/{artwork_ids(ctx)}/similar"),
+        Scenario('/api/search', 'GET', lambda ctx: f"/api/search?q={quote(ctx['rng'].choice(SEARCH_WORDS))}"),
+        Scenario('/api/autocomplete', 'GET', lambda ctx: f"/api/autocomplete?q={ctx['rng'].choice(SEARCH_WORDS)[:3]}"),
+        Scenario('/api/events', 'POST', '/api/events',
+                 lambda ctx: {"kind": "artwork", "id": artwork_ids(ctx), "event": "view"}),
+        Scenario('/api/artworks/<int:artwork_id>', 'GET', lambda ctx: f"/api/artworks/{artwork_ids(ctx)}"),
+        Scenario('/api/artworks', 'POST', '/api/artworks', artwork_body, admin=True),
+        Scenario('/api/artworks/<int:artwork_id>', 'PUT',
+                 lambda ctx: f"/api/artworks/{artwork_ids(ctx)}", artwork_body, admin=True, headers=ANY_VERSION),
+        Scenario('/api/artworks/<int:artwork_id>', 'PATCH',
+                 lambda ctx: f"/api/artworks/{artwork_ids(ctx)}",
+                 lambda ctx: {"price": ctx["rng"].randrange(5000, 500000, 500)}, admin=True, headers=ANY_VERSION),
+        Scenario('/api/artworks/<int:artwork_id>', 'DELETE',
+                 lambda ctx: f"/api/artworks/{prepared_id(ctx)}", admin=True, prepare=disposable("artworks")),
+        Scenario('/api/exhibitions', 'GET', '/api/exhibitions'),
+        Scenario('/api/exhibitions', 'GET', '/api/exhibitions?sort=popular', name="GET /api/exhibitions?sort=popular"),
+        Scenario('/api/exhibitions', 'GET', '/api/exhibitions?status=ongoing', name="GET /api/exhibitions?status=ongoing"),
+        Scenario('/api/exhibitions', 'GET', '/api/exhibitions?from=2025-06-01&to=2025-06-30',
+                 name="GET /api/exhibitions?from=&to="),
+        Scenario('/api/exhibitions/<int:exhibition_id>', 'GET',
+                 lambda ctx: f"/api/exhibitions/{exhibition_ids(ctx)}"),
+        Scenario('/api/exhibitions', 'POST', '/api/exhibitions', exhibition_body, admin=True),
+        Scenario('/api/exhibitions/<int:exhibition_id>', 'PUT',
+                 lambda ctx: f"/api/exhibitions/{exhibition_ids(ctx)}", exhibition_body, admin=True, headers=ANY_VERSION),
+        Scenario('/api/exhibitions/<int:exhibition_id>', 'PATCH',
+                 lambda ctx: f"/api/exhibitions/{exhibition_ids(ctx)}",
+                 lambda ctx: {"ticketPrice": ctx["rng"].randrange(500, 3000, 100)}, admin=True, headers=ANY_VERSION),
+        Scenario('/api/exhibitions/<int:exhibition_id>', 'DELETE',
+                 lambda ctx: f"/api/exhibitions/{prepared_id(ctx)}", admin=True, prepare=disposable("exhibitions")),
+        Scenario('/contact', 'POST', '/contact',
+                 {"name": "Bench", "email": "bench@example.com", "message": "Benchmark message"}),
+        Scenario('/messages', 'GET', '/messages', admin=True),
+        Scenario('/messages/<int:message_id>', 'PUT',
+                 lambda ctx: f"/messages/{message_ids(ctx)}", {"status": "read"}, admin=True),
+        Scenario('/api/admin/query-stats', 'GET', '/api/admin/query-stats', admin=True),
+        Scenario('/api/admin/analytics', 'GET', '/api/admin/analytics?days=30', admin=True),
+        Scenario('/orders/user/<int:user_id>', 'GET',
+                 lambda ctx: f"/orders/user/{ctx['rng'].randrange(1, volumes['users'] + 1)}", admin=True),
+        Scenario('/api/admin/exhibitions/<int:exhibition_id>/tickets.zip', 'GET',
+                 lambda ctx: f"/api/admin/exhibitions/{exhibition_ids(ctx)}/tickets.zip", admin=True),
+        Scenario('/api/tickets/check-in', 'POST', '/api/tickets/check-in',
+                 lambda ctx: {"code": ticket_codes(ctx)}, admin=True),
+        Scenario('/tickets', 'GET', '/tickets', admin=True),
+        Scenario('/api/exhibitions/<int:exhibition_id>/waitlist', 'POST',
+                 lambda ctx: f"/api/exhibitions/{exhibition_ids(ctx)}/waitlist", {"slots": 2}, admin=True),
+        Scenario('/api/exhibitions/<int:exhibition_id>/time-slots/calendar', 'GET',
+                 lambda ctx: f"/api/exhibitions/{exhibition_ids(ctx)}/time-slots/calendar?month=2025-06"),
+        Scenario('/api/exhibitions/<int:exhibition_id>/time-slots', 'GET',
+                 lambda ctx: f"/api/exhibitions/{exhibition_ids(ctx)}/time-slots?date=2025-06-14"),
+        Scenario('/tickets/generate/<int:booking_id>', 'GET',
+                 lambda ctx: f"/tickets/generate/{ctx['rng'].randrange(1, volumes['bookings'] + 1)}", admin=True),
+    ]
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(latencies, errors, elapsed):
+    latencies.sort()
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p90_ms": to_ms(percentile(latencies, 0.90)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+        "max_ms": to_ms(latencies[-1] if latencies else None),
+        "mean_ms": to_ms(sum(latencies) / len(latencies) if latencies else None)
+    }
+
+class TestClientTransport:
+    """Sends requests through Flask's in-process test client"""
+
+    name = "test_client"
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def send(self, method, path, body, headers):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        return response.status_code
+
+class WSGITransport:
+    """Sends requests over TCP to a threaded WSGI server running in this process"""
+
+    name = "wsgi"
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def send(self, method, path, body, headers):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        try:
+            payload = json.dumps(body) if body is not None else None
+            if payload is not None:
+                headers = dict(headers, **{"Content-Type": "application/json"})
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+
+def run_scenario(transport, scenario, requests, concurrency, admin_token, warmup):
+    """Run one scenario and return its latency summary"""
+    headers = dict(scenario.headers)
+    if scenario.admin:
+        headers["Authorization"] = f"Bearer {admin_token}"
+    counter = itertools.count()
+    prepared = scenario.prepare(requests + warmup) if scenario.prepare else None
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    remaining = [requests + warmup]
+
+    def worker(worker_id):
+        ctx = {"rng": random.Random(worker_id), "counter": counter, "prepared": prepared}
+        local = []
+        local_errors = 0
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+                measured = remaining[0] < requests
+            path, body = scenario.build(ctx)
+            start = time.perf_counter()
+            try:
+                status = transport.send(scenario.method, path, body, headers)
+            except Exception:
+                status = None
+            elapsed = time.perf_counter() - start
+            if measured:
+                # Only successful responses are timed; an error page is not the route's cost
+                if status is not None and 200 <= status < 300:
+                    local.append(elapsed)
+                else:
+                    local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - start)
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+def compare(old_path, new_path):
+    """Print per-scenario p50/p99/throughput changes between two result files"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    for mode, scenarios in new["results"].items():
+        print(f"\n[{mode}]")
+        print(f"  {'scenario':<48}{'p50 ms':>16}{'p99 ms':>16}{'rps':>16}")
+        for name, stats in scenarios.items():
+            before = old["results"].get(mode, {}).get(name)
+            def cell(key):
+                if not before or before.get(key) in (None, 0) or stats.get(key) is None:
+                    return f"{stats.get(key)}"
+                change = (stats[key] - before[key]) / before[key] * 100
+                return f"{stats[key]} ({change:+.0f}%)"
+            print(f"  {name:<48}{cell('p50_ms'):>16}{cell('p99_ms'):>16}{cell('throughput_rps'):>16}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='artgallery_bench')
+    parser.add_argument('--seed', action='store_true', help="(Re)seed the benchmark database first")
+    bench_data.add_volume_arguments(parser)
+    parser.add_argument('--requests', type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--mode', choices=['test_client', 'wsgi', 'both'], default='both')
+    parser.add_argument('--only', help="Run only scenarios whose name contains this text")
+    parser.add_argument('--output', help="Result file (default bench_results/<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    volumes = bench_data.volumes_from_args(args)
+    if args.seed:
+        print(f"Seeding '{args.database}' with {volumes}")
+        bench_data.create_database(args.database)
+        seed_timings = bench_data.seed(volumes)
+    else:
+        bench_data.use_database(args.database)
+        seed_timings = None
+
+    # Imported after the database switch so every module sees the benchmark database
+    from server import app
+    from auth import generate_token
+    admin_token = generate_token(1, "Bench Admin", True)
+
+    scenarios = build_scenarios(volumes)
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if args.only in scenario.name]
+
+    covered = {(scenario.rule, scenario.method) for scenario in scenarios}
+    uncovered = []
+    for rule in app.url_map.iter_rules():
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            if (rule.rule, method) not in covered and rule.rule not in SKIPPED_ROUTES:
+                uncovered.append(f"{method} {rule.rule}")
+
+    transports = []
+    if args.mode in ('test_client', 'both'):
+        transports.append(TestClientTransport(app))
+    if args.mode in ('wsgi', 'both'):
+        transports.append(WSGITransport(app))
+
+    results = {}
+    for transport in transports:
+        results[transport.name] = {}
+        print(f"\n[{transport.name}] {args.requests} requests x {len(scenarios)} scenarios, concurrency {args.concurrency}")
+        for scenario in scenarios:
+            stats = run_scenario(transport, scenario, args.requests, args.concurrency, admin_token, args.warmup)
+            results[transport.name][scenario.name] = stats
+            print(f"  {scenario.name:<48} {stats['throughput_rps']:>9} rps  p50 {stats['p50_ms']:>8} ms"
+                  f"  p99 {stats['p99_ms']:>8} ms  errors {stats['errors']}")
+        if hasattr(transport, 'close'):
+            transport.close()
+
+    commit = current_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "cpus": os.cpu_count(),
+        "database": args.database,
+        "volumes": volumes,
+        "seed_timings": seed_timings,
+        "settings": {"requests": args.requests, "warmup": args.warmup, "concurrency": args.concurrency},
+        "skipped": SKIPPED_ROUTES,
+        "uncovered": uncovered,
+        "results": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if uncovered:
+        print(f"\nRoutes without a scenario: {', '.join(uncovered)}")
+    print(f"\nResults written to {output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
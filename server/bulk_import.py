@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+"""
+Bulk importer for artworks and exhibitions.
+
+Streams CSV or JSON-lines input, validates each row, resolves images through the
+upload pipeline in parallel and inserts with batched executemany() calls. Each
+batch is committed as one transaction, and a database error stops the import
+with the earlier batches kept and the failing batch reported; with --atomic the
+whole file is one transaction and any database error rolls everything back.
+Invalid rows are reported and skipped rather than aborting the import.
+--dry-run validates rows and images without inserting or storing anything.
+
+Column names may be camelCase (as in the API) or snake_case. `imageUrl` may be
+an http(s) or /static/ URL (kept as is), a base64 data URI, or a path to a local
+image file, relative to the input file, which is copied into static/uploads.
+
+Usage:
+    python bulk_import.py artworks collection.csv
+    python bulk_import.py exhibitions season.jsonl --batch-size 2000 --atomic
+    python bulk_import.py artworks collection.csv --dry-run
+"""
+
+import io
+import os
+import csv
+import sys
+import json
+import time
+import base64
+import argparse
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from concurrent.futures import ThreadPoolExecutor
+
+from database import get_db_connection
+from uploads import process_image_upload, process_image_file, IMAGE_EXTENSIONS
+from logging_setup import get_logger
+
+logger = get_logger('bulk_import')
+
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+IMPORT_IMAGE_WORKERS = int(os.environ.get('IMPORT_IMAGE_WORKERS', '8'))
+# Directory local image paths may be read from when importing over HTTP;
+# unset disables local paths for uploads through the API
+IMPORT_IMAGE_ROOT = os.environ.get('IMPORT_IMAGE_ROOT')
+# Rejected rows listed in a report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+def _text(required=False, max_length=255):
+    def convert(value):
+        value = (value or "").strip() if isinstance(value, str) or value is None else str(value)
+        if not value:
+            if required:
+                raise ValueError("is required")
+            return None
+        if max_length and len(value) > max_length:
+            raise ValueError(f"is longer than {max_length} characters")
+        return value
+    return convert
+
+def _decimal(value):
+    try:
+        amount = Decimal(str(value).strip())
+    except (InvalidOperation, AttributeError):
+        raise ValueError("must be a number")
+    if amount < 0 or amount >= Decimal("100000000"):
+        raise ValueError("is out of range")
+    return amount
+
+def _integer(required=True):
+    def convert(value):
+        if value in (None, ""):
+            if required:
+                raise ValueError("is required")
+            return None
+        try:
+            return int(str(value).strip())
+        except ValueError:
+            raise ValueError("must be a whole number")
+    return convert
+
+def _date(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("must be a date (YYYY-MM-DD)")
+
+def _choice(options, default=None):
+    def convert(value):
+        value = (value or default or "").strip().lower() if isinstance(value, str) or value is None else value
+        if value not in options:
+            raise ValueError(f"must be one of {', '.join(options)}")
+        return value
+    return convert
+
+def _optional(convert):
+    def wrapped(value):
+        if value in (None, ""):
+            return None
+        return convert(value)
+    return wrapped
+
+# Insert column, API field name, converter - in INSERT order
+ARTWORK_FIELDS = [
+    ("title", "title", _text(required=True)),
+    ("artist", "artist", _text(required=True)),
+    ("description", "description", _text(max_length=None)),
+    ("price", "price", _decimal),
+    ("image_url", "imageUrl", _text(max_length=None)),
+    ("dimensions", "dimensions", _text(max_length=100)),
+    ("medium", "medium", _text(max_length=100)),
+    ("year", "year", _integer(required=False)),
+    ("status", "status", _choice(("available", "sold"), default="available")),
+]
+
+EXHIBITION_FIELDS = [
+    ("title", "title", _text(required=True)),
+    ("description", "description", _text(max_length=None)),
+    ("location", "location", _text(required=True)),
+    ("start_date", "startDate", _date),
+    ("end_date", "endDate", _date),
+    ("ticket_price", "ticketPrice", _decimal),
+    ("image_url", "imageUrl", _text(max_length=None)),
+    ("total_slots", "totalSlots", _integer()),
+    ("available_slots", "availableSlots", _optional(_integer())),
+    ("status", "status", _choice(("upcoming", "ongoing", "past"), default="upcoming")),
+]
+
+IMPORT_KINDS = {
+    "artworks": ("artworks", ARTWORK_FIELDS),
+    "exhibitions": ("exhibitions", EXHIBITION_FIELDS),
+}
+
+def read_rows(stream, file_format):
+    """Yield dict rows from a text stream of CSV or JSON lines"""
+    if file_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+    elif file_format == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield ValueError(f"invalid JSON: {e}")
+                continue
+            yield row if isinstance(row, dict) else ValueError("each line must be a JSON object")
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+def detect_format(filename, default='csv'):
+    """Guess the input format from a file name"""
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+def validate_row(kind, row):
+    """Return (field values dict, None) or (None, error message) for one input row"""
+    if isinstance(row, Exception):
+        return None, str(row)
+    values = {}
+    for column, field, convert in IMPORT_KINDS[kind][1]:
+        raw = row.get(field, row.get(column))
+        try:
+            values[column] = convert(raw)
+        except ValueError as e:
+            return None, f"{field} {e}"
+
+    if kind == 'exhibitions':
+        if values["end_date"] < values["start_date"]:
+            return None, "endDate is before startDate"
+        if values["total_slots"] < 0:
+            return None, "totalSlots must not be negative"
+        if values["available_slots"] is None:
+            values["available_slots"] = values["total_slots"]
+        elif not 0 <= values["available_slots"] <= values["total_slots"]:
+            return None, "availableSlots must be between 0 and totalSlots"
+    return values, None
+
+def resolve_image(image_url, base_dir, image_root=None, store=True):
+    """Return the stored URL for an imageUrl value, or raise ValueError
+
+    With store=False (dry runs) the image is only checked and the value is
+    returned unchanged, so nothing is written to static/uploads.
+    """
+    if not image_url or image_url.startswith(('http://', 'https://', '/static/')):
+        return image_url
+    if image_url.startswith('data:'):
+        if not store:
+            try:
+                base64.b64decode(image_url.split(',', 1)[1])
+            except (IndexError, ValueError):
+                raise ValueError("imageUrl is not a valid base64 image")
+            return image_url
+        stored = process_image_upload(image_url)
+        if stored is None:
+            raise ValueError("imageUrl is not a valid base64 image")
+        return stored
+
+    if base_dir is None:
+        raise ValueError("imageUrl local paths are not allowed for this import")
+    path = os.path.realpath(os.path.join(base_dir, image_url))
+    if image_root is not None and os.path.commonpath([path, os.path.realpath(image_root)]) != os.path.realpath(image_root):
+        raise ValueError("imageUrl is outside the import image directory")
+    if not os.path.isfile(path):
+        raise ValueError(f"imageUrl file not found: {image_url}")
+    if not store:
+        if os.path.splitext(path)[1].lower() not in IMAGE_EXTENSIONS:
+            raise ValueError("imageUrl file could not be stored")
+        return image_url
+    stored = process_image_file(path)
+    if stored is None:
+        raise ValueError("imageUrl file could not be stored")
+    return stored
+
+class ImportReport:
+    """Counters and rejected rows for one import run"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.rolled_back = False
+        # Set when a non-atomic import stops on a database error after earlier batches committed
+        self.failed_batch = None
+        self.error = None
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": line, "error": message})
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "rolledBack": self.rolled_back,
+            "failedBatch": self.failed_batch,
+            "error": self.error,
+            "seconds": round(self.seconds, 3),
+            "rowsPerSecond": round(self.rows / self.seconds) if self.seconds else None,
+            "errors": self.errors
+        }
+
+def _resolve_batch(pool, batch, base_dir, image_root, report, store=True):
+    """Resolve the images of a validated batch in parallel; return the surviving rows"""
+    def resolve(item):
+        line, values = item
+        try:
+            values["image_url"] = resolve_image(values["image_url"], base_dir, image_root, store)
+            return line, values, None
+        except ValueError as e:
+            return line, None, str(e)
+
+    resolved = []
+    for line, values, error in pool.map(resolve, batch):
+        if error is not None:
+            report.reject(line, error)
+        else:
+            resolved.append(values)
+    return resolved
+
+def import_rows(kind, rows, batch_size=IMPORT_BATCH_SIZE, image_workers=IMPORT_IMAGE_WORKERS,
+                base_dir=None, image_root=None, atomic=False, dry_run=False):
+    """Validate and insert an iterable of row dicts; return an ImportReport"""
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"Unknown import kind: {kind}")
+    table, fields = IMPORT_KINDS[kind]
+    columns = [column for column, _, _ in fields]
+    query = (f"INSERT INTO {table} ({', '.join(columns)}) "
+             f"VALUES ({', '.join(['%s'] * len(columns))})")
+    report = ImportReport(kind)
+
+    connection = None
+    cursor = None
+    if not dry_run:
+        connection = get_db_connection()
+        if connection is None:
+            raise RuntimeError("Database connection failed")
+        cursor = connection.cursor()
+
+    def flush(batch):
+        resolved = _resolve_batch(pool, batch, base_dir, image_root, report, store=not dry_run)
+        if resolved and cursor is not None:
+            try:
+                cursor.executemany(query, [tuple(values[column] for column in columns) for values in resolved])
+                if not atomic:
+                    connection.commit()
+            except Exception:
+                report.failed_batch = {"firstRow": batch[0][0], "lastRow": batch[-1][0], "rows": len(resolved)}
+                raise
+        report.inserted += len(resolved)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, image_workers)) as pool:
+            batch = []
+            # Rows are numbered from 1, not counting a CSV header
+            for line, row in enumerate(rows, start=1):
+                report.rows += 1
+                values, error = validate_row(kind, row)
+                if error is not None:
+                    report.reject(line, error)
+                    continue
+                batch.append((line, values))
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+        if connection is not None and atomic:
+            connection.commit()
+    except Exception as e:
+        if connection is None:
+            raise
+        connection.rollback()
+        if atomic:
+            report.inserted = 0
+            report.rolled_back = True
+            raise
+        # Earlier batches are committed: report them and where the import stopped
+        report.error = str(e)
+        logger.error("Import of %s stopped after %s rows: %s", kind, report.inserted, e)
+    finally:
+        report.finish()
+        if connection is not None and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+    logger.info("Imported %s %s (%s rejected) in %.2fs", report.inserted, kind, report.rejected, report.seconds)
+    return report
+
+def import_stream(kind, stream, file_format, **options):
+    """Import from a binary or text stream; return an ImportReport"""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    return import_rows(kind, read_rows(stream, file_format), **options)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=sorted(IMPORT_KINDS))
+    parser.add_argument('path', help="CSV or JSON-lines file ('-' for stdin)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="Input format (default: from the file name)")
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument('--image-workers', type=int, default=IMPORT_IMAGE_WORKERS)
+    parser.add_argument('--atomic', action='store_true', help="Import the whole file in one transaction")
+    parser.add_argument('--dry-run', action='store_true', help="Validate rows and images without inserting or storing them")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    file_format = args.format or detect_format(args.path)
+    options = dict(batch_size=args.batch_size, image_workers=args.image_workers,
+                   atomic=args.atomic, dry_run=args.dry_run)
+    if args.path == '-':
+        report = import_rows(args.kind, read_rows(sys.stdin, file_format), base_dir=os.getcwd(), **options)
+    else:
+        with open(args.path, encoding='utf-8-sig', newline='') as f:
+            report = import_rows(args.kind, read_rows(f, file_format),
+                                 base_dir=os.path.dirname(os.path.abspath(args.path)), **options)
+
+    result = report.to_dict()
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['inserted']} of {result['rows']} {args.kind} imported, {result['rejected']} rejected "
+              f"in {result['seconds']}s ({result['rowsPerSecond']} rows/s)")
+        for error in result['errors']:
+            print(f"  row {error['row']}: {error['error']}")
+        if result['failedBatch']:
+            print(f"Stopped at rows {result['failedBatch']['firstRow']}-{result['failedBatch']['lastRow']}: "
+                  f"{result['error']}")
+    return 0 if result['rejected'] == 0 and result['error'] is None else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
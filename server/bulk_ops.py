@@ -0,0 +1,349 @@
+"""
+Batched and partial admin writes to artworks and exhibitions.
+
+One request carries many create / update / delete / status operations. They run
+in a single transaction on one connection: the referenced rows are locked and
+checked with one query, identical changes (a bulk status or price change) are
+applied with one UPDATE ... WHERE id IN (...), deletes with one DELETE, and
+each operation gets its own result. Updates are checked against the locked row
+with their changes applied (dates in order, slots within range), as PATCH is.
+Operations may carry the `version` the client last read; a mismatch fails that
+item. Invalid operations are reported and skipped; with `atomic` any failure
+rolls back the whole batch.
+
+patch_item() backs the PATCH routes: it writes only the supplied fields whose
+values actually differ from the stored row.
+"""
+
+import os
+from datetime import date
+from decimal import Decimal
+from database import get_db_connection
+from bulk_import import IMPORT_KINDS, validate_row, resolve_image
+from logging_setup import get_logger
+
+logger = get_logger('bulk_ops')
+
+BULK_MAX_OPERATIONS = int(os.environ.get('BULK_MAX_OPERATIONS', '5000'))
+# Ids per IN (...) list
+ID_CHUNK_SIZE = 1000
+
+BULK_KINDS = {
+    "artworks": "artworks",
+    "exhibitions": "exhibitions",
+}
+
+# Columns checked together once a partial update is merged into the stored row
+MERGED_COLUMNS = {
+    "artworks": (),
+    "exhibitions": ("start_date", "end_date", "total_slots", "available_slots"),
+}
+
+def _fields(kind):
+    """Map both API and column names to (column, converter) for a kind"""
+    fields = {}
+    for column, field, convert in IMPORT_KINDS[kind][1]:
+        fields[field] = (column, convert)
+        fields[column] = (column, convert)
+    return fields
+
+def _chunks(values, size=ID_CHUNK_SIZE):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def convert_changes(kind, data):
+    """Validate a partial update; return (column -> value dict, error message)"""
+    if not isinstance(data, dict) or not data:
+        return None, "data must be a non-empty object"
+    fields = _fields(kind)
+    changes = {}
+    for key, raw in data.items():
+        if key == 'id':
+            continue
+        if key not in fields:
+            return None, f"{key} cannot be changed"
+        column, convert = fields[key]
+        try:
+            value = convert(raw)
+            if column == 'image_url':
+                value = resolve_image(value, None)
+        except ValueError as e:
+            return None, f"{key} {e}"
+        if value is None and column == 'available_slots':
+            return None, f"{key} is required"
+        changes[column] = value
+    if not changes:
+        return None, "data has no changes"
+    return changes, None
+
+def _merged_error(kind, row):
+    """Check a stored row with a partial update applied; return an error message or None"""
+    if kind == 'exhibitions':
+        if row["end_date"] < row["start_date"]:
+            return "endDate is before startDate"
+        if not 0 <= row["available_slots"] <= row["total_slots"]:
+            return "availableSlots must be between 0 and totalSlots"
+    return None
+
+def _parse_operations(kind, operations):
+    """Validate operations; return (planned operations, results with errors filled in)"""
+    results = []
+    planned = []
+    seen_ids = set()
+    for index, operation in enumerate(operations):
+        result = {"index": index, "op": None, "id": None, "status": "error"}
+        results.append(result)
+        if not isinstance(operation, dict):
+            result["error"] = "operation must be an object"
+            continue
+        op = operation.get('op')
+        result["op"] = op
+        if op not in ('create', 'update', 'delete', 'status'):
+            result["error"] = "op must be create, update, delete or status"
+            continue
+
+        if op == 'create':
+            values, error = validate_row(kind, operation.get('data') or {})
+            if error is None:
+                try:
+                    values["image_url"] = resolve_image(values["image_url"], None)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                result["error"] = error
+                continue
+            planned.append((result, op, None, values, None))
+            continue
+
+        try:
+            item_id = int(operation.get('id'))
+        except (TypeError, ValueError):
+            result["error"] = "id must be an integer"
+            continue
+        result["id"] = str(item_id)
+        if item_id in seen_ids:
+            result["error"] = "id appears in more than one operation"
+            continue
+        seen_ids.add(item_id)
+
+        expected_version = operation.get('version')
+        if expected_version is not None:
+            try:
+                expected_version = int(expected_version)
+            except (TypeError, ValueError):
+                result["error"] = "version must be an integer"
+                continue
+
+        if op == 'delete':
+            planned.append((result, op, item_id, None, expected_version))
+            continue
+        data = {"status": operation.get('status')} if op == 'status' else operation.get('data')
+        changes, error = convert_changes(kind, data)
+        if error is not None:
+            result["error"] = error
+            continue
+        planned.append((result, op, item_id, changes, expected_version))
+    return planned, results
+
+def apply_bulk_operations(kind, operations, atomic=False):
+    """Run a list of operations in one transaction; return a summary with per-item results"""
+    if kind not in BULK_KINDS:
+        return {"error": f"Unknown kind: {kind}"}
+    if not isinstance(operations, list) or not operations:
+        return {"error": "operations must be a non-empty list"}
+    if len(operations) > BULK_MAX_OPERATIONS:
+        return {"error": f"At most {BULK_MAX_OPERATIONS} operations per request"}
+
+    table = BULK_KINDS[kind]
+    planned, results = _parse_operations(kind, operations)
+    invalid = any(result.get("error") for result in results)
+    if atomic and invalid:
+        for result in results:
+            if not result.get("error"):
+                result["error"] = "not applied: another operation in the batch is invalid"
+        return _summary(kind, results, applied=False)
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        # Lock every referenced row up front so the checks hold until commit
+        referenced = [item_id for _, _, item_id, _, _ in planned if item_id is not None]
+        checked = MERGED_COLUMNS[kind]
+        versions = {}
+        stored = {}
+        for chunk in _chunks(referenced):
+            cursor.execute(
+                f"SELECT {', '.join(('id', 'version') + checked)} FROM {table} "
+                f"WHERE id IN ({', '.join(['%s'] * len(chunk))}) FOR UPDATE",
+                tuple(chunk)
+            )
+            for row in cursor.fetchall():
+                versions[row[0]] = row[1]
+                stored[row[0]] = dict(zip(checked, row[2:]))
+
+        deletes = []
+        update_groups = {}
+        for result, op, item_id, values, expected_version in planned:
+            if item_id is not None and item_id not in versions:
+                result["error"] = "not found"
+                continue
+            if expected_version is not None and versions[item_id] != expected_version:
+                result["error"] = "version conflict"
+                result["version"] = versions[item_id]
+                continue
+            if op == 'create':
+                columns = list(values)
+                cursor.execute(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                    tuple(values[column] for column in columns)
+                )
+                result["id"] = str(cursor.lastrowid)
+                result["version"] = 1
+            elif op == 'delete':
+                deletes.append(item_id)
+            else:
+                # Fields checked together are validated against the locked row, as patch_item does
+                if any(column in values for column in checked):
+                    error = _merged_error(kind, dict(stored[item_id], **values))
+                    if error is not None:
+                        result["error"] = error
+                        continue
+                # Identical changes share one UPDATE
+                key = tuple(sorted(values.items()))
+                update_groups.setdefault(key, []).append(item_id)
+                result["version"] = versions[item_id] + 1
+            result["status"] = "ok"
+
+        for key, ids in update_groups.items():
+            assignments = ", ".join(f"{column} = %s" for column, _ in key)
+            for chunk in _chunks(ids):
+                cursor.execute(
+                    f"UPDATE {table} SET {assignments}, version = version + 1 WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                    tuple(value for _, value in key) + tuple(chunk)
+                )
+        for chunk in _chunks(deletes):
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(chunk))})", tuple(chunk))
+
+        if atomic and any(result.get("error") for result in results):
+            connection.rollback()
+            for result in results:
+                if result["status"] == "ok":
+                    result["status"] = "error"
+                    result["error"] = "not applied: another operation in the batch failed"
+            return _summary(kind, results, applied=False)
+
+        connection.commit()
+        return _summary(kind, results, applied=True)
+    except Exception as e:
+        connection.rollback()
+        logger.error("Error applying bulk %s operations: %s", kind, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _summary(kind, results, applied):
+    succeeded = sum(1 for result in results if result["status"] == "ok")
+    for result in results:
+        result.setdefault("error", None)
+    return {
+        "kind": kind,
+        "applied": applied and succeeded > 0,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results
+    }
+
+def _api_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def patch_item(kind, item_id, data, expected_version=None):
+    """Update only the supplied fields that differ from the stored row; return the changed fields
+
+    With expected_version the update only applies if the row is still at that
+    version ("Version conflict" otherwise).
+    """
+    if kind not in BULK_KINDS:
+        return {"error": f"Unknown kind: {kind}"}
+    if not isinstance(data, dict) or not data:
+        return {"error": "Request body must be a non-empty object"}
+    fields = _fields(kind)
+    unknown = sorted(key for key in data if key not in fields and key != 'id')
+    if unknown:
+        return {"error": f"Fields cannot be changed: {', '.join(unknown)}"}
+
+    table = BULK_KINDS[kind]
+    columns = [column for column, _, _ in IMPORT_KINDS[kind][1]]
+    api_names = {column: field for column, field, _ in IMPORT_KINDS[kind][1]}
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute(f"SELECT {', '.join(columns)}, version FROM {table} WHERE id = %s", (item_id,))
+        row = cursor.fetchone()
+        if not row:
+            return {"error": "Not found"}
+        current = dict(zip(columns, row))
+        version = row[-1]
+        if expected_version is not None and version != expected_version:
+            return {"error": "Version conflict", "version": version}
+
+        # An unchanged image URL is dropped before conversion, so it is never re-processed
+        requested = {key: value for key, value in data.items() if key != 'id'}
+        for key in ('imageUrl', 'image_url'):
+            if key in requested and requested[key] == current['image_url']:
+                del requested[key]
+        if not requested:
+            return {"id": str(item_id), "version": version, "changed": {}}
+
+        changes, error = convert_changes(kind, requested)
+        if error is not None:
+            return {"error": error}
+        changed = {column: value for column, value in changes.items() if current[column] != value}
+        if not changed:
+            return {"id": str(item_id), "version": version, "changed": {}}
+
+        error = _merged_error(kind, dict(current, **changed))
+        if error is not None:
+            return {"error": error}
+
+        # Guarded by the version read above, so a concurrent write is never overwritten
+        assignments = ", ".join(f"{column} = %s" for column in changed)
+        cursor.execute(
+            f"UPDATE {table} SET {assignments}, version = version + 1 WHERE id = %s AND version = %s",
+            tuple(changed.values()) + (item_id, version)
+        )
+        if cursor.rowcount == 0:
+            connection.rollback()
+            cursor.execute(f"SELECT version FROM {table} WHERE id = %s", (item_id,))
+            row = cursor.fetchone()
+            if not row:
+                return {"error": "Not found"}
+            return {"error": "Version conflict", "version": row[0]}
+        connection.commit()
+        return {
+            "id": str(item_id),
+            "version": version + 1,
+            "changed": {api_names[column]: _api_value(value) for column, value in changed.items()}
+        }
+    except Exception as e:
+        logger.error("Error patching %s %s: %s", kind, item_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
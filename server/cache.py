@@ -0,0 +1,106 @@
+"""
+In-process cache for catalogue list responses.
+
+Each catalogue kind ('artworks', 'exhibitions') has a version counter that is
+bumped on every write. Cached entries hold the serialized JSON body together
+with any compressed variants produced for it, so a body is compressed at most
+once per encoding per version instead of once per request. Each variant has its
+own ETag, since its bytes differ from the identity body's.
+"""
+
+import os
+import time
+import hashlib
+import threading
+
+# Entries older than this are rebuilt even without a local write, so workers
+# that did not see a write converge within the TTL
+CATALOGUE_CACHE_TTL = int(os.environ.get('CATALOGUE_CACHE_TTL', '30'))
+
+_lock = threading.Lock()
+_versions = {}
+_entries = {}
+# Called with the kind after every invalidation (e.g. to refresh search indexes)
+_listeners = []
+
+CACHE_STATS = {
+    "hits": 0,
+    "misses": 0,
+    "invalidations": 0,
+    "compressions": 0
+}
+
+class CacheEntry:
+    """Serialized catalogue body plus its precompressed variants"""
+
+    def __init__(self, kind, variant, version, body):
+        self.kind = kind
+        self.variant = variant
+        self.version = version
+        self.body = body
+        self.created_at = time.time()
+        self.etag = '"%s-%s"' % (version, hashlib.sha1(body).hexdigest()[:16])
+        self.encoded = {}
+        self._encode_lock = threading.Lock()
+
+    def get_encoded(self, encoding, compress):
+        """Return the body compressed with encoding, compressing it only once"""
+        data = self.encoded.get(encoding)
+        if data is None:
+            # Concurrent requests for a new entry wait for one compression
+            # instead of each compressing the same body
+            with self._encode_lock:
+                data = self.encoded.get(encoding)
+                if data is None:
+                    data = compress(self.body, encoding)
+                    self.encoded[encoding] = data
+                    with _lock:
+                        CACHE_STATS["compressions"] += 1
+        return data
+
+    def etag_for(self, encoding):
+        """Return the strong ETag of the body as sent with encoding"""
+        return '%s-%s"' % (self.etag[:-1], encoding)
+
+    def is_fresh(self):
+        """Check whether the entry still matches the current catalogue version"""
+        if _versions.get(self.kind, 0) != self.version:
+            return False
+        return time.time() - self.created_at < CATALOGUE_CACHE_TTL
+
+def get_catalogue_entry(kind, variant=''):
+    """Return a fresh cached entry for the given catalogue kind, or None"""
+    entry = _entries.get((kind, variant))
+    if entry is not None and entry.is_fresh():
+        CACHE_STATS["hits"] += 1
+        return entry
+    CACHE_STATS["misses"] += 1
+    return None
+
+def store_catalogue_entry(kind, variant, body):
+    """Cache a serialized catalogue body under the current version"""
+    with _lock:
+        entry = CacheEntry(kind, variant, _versions.get(kind, 0), body)
+        _entries[(kind, variant)] = entry
+    return entry
+
+def invalidate_catalogue(kind):
+    """Bump the version of a catalogue kind so cached entries are rebuilt"""
+    with _lock:
+        _versions[kind] = _versions.get(kind, 0) + 1
+        for key in [key for key in _entries if key[0] == kind]:
+            del _entries[key]
+        CACHE_STATS["invalidations"] += 1
+    for listener in _listeners:
+        listener(kind)
+
+def add_invalidation_listener(listener):
+    """Register a callable run with the kind whenever a catalogue is invalidated"""
+    _listeners.append(listener)
+
+def get_cache_stats():
+    """Return cache counters and the number of live entries"""
+    stats = dict(CACHE_STATS)
+    stats["entries"] = len(_entries)
+    stats["compressed_variants"] = sum(len(entry.encoded) for entry in list(_entries.values()))
+    return stats
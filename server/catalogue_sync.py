@@ -0,0 +1,203 @@
+"""
+Keeps in-process catalogue indexes in step with the database.
+
+One background thread per worker loads the artworks and exhibitions tables once,
+then applies deltas: rows whose updated_at is recent and whose version changed
+since they were last delivered, and ids that disappeared since the last pass. Subscribers (search, autocomplete,
+recommendations) receive those deltas through a single callback, so each
+maintains its own structure without its own queries. Versions and watermarks only
+advance once every subscriber has taken a delta, so a pass that fails part-way,
+or a subscriber that raises, gets the same delta again on the next pass.
+
+A pass runs every CATALOGUE_SYNC_INTERVAL seconds, which is how workers pick up
+writes handled by other workers, and immediately after a local write (via the
+catalogue cache's invalidation listener).
+"""
+
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from database import get_db_connection
+from cache import add_invalidation_listener
+from logging_setup import get_logger
+
+logger = get_logger('catalogue_sync')
+
+CATALOGUE_SYNC_INTERVAL = float(os.environ.get('CATALOGUE_SYNC_INTERVAL', '15'))
+# Rows fetched per round trip during the initial load
+SYNC_FETCH_SIZE = 5000
+# Deltas re-read this far behind the newest updated_at seen, so rows from
+# transactions that committed after a pass but were stamped before it are not missed
+SYNC_OVERLAP_SECONDS = 120
+
+SYNC_QUERIES = {
+    "artworks": """
+        SELECT id, title, artist, description, medium, dimensions, price, year, status,
+               image_url, version, updated_at
+        FROM artworks
+    """,
+    "exhibitions": """
+        SELECT id, title, description, location, start_date, end_date, ticket_price,
+               status, image_url, version, updated_at
+        FROM exhibitions
+    """,
+}
+
+SYNC_STATS = {
+    "passes": 0,
+    "rows_applied": 0,
+    "rows_removed": 0,
+    "errors": 0,
+    "last_pass_seconds": 0.0
+}
+
+_subscribers = []
+# id -> version of every row delivered to subscribers
+_versions = {kind: {} for kind in SYNC_QUERIES}
+_watermarks = {kind: None for kind in SYNC_QUERIES}
+_loaded = threading.Event()
+_wake = threading.Event()
+_state = {"thread": None, "pid": None}
+_start_lock = threading.Lock()
+
+def subscribe(callback):
+    """Register callback(kind, rows, removed_ids, initial) for catalogue changes
+
+    rows are dicts keyed by column name; initial is True for the first full load.
+    """
+    _subscribers.append(callback)
+
+def request_sync(kind=None):
+    """Wake the sync thread now (used after local writes)"""
+    _wake.set()
+
+def is_loaded():
+    """Whether the initial load has completed on this worker"""
+    return _loaded.is_set()
+
+def wait_until_loaded(timeout):
+    return _loaded.wait(timeout)
+
+def is_known(kind, item_id):
+    """Whether item_id exists in the catalogue (True until the initial load completes)"""
+    return not _loaded.is_set() or item_id in _versions.get(kind, ())
+
+def _notify(kind, rows, removed, initial):
+    """Deliver a delta to every subscriber; False if any of them failed"""
+    delivered = True
+    for callback in _subscribers:
+        try:
+            callback(kind, rows, removed, initial)
+        except Exception as e:
+            delivered = False
+            logger.exception("Catalogue subscriber %s failed: %s", getattr(callback, '__name__', callback), e)
+    return delivered
+
+def _sync_kind(cursor, kind):
+    initial = _watermarks[kind] is None
+    query = SYNC_QUERIES[kind]
+    params = ()
+    if not initial:
+        query += " WHERE updated_at >= %s"
+        params = (_watermarks[kind] - timedelta(seconds=SYNC_OVERLAP_SECONDS),)
+    cursor.execute(query, params)
+    columns = cursor.column_names
+
+    known = _versions[kind]
+    rows = []
+    latest = _watermarks[kind]
+    while True:
+        batch = cursor.fetchmany(SYNC_FETCH_SIZE)
+        if not batch:
+            break
+        for values in batch:
+            row = dict(zip(columns, values))
+            if row["updated_at"] is not None and (latest is None or row["updated_at"] > latest):
+                latest = row["updated_at"]
+            # Rows re-read through the overlap are only delivered if they changed
+            if known.get(row["id"]) != row["version"]:
+                rows.append(row)
+
+    cursor.execute(f"SELECT id FROM {kind}")
+    current_ids = {row[0] for row in cursor.fetchall()}
+    removed = set(known) - current_ids
+    # Rows deleted between the two queries are not delivered at all
+    rows = [row for row in rows if row["id"] in current_ids]
+
+    if rows or removed or initial:
+        if not _notify(kind, rows, removed, initial):
+            # Keep the old versions and watermark so the next pass delivers this delta again
+            SYNC_STATS["errors"] += 1
+            return
+    # Only a delivered delta moves the versions and watermark forward
+    for row in rows:
+        known[row["id"]] = row["version"]
+    for item_id in removed:
+        del known[item_id]
+    if initial and latest is None:
+        # Empty table: later passes still only need rows from now on
+        latest = datetime.now()
+    _watermarks[kind] = latest
+    SYNC_STATS["rows_applied"] += len(rows)
+    SYNC_STATS["rows_removed"] += len(removed)
+
+def sync_once():
+    """Run one sync pass over every catalogue kind"""
+    start = time.perf_counter()
+    connection = get_db_connection()
+    if connection is None:
+        SYNC_STATS["errors"] += 1
+        return False
+    cursor = connection.cursor()
+    try:
+        for kind in SYNC_QUERIES:
+            _sync_kind(cursor, kind)
+        connection.commit()
+        SYNC_STATS["passes"] += 1
+        _loaded.set()
+        return True
+    except Exception as e:
+        SYNC_STATS["errors"] += 1
+        logger.error("Catalogue sync failed: %s", e)
+        return False
+    finally:
+        SYNC_STATS["last_pass_seconds"] = round(time.perf_counter() - start, 3)
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _run():
+    while True:
+        sync_once()
+        _wake.wait(CATALOGUE_SYNC_INTERVAL)
+        _wake.clear()
+
+def start_catalogue_sync():
+    """Start the sync thread in this process if it is not already running"""
+    pid = os.getpid()
+    if _state["pid"] == pid:
+        return
+    with _start_lock:
+        if _state["pid"] == pid:
+            return
+        # After a fork the parent's thread is gone; start afresh in this process
+        for kind in SYNC_QUERIES:
+            _versions[kind] = {}
+            _watermarks[kind] = None
+        _loaded.clear()
+        thread = threading.Thread(target=_run, name='catalogue-sync', daemon=True)
+        _state["thread"] = thread
+        _state["pid"] = pid
+        thread.start()
+
+def init_catalogue_sync(app):
+    """Start syncing on the first request each worker serves"""
+    app.before_request(start_catalogue_sync)
+    add_invalidation_listener(request_sync)
+
+def get_sync_stats():
+    """Return sync counters"""
+    stats = dict(SYNC_STATS)
+    stats["loaded"] = int(_loaded.is_set())
+    return stats
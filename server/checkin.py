@@ -0,0 +1,229 @@
+"""
+Door check-in for exhibition tickets.
+
+A scan is verified in-process from the ticket code's HMAC (see
+tickets.verify_ticket_code) and checked against an in-memory set of used
+bookings, so admitting a visitor never waits on MySQL. New check-ins are
+buffered and a background thread in each worker writes them every
+CHECKIN_FLUSH_INTERVAL seconds with one batched INSERT IGNORE into
+ticket_checkins, then pulls in check-ins recorded by other workers since its
+last pass. A ticket scanned at two workers within one interval is admitted by
+both; the table keeps the first check-in and the flush counts the duplicate.
+
+Offline scanners download a per-exhibition manifest (the exhibition's signing
+key plus the bookings already checked in), verify codes on the device and
+upload their scans later through the sync endpoint.
+"""
+
+import os
+import time
+import atexit
+import base64
+import threading
+from datetime import datetime
+from database import get_db_connection
+from logging_setup import get_logger
+from tickets import (
+    TICKET_CODE_PREFIX, TICKET_PAYLOAD, TICKET_MAC_BYTES, TICKET_GRACE_DAYS,
+    exhibition_key, verify_ticket_code
+)
+
+logger = get_logger('checkin')
+
+CHECKIN_FLUSH_INTERVAL = float(os.environ.get('CHECKIN_FLUSH_INTERVAL', '5'))
+# Scans accepted per sync request from an offline scanner
+CHECKIN_MAX_SYNC = 5000
+# Oldest scannedAt accepted from an offline scanner, in seconds before the sync;
+# older scans are recorded at that limit
+CHECKIN_MAX_SCAN_AGE = float(os.environ.get('CHECKIN_MAX_SCAN_AGE', str(TICKET_GRACE_DAYS * 86400)))
+# Check-ins recorded this many seconds before the last pass are reloaded again,
+# covering rows committed by other workers while the previous pass ran
+RELOAD_OVERLAP_SECONDS = 5
+
+INSERT_CHECKINS = """
+    INSERT IGNORE INTO ticket_checkins (booking_id, exhibition_id, slots, checked_in_at, source)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+# Check-ins for exhibitions whose tickets are still valid
+RELOAD_CHECKINS = f"""
+    SELECT c.booking_id, c.exhibition_id, UNIX_TIMESTAMP(c.checked_in_at)
+    FROM ticket_checkins c
+    JOIN exhibitions e ON e.id = c.exhibition_id
+    WHERE e.end_date >= CURDATE() - INTERVAL {TICKET_GRACE_DAYS} DAY {{since}}
+"""
+
+CHECKIN_STATS = {
+    "scans": 0,
+    "admitted": 0,
+    "already_used": 0,
+    "invalid": 0,
+    "flushes": 0,
+    "flushed": 0,
+    "duplicates": 0,
+    "flush_errors": 0
+}
+
+_lock = threading.Lock()
+# booking id -> (exhibition id, unix time of its first check-in)
+_used = {}
+# check-ins not yet written: (booking id, exhibition id, slots, datetime, source)
+_buffer = []
+_state = {"thread": None, "pid": None, "reloaded_at": None}
+
+def check_in(code, exhibition_id=None, scanned_at=None, source='door'):
+    """Admit a ticket once; return the scan result or an error dict"""
+    CHECKIN_STATS["scans"] += 1
+    # Expiry is judged by the server clock, never by a scanner's timestamp
+    ticket = verify_ticket_code(code)
+    if "error" in ticket:
+        CHECKIN_STATS["invalid"] += 1
+        return ticket
+    if exhibition_id is not None and ticket["exhibitionId"] != exhibition_id:
+        CHECKIN_STATS["invalid"] += 1
+        return {"error": "Ticket is for another exhibition"}
+
+    booking_id = ticket["bookingId"]
+    scanned_at = scanned_at or time.time()
+    with _lock:
+        first = _used.get(booking_id)
+        if first is None:
+            _used[booking_id] = (ticket["exhibitionId"], scanned_at)
+            _buffer.append((booking_id, ticket["exhibitionId"], ticket["slots"],
+                            datetime.fromtimestamp(scanned_at), source))
+    if first is not None:
+        CHECKIN_STATS["already_used"] += 1
+        return {"status": "already_checked_in", "bookingId": booking_id, "slots": ticket["slots"],
+                "checkedInAt": datetime.fromtimestamp(first[1]).isoformat()}
+    CHECKIN_STATS["admitted"] += 1
+    return {"status": "admitted", "bookingId": booking_id, "exhibitionId": ticket["exhibitionId"],
+            "slots": ticket["slots"]}
+
+def sync_scans(scans, exhibition_id=None, generated_at=None):
+    """Record scans made offline, each {"code", "scannedAt" (unix seconds)}, in the order they were made
+
+    scannedAt is clamped to a window ending now and starting CHECKIN_MAX_SCAN_AGE
+    ago, or, when generated_at (the manifest's generatedAt) is given, one grace
+    period before the manifest if that is later. A backdated scan therefore cannot
+    win the first admission from a scan made at the door.
+    """
+    now = time.time()
+    earliest = now - CHECKIN_MAX_SCAN_AGE
+    if isinstance(generated_at, (int, float)):
+        earliest = max(earliest, min(generated_at, now) - TICKET_GRACE_DAYS * 86400)
+    normalized = []
+    for scan in scans[:CHECKIN_MAX_SYNC]:
+        scan = scan if isinstance(scan, dict) else {}
+        scanned_at = scan.get("scannedAt")
+        if not isinstance(scanned_at, (int, float)):
+            scanned_at = now
+        normalized.append((min(max(scanned_at, earliest), now), scan.get("code")))
+    # Replayed in scan order so a ticket's first admission is the one kept
+    normalized.sort(key=lambda scan: scan[0])
+
+    results = []
+    counts = {"admitted": 0, "already_checked_in": 0, "invalid": 0}
+    for scanned_at, code in normalized:
+        result = check_in(code, exhibition_id, scanned_at, source='offline')
+        status = result.get("status", "invalid")
+        counts[status] += 1
+        results.append({"code": code, "status": status, "error": result.get("error")})
+    return dict(counts, results=results)
+
+def get_manifest(exhibition_id):
+    """What an offline scanner needs to admit visitors to one exhibition"""
+    with _lock:
+        checked_in = [booking_id for booking_id, (exhibition, _) in _used.items() if exhibition == exhibition_id]
+    return {
+        "exhibitionId": exhibition_id,
+        "generatedAt": int(time.time()),
+        "codePrefix": TICKET_CODE_PREFIX,
+        # Big-endian uint32 booking id, uint32 exhibition id, uint16 slots, uint32 expiry,
+        # then the first macBytes of HMAC-SHA256(key, those 14 bytes), base64url without padding
+        "payloadFormat": TICKET_PAYLOAD.format,
+        "macBytes": TICKET_MAC_BYTES,
+        "key": base64.urlsafe_b64encode(exhibition_key(exhibition_id)).decode('ascii'),
+        "checkedIn": sorted(checked_in)
+    }
+
+def flush():
+    """Write buffered check-ins in one batch and load check-ins recorded by other workers"""
+    global _buffer
+    with _lock:
+        pending, _buffer = _buffer, []
+
+    connection = get_db_connection()
+    if connection is None:
+        CHECKIN_STATS["flush_errors"] += 1
+        with _lock:
+            _buffer[:0] = pending
+        return False
+
+    cursor = connection.cursor()
+
+    try:
+        if pending:
+            cursor.executemany(INSERT_CHECKINS, pending)
+            connection.commit()
+            CHECKIN_STATS["flushed"] += len(pending)
+            # INSERT IGNORE skips bookings another worker checked in first
+            CHECKIN_STATS["duplicates"] += len(pending) - max(cursor.rowcount, 0)
+            pending = []
+        CHECKIN_STATS["flushes"] += 1
+
+        since = _state["reloaded_at"]
+        reload_started = time.time()
+        if since is None:
+            cursor.execute(RELOAD_CHECKINS.format(since=""))
+        else:
+            cursor.execute(RELOAD_CHECKINS.format(since="AND c.recorded_at >= FROM_UNIXTIME(%s)"),
+                           (since - RELOAD_OVERLAP_SECONDS,))
+        rows = cursor.fetchall()
+        with _lock:
+            for booking_id, exhibition_id, checked_in_at in rows:
+                _used.setdefault(booking_id, (exhibition_id, float(checked_in_at)))
+        _state["reloaded_at"] = reload_started
+        return True
+    except Exception as e:
+        CHECKIN_STATS["flush_errors"] += 1
+        logger.error("Error flushing ticket check-ins: %s", e)
+        with _lock:
+            _buffer[:0] = pending
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _run():
+    while True:
+        flush()
+        time.sleep(CHECKIN_FLUSH_INTERVAL)
+
+def start_checkin_flush():
+    """Start the flush thread in this process if it is not already running"""
+    pid = os.getpid()
+    if _state["pid"] == pid:
+        return
+    with _lock:
+        if _state["pid"] == pid:
+            return
+        # Scans buffered before a fork belong to the parent
+        _buffer.clear()
+        _state["reloaded_at"] = None
+        thread = threading.Thread(target=_run, name='checkin-flush', daemon=True)
+        _state["thread"] = thread
+        _state["pid"] = pid
+        thread.start()
+
+def init_checkin(app):
+    """Start flushing on the first request each worker serves, and once more at exit"""
+    app.before_request(start_checkin_flush)
+    atexit.register(lambda: _buffer and flush())
+
+def get_checkin_stats():
+    """Return scan and flush counters"""
+    stats = dict(CHECKIN_STATS)
+    stats["buffered"] = len(_buffer)
+    stats["used_tickets"] = len(_used)
+    return stats
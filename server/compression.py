@@ -0,0 +1,109 @@
+"""
+Content-negotiated gzip/brotli compression for JSON responses.
+"""
+
+import os
+import gzip
+from flask import request, g
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent as-is; the framing overhead is not worth it
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+# Level 6 / quality 5 sit at the knee of the size-vs-CPU curve for catalogue
+# JSON (see bench_compression.py). Cached bodies are compressed once per version
+# but still on the request that first asks for them, so they default to the
+# same levels: quality 11 takes seconds on a multi-megabyte catalogue
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+CACHED_GZIP_LEVEL = int(os.environ.get('CACHED_GZIP_LEVEL', '6'))
+CACHED_BROTLI_QUALITY = int(os.environ.get('CACHED_BROTLI_QUALITY', '5'))
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/csv')
+
+def supported_encodings():
+    """Return the encodings this server can produce, most preferred first"""
+    if brotli is not None:
+        return ['br', 'gzip']
+    return ['gzip']
+
+def choose_encoding(accept_encoding):
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.split(','):
+        pieces = part.strip().split(';')
+        name = pieces[0].strip().lower()
+        quality = 1.0
+        for param in pieces[1:]:
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name] = quality
+
+    best = None
+    best_quality = 0.0
+    for encoding in supported_encodings():
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best = encoding
+            best_quality = quality
+    return best
+
+def compress_body(body, encoding, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+    """Compress a byte string with the given encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality, mode=brotli.MODE_TEXT)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output deterministic so identical bodies compress identically
+        return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def compress_cached_body(body, encoding):
+    """Compress a cached catalogue body at the configured cached-body level"""
+    return compress_body(body, encoding, CACHED_GZIP_LEVEL, CACHED_BROTLI_QUALITY)
+
+def compress_response(response):
+    """Compress eligible responses according to the client's Accept-Encoding"""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    if (response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return response
+
+    # Catalogue responses reuse the compressed bytes stored with their cache entry
+    entry = g.get('catalogue_entry')
+    if entry is not None and entry.body == body:
+        compressed = entry.get_encoded(encoding, compress_cached_body)
+        response.headers['ETag'] = entry.etag_for(encoding)
+    else:
+        compressed = compress_body(body, encoding)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    response.headers['Content-Length'] = str(len(compressed))
+    return response
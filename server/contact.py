@@ -3,6 +3,9 @@ import json
 import jwt
 import os
 from decimal import Decimal
+from logging_setup import get_logger
+
+logger = get_logger('contact')
 
 # Get the secret key from environment or use a default (in production, always use environment variables)
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'afriart_default_secret_key')
@@ -45,15 +48,11 @@ def create_contact_message(data):
     if not name or not email or not message:
         return {"error": "Missing required fields"}
     
-    # Print data for debugging
-    print(f"Saving contact message: {name}, {email}, {message}, source: {source}")
+    logger.debug("Saving contact message from %s (source: %s)", email, source)
     
     # Save the message
     result = save_contact_message(name, email, phone, message, source)
     
-    # Print result for debugging
-    print(f"Save result: {result}")
-    
     # Convert any Decimal values to float
     if isinstance(result, dict):
         return json.loads(json_dumps(result))
@@ -64,11 +63,11 @@ def get_messages(auth_header):
     if not is_admin(auth_header):
         return {"error": "Unauthorized access"}
     
-    print("Fetching all contact messages")
+    logger.debug("Fetching all contact messages")
     result = get_all_contact_messages()
     
-    # Print result for debugging
-    print(f"Fetch messages result: {result}")
+    if isinstance(result, dict) and 'messages' in result:
+        logger.debug("Fetched %s contact messages", len(result['messages']))
     
     # Use custom JSON encoder for Decimal values and convert all Decimal to float
     if isinstance(result, dict) and 'messages' in result:
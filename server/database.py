@@ -1,7 +1,13 @@
 import mysql.connector
 from mysql.connector import Error
 import json
+import time
 from decimal import Decimal
+from query_stats import instrument_connection
+from logging_setup import get_logger
+from tracing import span
+
+logger = get_logger('database')
 
 # Custom JSON encoder to handle Decimal types
 class DecimalEncoder(json.JSONEncoder):
@@ -18,16 +24,36 @@ DB_CONFIG = {
     'database': 'artgallery'
 }
 
+# Connection counters exposed on /metrics
+CONNECTION_STATS = {
+    "connections_opened": 0,
+    "connection_failures": 0,
+    "connect_seconds_total": 0.0
+}
+
 def get_db_connection():
     """Create and return a database connection"""
+    with span("db.connect", kind='client', **{"db.name": DB_CONFIG['database']}):
+        return _connect()
+
+def _connect():
+    start = time.perf_counter()
     try:
         connection = mysql.connector.connect(**DB_CONFIG)
         if connection.is_connected():
-            return connection
+            CONNECTION_STATS["connections_opened"] += 1
+            return instrument_connection(connection)
     except Error as e:
-        print(f"Error connecting to MySQL: {e}")
+        logger.error("Error connecting to MySQL: %s", e)
+    finally:
+        CONNECTION_STATS["connect_seconds_total"] += time.perf_counter() - start
+    CONNECTION_STATS["connection_failures"] += 1
     return None
 
+def get_connection_stats():
+    """Return database connection counters"""
+    return dict(CONNECTION_STATS)
+
 # Helper function to safely encode JSON with Decimal values
 def json_dumps(data):
     """Safely convert data to JSON string, handling Decimal types"""
@@ -71,7 +97,7 @@ def save_contact_message(name, email, phone, message, source='contact_form'):
         return {"success": True, "message_id": cursor.lastrowid}
     
     except Error as e:
-        print(f"Error saving contact message: {e}")
+        logger.error("Error saving contact message: %s", e)
         return {"error": str(e)}
     
     finally:
@@ -103,7 +129,7 @@ def get_all_contact_messages():
         return {"messages": messages}
     
     except Error as e:
-        print(f"Error getting contact messages: {e}")
+        logger.error("Error getting contact messages: %s", e)
         return {"error": str(e)}
     
     finally:
@@ -135,7 +161,7 @@ def update_message_status(message_id, status):
         return {"success": True}
     
     except Error as e:
-        print(f"Error updating message status: {e}")
+        logger.error("Error updating message status: %s", e)
         return {"error": str(e)}
     
     finally:
@@ -1,6 +1,13 @@
 
 import mysql.connector
 from mysql.connector import Error
+import time
+from database import CONNECTION_STATS
+from query_stats import instrument_connection
+from logging_setup import get_logger
+from tracing import span
+
+logger = get_logger('db_setup')
 
 # Database connection configuration
 DB_CONFIG = {
@@ -12,20 +19,65 @@ DB_CONFIG = {
 
 def get_db_connection():
     """Create and return a database connection"""
+    with span("db.connect", kind='client', **{"db.name": DB_CONFIG['database']}):
+        return _connect()
+
+def _connect():
+    start = time.perf_counter()
     try:
         connection = mysql.connector.connect(**DB_CONFIG)
         if connection.is_connected():
-            print("MySQL Database connection successful")
-            return connection
+            CONNECTION_STATS["connections_opened"] += 1
+            return instrument_connection(connection)
     except Error as e:
-        print(f"Error connecting to MySQL: {e}")
+        logger.error("Error connecting to MySQL: %s", e)
+    finally:
+        CONNECTION_STATS["connect_seconds_total"] += time.perf_counter() - start
+    CONNECTION_STATS["connection_failures"] += 1
     return None
 
+# Columns added after the first release; created on existing databases at startup
+COLUMN_MIGRATIONS = [
+    ("artworks", "version", "INT NOT NULL DEFAULT 1"),
+    ("exhibitions", "version", "INT NOT NULL DEFAULT 1"),
+    ("artworks", "updated_at", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"),
+    ("exhibitions", "updated_at", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"),
+    ("exhibition_bookings", "version", "INT NOT NULL DEFAULT 1"),
+    ("exhibition_bookings", "time_slot_id", "INT NULL"),
+    ("exhibition_bookings", "refund_due", "BOOLEAN NOT NULL DEFAULT FALSE"),
+]
+
+# Secondary indexes, created on new and existing databases at startup
+INDEX_MIGRATIONS = [
+    ("artworks", "idx_artworks_updated_at", "(updated_at)"),
+    ("exhibitions", "idx_exhibitions_updated_at", "(updated_at)"),
+    ("artwork_orders", "idx_artwork_orders_user_date", "(user_id, order_date)"),
+    ("exhibition_bookings", "idx_exhibition_bookings_user_date", "(user_id, booking_date)"),
+    ("mpesa_transactions", "idx_mpesa_transactions_order", "(order_type, order_id)"),
+    ("exhibition_bookings", "idx_exhibition_bookings_date", "(booking_date)"),
+    ("exhibition_bookings", "idx_exhibition_bookings_exhibition_date", "(exhibition_id, booking_date)"),
+    ("exhibition_bookings", "idx_exhibition_bookings_status_date", "(payment_status, booking_date)"),
+    ("exhibitions", "idx_exhibitions_dates", "(start_date, end_date)"),
+]
+
+def apply_migrations(cursor):
+    """Add any missing columns from COLUMN_MIGRATIONS and indexes from INDEX_MIGRATIONS"""
+    for table, column, definition in COLUMN_MIGRATIONS:
+        cursor.execute(f"SHOW COLUMNS FROM {table} LIKE %s", (column,))
+        if not cursor.fetchone():
+            logger.info("Adding column %s.%s", table, column)
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    for table, name, columns in INDEX_MIGRATIONS:
+        cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (name,))
+        if not cursor.fetchall():
+            logger.info("Creating index %s on %s", name, table)
+            cursor.execute(f"CREATE INDEX {name} ON {table} {columns}")
+
 def initialize_database():
     """Create database tables if they don't exist"""
     connection = get_db_connection()
     if connection is None:
-        print("Failed to connect to database")
+        logger.error("Failed to connect to database")
         return False
     
     cursor = connection.cursor()
@@ -66,7 +118,9 @@ def initialize_database():
         medium VARCHAR(100),
         year INT,
         status ENUM('available', 'sold') NOT NULL DEFAULT 'available',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        version INT NOT NULL DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
     );
     """
     
@@ -84,7 +138,9 @@ def initialize_database():
         total_slots INT NOT NULL,
         available_slots INT NOT NULL,
         status ENUM('upcoming', 'ongoing', 'past') NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        version INT NOT NULL DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
     );
     """
     
@@ -123,6 +179,9 @@ def initialize_database():
         mpesa_transaction_id VARCHAR(50),
         booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         total_amount DECIMAL(10, 2) NOT NULL,
+        version INT NOT NULL DEFAULT 1,
+        time_slot_id INT NULL,
+        refund_due BOOLEAN NOT NULL DEFAULT FALSE,
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
         FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id) ON DELETE CASCADE
     );
@@ -161,6 +220,121 @@ def initialize_database():
     );
     """
     
+    # Create item popularity table (aggregated view/click events, see popularity.py)
+    item_popularity_table = """
+    CREATE TABLE IF NOT EXISTS item_popularity (
+        kind VARCHAR(20) NOT NULL,
+        item_id INT NOT NULL,
+        views INT NOT NULL DEFAULT 0,
+        clicks INT NOT NULL DEFAULT 0,
+        score DOUBLE NOT NULL DEFAULT 0,
+        score_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (kind, item_id),
+        INDEX idx_item_popularity_score_at (score_at)
+    );
+    """
+    
+    # Create ticket check-ins table (written in batches by checkin.py)
+    ticket_checkins_table = """
+    CREATE TABLE IF NOT EXISTS ticket_checkins (
+        booking_id INT NOT NULL PRIMARY KEY,
+        exhibition_id INT NOT NULL,
+        slots INT NOT NULL,
+        checked_in_at TIMESTAMP NOT NULL,
+        source VARCHAR(20) NOT NULL DEFAULT 'door',
+        recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_ticket_checkins_exhibition (exhibition_id),
+        INDEX idx_ticket_checkins_recorded_at (recorded_at)
+    );
+    """
+    
+    # Create timed-entry slots table (booked is reserved atomically, see time_slots.py)
+    exhibition_time_slots_table = """
+    CREATE TABLE IF NOT EXISTS exhibition_time_slots (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        exhibition_id INT NOT NULL,
+        slot_date DATE NOT NULL,
+        start_time TIME NOT NULL,
+        capacity INT NOT NULL,
+        booked INT NOT NULL DEFAULT 0,
+        UNIQUE KEY uq_exhibition_time_slots_start (exhibition_id, slot_date, start_time),
+        FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id) ON DELETE CASCADE
+    );
+    """
+    
+    # Create waitlist table (FIFO per exhibition, served by waitlist.py)
+    exhibition_waitlist_table = """
+    CREATE TABLE IF NOT EXISTS exhibition_waitlist (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        exhibition_id INT NOT NULL,
+        user_id INT NOT NULL,
+        slots INT NOT NULL,
+        preferred_date DATE NULL,
+        status ENUM('waiting', 'offered', 'claimed', 'expired', 'cancelled') NOT NULL DEFAULT 'waiting',
+        active TINYINT NULL DEFAULT 1,
+        time_slot_id INT NULL,
+        offer_expires_at DATETIME NULL,
+        booking_id INT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY uq_exhibition_waitlist_active (exhibition_id, user_id, active),
+        INDEX idx_exhibition_waitlist_queue (status, exhibition_id, id),
+        INDEX idx_exhibition_waitlist_offer_expiry (status, offer_expires_at),
+        FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+    """
+    
+    # Create sales rollup tables (maintained by analytics.py as payments complete)
+    sales_daily_table = """
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        day DATE NOT NULL,
+        order_type VARCHAR(20) NOT NULL,
+        attempts INT NOT NULL DEFAULT 0,
+        completed INT NOT NULL DEFAULT 0,
+        failed INT NOT NULL DEFAULT 0,
+        units INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, order_type)
+    );
+    """
+    
+    sales_totals_table = """
+    CREATE TABLE IF NOT EXISTS sales_totals (
+        order_type VARCHAR(20) NOT NULL PRIMARY KEY,
+        attempts INT NOT NULL DEFAULT 0,
+        completed INT NOT NULL DEFAULT 0,
+        failed INT NOT NULL DEFAULT 0,
+        units INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+    );
+    """
+    
+    sales_by_artist_table = """
+    CREATE TABLE IF NOT EXISTS sales_by_artist (
+        artist VARCHAR(255) NOT NULL PRIMARY KEY,
+        attempts INT NOT NULL DEFAULT 0,
+        completed INT NOT NULL DEFAULT 0,
+        failed INT NOT NULL DEFAULT 0,
+        units INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        last_sale_at TIMESTAMP NULL,
+        INDEX idx_sales_by_artist_revenue (revenue)
+    );
+    """
+    
+    sales_by_exhibition_table = """
+    CREATE TABLE IF NOT EXISTS sales_by_exhibition (
+        exhibition_id INT NOT NULL PRIMARY KEY,
+        attempts INT NOT NULL DEFAULT 0,
+        completed INT NOT NULL DEFAULT 0,
+        failed INT NOT NULL DEFAULT 0,
+        units INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        last_sale_at TIMESTAMP NULL,
+        INDEX idx_sales_by_exhibition_revenue (revenue)
+    );
+    """
+    
     try:
         cursor.execute(users_table)
         cursor.execute(admins_table)
@@ -170,11 +344,20 @@ def initialize_database():
         cursor.execute(exhibition_bookings_table)
         cursor.execute(contact_messages_table)
         cursor.execute(mpesa_transactions_table)
+        cursor.execute(item_popularity_table)
+        cursor.execute(ticket_checkins_table)
+        cursor.execute(exhibition_time_slots_table)
+        cursor.execute(exhibition_waitlist_table)
+        cursor.execute(sales_daily_table)
+        cursor.execute(sales_totals_table)
+        cursor.execute(sales_by_artist_table)
+        cursor.execute(sales_by_exhibition_table)
+        apply_migrations(cursor)
         connection.commit()
-        print("Database initialized successfully")
+        logger.info("Database initialized successfully")
         return True
     except Error as e:
-        print(f"Error initializing database: {e}")
+        logger.error("Error initializing database: %s", e)
         return False
     finally:
         if connection.is_connected():
@@ -2,9 +2,30 @@ from database import get_db_connection, dict_from_row, json_dumps
 from auth import verify_token
 import json
 from decimal import Decimal
+from logging_setup import get_logger
+from bulk_ops import patch_item
 
-def get_all_exhibitions():
-    """Get all exhibitions from the database"""
+logger = get_logger('exhibition')
+
+EXHIBITION_STATUSES = ("upcoming", "ongoing", "past")
+
+# Status as of today, so it is right even before the scheduled status update runs
+DERIVED_STATUS = """
+    CASE WHEN end_date < CURDATE() THEN 'past'
+         WHEN start_date > CURDATE() THEN 'upcoming'
+         ELSE 'ongoing' END
+"""
+
+# Each condition bounds start_date so it is a range of the (start_date, end_date)
+# index; start_date <= end_date makes the extra bound on 'past' redundant
+STATUS_CONDITIONS = {
+    "upcoming": "start_date > CURDATE()",
+    "ongoing": "start_date <= CURDATE() AND end_date >= CURDATE()",
+    "past": "start_date < CURDATE() AND end_date < CURDATE()"
+}
+
+def get_all_exhibitions(status=None, start=None, end=None):
+    """Get exhibitions, optionally only those with a status today or running within [start, end)"""
     connection = get_db_connection()
     if connection is None:
         return {"error": "Database connection failed"}
@@ -12,13 +33,28 @@ def get_all_exhibitions():
     cursor = connection.cursor()
     
     try:
-        query = """
+        conditions = []
+        params = []
+        if status is not None:
+            conditions.append(STATUS_CONDITIONS[status])
+        # Exhibitions overlapping the range
+        if end is not None:
+            conditions.append("start_date < %s")
+            params.append(end)
+        if start is not None:
+            conditions.append("end_date >= %s")
+            params.append(start)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        
+        query = f"""
         SELECT id, title, description, location, start_date, end_date,
-               ticket_price, image_url, total_slots, available_slots, status
+               ticket_price, image_url, total_slots, available_slots,
+               {DERIVED_STATUS} AS status, version
         FROM exhibitions
+        {where}
         ORDER BY start_date ASC
         """
-        cursor.execute(query)
+        cursor.execute(query, params)
         rows = cursor.fetchall()
         
         exhibitions = []
@@ -46,7 +82,7 @@ def get_all_exhibitions():
         
         return {"exhibitions": exhibitions}
     except Exception as e:
-        print(f"Error getting exhibitions: {e}")
+        logger.error("Error getting exhibitions: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
@@ -62,9 +98,10 @@ def get_exhibition(exhibition_id):
     cursor = connection.cursor()
     
     try:
-        query = """
+        query = f"""
         SELECT id, title, description, location, start_date, end_date,
-               ticket_price, image_url, total_slots, available_slots, status
+               ticket_price, image_url, total_slots, available_slots,
+               {DERIVED_STATUS} AS status, version
         FROM exhibitions
         WHERE id = %s
         """
@@ -95,7 +132,7 @@ def get_exhibition(exhibition_id):
         
         return exhibition
     except Exception as e:
-        print(f"Error getting exhibition: {e}")
+        logger.error("Error getting exhibition: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
@@ -109,12 +146,10 @@ def get_exhibition_by_id(exhibition_id):
 
 def create_exhibition(auth_header, exhibition_data):
     """Create a new exhibition (admin only)"""
-    print(f"\n--- Create Exhibition Request ---")
-    print(f"Auth Header: {auth_header}")
-    print(f"Exhibition Data: {exhibition_data}")
+    logger.debug("Create exhibition request")
     
     if not auth_header:
-        print("ERROR: Authentication header missing")
+        logger.error("Authentication header missing")
         return {"error": "Authentication required"}
     
     # Extract token from header - handle both formats
@@ -127,25 +162,23 @@ def create_exhibition(auth_header, exhibition_data):
             token = parts[1]
     
     if not token:
-        print("ERROR: No token found in header")
+        logger.error("No token found in header")
         return {"error": "Invalid authentication token"}
     
     # Verify token and check if user is admin
-    print(f"Verifying token: {token[:20]}...")
     payload = verify_token(token)
-    print(f"Token verification result: {payload}")
     
     # Check if verification returned an error
     if isinstance(payload, dict) and "error" in payload:
-        print(f"ERROR: Token verification failed: {payload['error']}")
+        logger.warning("Token verification failed: %s", payload['error'])
         return {"error": f"Authentication failed: {payload['error']}"}
     
     # Check if user is admin
     is_admin = payload.get("is_admin", False)
-    print(f"Is admin: {is_admin}")
+    logger.debug("Is admin: %s", is_admin)
     
     if not is_admin:
-        print("ERROR: Access denied - Not an admin user")
+        logger.warning("Access denied - Not an admin user")
         return {"error": "Unauthorized access: Admin privileges required"}
     
     # Continue with exhibition creation
@@ -161,10 +194,10 @@ def create_exhibition(auth_header, exhibition_data):
             try:
                 exhibition_data = json.loads(exhibition_data)
             except json.JSONDecodeError as e:
-                print(f"ERROR: Failed to parse exhibition data: {e}")
+                logger.error("Failed to parse exhibition data: %s", e)
                 return {"error": f"Invalid exhibition data format: {str(e)}"}
         
-        print(f"Inserting exhibition data: {exhibition_data}")
+        logger.debug("Inserting exhibition: %s", exhibition_data.get("title"))
         query = """
         INSERT INTO exhibitions (title, description, location, start_date, end_date,
                                ticket_price, image_url, total_slots, available_slots, status)
@@ -190,25 +223,23 @@ def create_exhibition(auth_header, exhibition_data):
         
         # Return the newly created exhibition
         new_exhibition_id = cursor.lastrowid
-        print(f"Exhibition created successfully with ID: {new_exhibition_id}")
+        logger.debug("Exhibition created successfully with ID: %s", new_exhibition_id)
         return get_exhibition(new_exhibition_id)
     except Exception as e:
-        print(f"ERROR creating exhibition: {e}")
+        logger.error("Error creating exhibition: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
             cursor.close()
             connection.close()
 
-def update_exhibition(auth_header, exhibition_id, exhibition_data):
-    """Update an existing exhibition (admin only)"""
+def update_exhibition(auth_header, exhibition_id, exhibition_data, expected_version=None):
+    """Update an existing exhibition (admin only), optionally only if it is still at expected_version"""
     # Debug input
-    print(f"Update exhibition called with auth_header: {auth_header}")
-    print(f"Exhibition ID: {exhibition_id}")
-    print(f"Exhibition data: {exhibition_data}")
+    logger.debug("Update exhibition %s", exhibition_id)
     
     if not auth_header:
-        print("Error: No authentication header provided")
+        logger.error("No authentication header provided")
         return {"error": "Authentication required"}
     
     # Extract token from header
@@ -219,23 +250,19 @@ def update_exhibition(auth_header, exhibition_id, exhibition_data):
         token = auth_header.split(" ")[1] if len(auth_header.split(" ")) > 1 else None
         
     if not token:
-        print("Error: Invalid authentication token format")
+        logger.error("Invalid authentication token format")
         return {"error": "Invalid authentication token"}
     
-    # Debug token verification
-    print(f"Verifying token for update_exhibition: {token}")
-    
     # Verify token and check if user is admin
     payload = verify_token(token)
-    print(f"Token verification result: {payload}")
     
     if isinstance(payload, dict) and "error" in payload:
-        print(f"Token verification error: {payload['error']}")
+        logger.warning("Token verification error: %s", payload['error'])
         return payload
     
     # Check if user is admin
     if not payload.get("is_admin", False):
-        print(f"Admin check failed. Payload: {payload}")
+        logger.warning("Admin check failed for subject %s", payload.get("sub"))
         return {"error": "Unauthorized access: Not an admin"}
     
     connection = get_db_connection()
@@ -248,10 +275,11 @@ def update_exhibition(auth_header, exhibition_id, exhibition_data):
         query = """
         UPDATE exhibitions
         SET title = %s, description = %s, location = %s, start_date = %s, end_date = %s,
-            ticket_price = %s, image_url = %s, total_slots = %s, available_slots = %s, status = %s
+            ticket_price = %s, image_url = %s, total_slots = %s, available_slots = %s, status = %s,
+            version = version + 1
         WHERE id = %s
         """
-        cursor.execute(query, (
+        params = [
             exhibition_data.get("title"),
             exhibition_data.get("description"),
             exhibition_data.get("location"),
@@ -263,31 +291,62 @@ def update_exhibition(auth_header, exhibition_id, exhibition_data):
             exhibition_data.get("availableSlots"),
             exhibition_data.get("status"),
             exhibition_id
-        ))
+        ]
+        # Optimistic concurrency: only update the version the client last read
+        if expected_version is not None:
+            query += " AND version = %s"
+            params.append(expected_version)
+        cursor.execute(query, tuple(params))
         connection.commit()
         
         # Check if exhibition was found and updated
         if cursor.rowcount == 0:
+            cursor.execute("SELECT version FROM exhibitions WHERE id = %s", (exhibition_id,))
+            row = cursor.fetchone()
+            if row:
+                return {"error": "Version conflict", "version": row[0]}
             return {"error": "Exhibition not found"}
         
         # Return the updated exhibition
         return get_exhibition(exhibition_id)
     except Exception as e:
-        print(f"Error updating exhibition: {e}")
+        logger.error("Error updating exhibition: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
             cursor.close()
             connection.close()
 
+def patch_exhibition(auth_header, exhibition_id, changes, expected_version=None):
+    """Update only the supplied fields of an exhibition (admin only), optionally only if it is still at expected_version"""
+    if not auth_header:
+        return {"error": "Authentication required"}
+    
+    # Extract token from header
+    token = auth_header.split(" ")[1] if len(auth_header.split(" ")) > 1 else None
+    if not token:
+        return {"error": "Invalid authentication token"}
+    
+    # Verify token and check if user is admin
+    payload = verify_token(token)
+    if isinstance(payload, dict) and "error" in payload:
+        return {"error": f"Token verification failed: {payload['error']}"}
+    if not payload.get("is_admin"):
+        logger.warning("Access denied: Not an admin user")
+        return {"error": "Unauthorized access: Not an admin"}
+    
+    result = patch_item('exhibitions', exhibition_id, changes, expected_version)
+    if result.get("error") == "Not found":
+        return {"error": "Exhibition not found"}
+    return result
+
 def delete_exhibition(auth_header, exhibition_id):
     """Delete an exhibition (admin only)"""
     # Debug input
-    print(f"Delete exhibition called with auth_header: {auth_header}")
-    print(f"Exhibition ID: {exhibition_id}")
+    logger.debug("Delete exhibition %s", exhibition_id)
     
     if not auth_header:
-        print("Error: No authentication header provided")
+        logger.error("No authentication header provided")
         return {"error": "Authentication required"}
     
     # Extract token from header
@@ -298,23 +357,19 @@ def delete_exhibition(auth_header, exhibition_id):
         token = auth_header.split(" ")[1] if len(auth_header.split(" ")) > 1 else None
         
     if not token:
-        print("Error: Invalid authentication token format")
+        logger.error("Invalid authentication token format")
         return {"error": "Invalid authentication token"}
     
-    # Debug token verification
-    print(f"Verifying token for delete_exhibition: {token}")
-    
     # Verify token and check if user is admin
     payload = verify_token(token)
-    print(f"Token verification result: {payload}")
     
     if isinstance(payload, dict) and "error" in payload:
-        print(f"Token verification error: {payload['error']}")
+        logger.warning("Token verification error: %s", payload['error'])
         return payload
     
     # Check if user is admin
     if not payload.get("is_admin", False):
-        print(f"Admin check failed. Payload: {payload}")
+        logger.warning("Admin check failed for subject %s", payload.get("sub"))
         return {"error": "Unauthorized access: Not an admin"}
     
     connection = get_db_connection()
@@ -334,7 +389,7 @@ def delete_exhibition(auth_header, exhibition_id):
         
         return {"success": True, "message": "Exhibition deleted successfully"}
     except Exception as e:
-        print(f"Error deleting exhibition: {e}")
+        logger.error("Error deleting exhibition: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
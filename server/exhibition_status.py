@@ -0,0 +1,104 @@
+"""
+Scheduled update of the stored exhibition status.
+
+Exhibition lists and lookups derive 'upcoming' / 'ongoing' / 'past' from the
+dates in SQL (exhibition.DERIVED_STATUS), but the status column is still read
+by exports, search and bulk edits. Every EXHIBITION_STATUS_INTERVAL seconds a
+background thread rewrites the rows whose stored status no longer matches
+their dates: one UPDATE per status, each a range of the (start_date,
+end_date) index. Rows changed get a new version like any other write, so
+ETags and catalogue sync pick them up. MySQL GET_LOCK keeps a pass to one
+worker at a time.
+"""
+
+import os
+import time
+import threading
+from database import get_db_connection
+from cache import invalidate_catalogue
+from exhibition import EXHIBITION_STATUSES, STATUS_CONDITIONS
+from logging_setup import get_logger
+
+logger = get_logger('exhibition_status')
+
+EXHIBITION_STATUS_INTERVAL = float(os.environ.get('EXHIBITION_STATUS_INTERVAL', '3600'))
+
+STATUS_STATS = {
+    "runs": 0,
+    "updated": 0,
+    "errors": 0,
+    "last_run": None
+}
+
+_lock = threading.Lock()
+_state = {"thread": None, "pid": None}
+
+def update_exhibition_statuses():
+    """Set the stored status of every exhibition whose dates have moved it on; return how many changed"""
+    connection = get_db_connection()
+    if connection is None:
+        STATUS_STATS["errors"] += 1
+        return None
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT GET_LOCK('exhibition_status', 0)")
+        if not cursor.fetchone()[0]:
+            # Another worker is running the update
+            return 0
+        try:
+            updated = 0
+            for status in EXHIBITION_STATUSES:
+                cursor.execute(f"""
+                    UPDATE exhibitions SET status = %s, version = version + 1
+                    WHERE {STATUS_CONDITIONS[status]} AND status <> %s
+                """, (status, status))
+                updated += cursor.rowcount
+            connection.commit()
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('exhibition_status')")
+            cursor.fetchone()
+
+        STATUS_STATS["runs"] += 1
+        STATUS_STATS["updated"] += updated
+        STATUS_STATS["last_run"] = time.time()
+        if updated:
+            logger.info("Updated the status of %d exhibitions", updated)
+            invalidate_catalogue('exhibitions')
+        return updated
+    except Exception as e:
+        connection.rollback()
+        STATUS_STATS["errors"] += 1
+        logger.error("Error updating exhibition statuses: %s", e)
+        return None
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _run():
+    while True:
+        update_exhibition_statuses()
+        time.sleep(EXHIBITION_STATUS_INTERVAL)
+
+def start_status_updates():
+    """Start the status thread in this process if it is not already running"""
+    pid = os.getpid()
+    if _state["pid"] == pid:
+        return
+    with _lock:
+        if _state["pid"] == pid:
+            return
+        thread = threading.Thread(target=_run, name='exhibition-status', daemon=True)
+        _state["thread"] = thread
+        _state["pid"] = pid
+        thread.start()
+
+def init_exhibition_status(app):
+    """Start the scheduled status update on the first request each worker serves"""
+    app.before_request(start_status_updates)
+
+def get_status_stats():
+    """Return status update counters"""
+    return dict(STATUS_STATS)
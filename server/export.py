@@ -0,0 +1,180 @@
+"""
+Streaming data exports for admins.
+
+Rows are read through an unbuffered (server-side) cursor EXPORT_CHUNK_SIZE at
+a time and serialized to NDJSON or CSV as they arrive, optionally gzip-
+compressed on the fly, so memory use stays flat however many rows are
+exported. Rows are returned in primary-key order and can be limited to a date
+range on each table's timestamp column.
+"""
+
+import io
+import os
+import csv
+import json
+import zlib
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from database import get_db_connection
+from logging_setup import get_logger
+
+logger = get_logger('export')
+
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '1000'))
+EXPORT_GZIP_LEVEL = int(os.environ.get('EXPORT_GZIP_LEVEL', '6'))
+
+# Export name -> (SELECT ... FROM ..., column filtered by from/to, ordering column)
+EXPORTS = {
+    "artworks": ("""
+        SELECT id, title, artist, description, price, image_url, dimensions,
+               medium, year, status, created_at
+        FROM artworks
+    """, "created_at", "id"),
+    "exhibitions": ("""
+        SELECT id, title, description, location, start_date, end_date, ticket_price,
+               image_url, total_slots, available_slots, status, created_at
+        FROM exhibitions
+    """, "created_at", "id"),
+    "bookings": ("""
+        SELECT b.id, b.user_id, b.exhibition_id, e.title AS exhibition_title, b.name,
+               b.email, b.phone, b.slots, b.payment_method, b.payment_status,
+               b.mpesa_transaction_id, b.booking_date, b.total_amount
+        FROM exhibition_bookings b
+        LEFT JOIN exhibitions e ON e.id = b.exhibition_id
+    """, "b.booking_date", "b.id"),
+    "orders": ("""
+        SELECT o.id, o.user_id, o.artwork_id, a.title AS artwork_title, a.artist,
+               o.name, o.email, o.phone, o.delivery_address, o.payment_method,
+               o.payment_status, o.mpesa_transaction_id, o.order_date, o.total_amount
+        FROM artwork_orders o
+        LEFT JOIN artworks a ON a.id = o.artwork_id
+    """, "o.order_date", "o.id"),
+    "transactions": ("""
+        SELECT id, checkout_request_id, merchant_request_id, order_type, order_id,
+               user_id, amount, phone_number, result_code, result_desc,
+               transaction_date, status
+        FROM mpesa_transactions
+    """, "transaction_date", "id"),
+}
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def parse_date_range(since, until):
+    """Parse from/to query values (YYYY-MM-DD, inclusive) into a [start, end) pair"""
+    try:
+        start = datetime.strptime(since, "%Y-%m-%d") if since else None
+        end = datetime.strptime(until, "%Y-%m-%d") + timedelta(days=1) if until else None
+    except ValueError:
+        return None, None, "from and to must be dates (YYYY-MM-DD)"
+    if start and end and end <= start:
+        return None, None, "to must not be before from"
+    return start, end, None
+
+def open_export(kind, start=None, end=None):
+    """Run an export query; return (connection, cursor, column names) or an error dict"""
+    if kind not in EXPORTS:
+        return {"error": f"Unknown export: {kind}"}
+    base_query, date_column, order_column = EXPORTS[kind]
+
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append(f"{date_column} >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{date_column} < %s")
+        params.append(end)
+    query = base_query
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {order_column}"
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+    # Unbuffered: rows stay on the server until fetched
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(query, tuple(params))
+    except Exception as e:
+        logger.error("Error starting %s export: %s", kind, e)
+        cursor.close()
+        connection.close()
+        return {"error": str(e)}
+    columns = [description[0] for description in cursor.description]
+    return connection, cursor, columns
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _ndjson_chunks(columns, chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in rows)
+
+def _csv_chunks(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(
+            [value.isoformat() if isinstance(value, (datetime, date)) else value for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header-only export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _gzip_chunks(chunks, level=EXPORT_GZIP_LEVEL):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_export(kind, connection, cursor, columns, export_format='ndjson', gzip=False,
+                  chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the serialized export, closing the cursor and connection when done"""
+    exported = [0]
+
+    def fetch():
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            exported[0] += len(rows)
+            yield rows
+
+    serialize = _csv_chunks if export_format == 'csv' else _ndjson_chunks
+    chunks = serialize(columns, fetch())
+    if gzip:
+        chunks = _gzip_chunks(chunks)
+    finished = False
+    try:
+        for chunk in chunks:
+            yield chunk if gzip else chunk.encode('utf-8')
+        finished = True
+    finally:
+        if finished:
+            cursor.close()
+            connection.close()
+        else:
+            # The client went away mid-export: drop the socket rather than
+            # reading the remaining rows just to close the cursor cleanly
+            try:
+                connection.shutdown()
+            except Exception as e:
+                logger.warning("Error closing aborted %s export: %s", kind, e)
+        logger.info("Exported %s %s rows%s", exported[0], kind, "" if finished else " (aborted)")
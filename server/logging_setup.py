@@ -0,0 +1,172 @@
+"""
+Structured, non-blocking logging for the server.
+
+Loggers obtained from get_logger() hand records to a bounded in-memory queue;
+a single background QueueListener thread formats them (JSON by default) and
+writes them out, so request threads never wait on stdout or disk. When the
+queue is full records are dropped and counted rather than blocking. Debug
+records are sampled at LOG_DEBUG_SAMPLE_RATE and every record carries the id
+of the request that produced it.
+"""
+
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_FILE = os.environ.get('LOG_FILE')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '0.01'))
+
+ROOT_LOGGER = 'gallery'
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+_setup_lock = threading.Lock()
+_listener = None
+
+LOGGING_STATS = {
+    "dropped_records": 0,
+    "sampled_out_records": 0
+}
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRS = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime', 'request_id'}
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        if getattr(record, 'request_id', None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id to every record"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+class DebugSamplingFilter(logging.Filter):
+    """Let through only a sample of DEBUG records"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        if random.random() < self.rate:
+            return True
+        LOGGING_STATS["sampled_out_records"] += 1
+        return False
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOGGING_STATS["dropped_records"] += 1
+
+def _build_output_handlers():
+    if LOG_FILE:
+        os.makedirs(os.path.dirname(os.path.abspath(LOG_FILE)), exist_ok=True)
+        handler = logging.FileHandler(LOG_FILE)
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'))
+    return [handler]
+
+def add_output_handler(handler):
+    """Attach an extra handler to the background listener, e.g. a dedicated log file"""
+    setup_logging()
+    _listener.handlers = tuple(_listener.handlers) + (handler,)
+
+def setup_logging():
+    """Configure the gallery logger hierarchy once per process"""
+    global _listener
+    if _listener is not None:
+        return
+    with _setup_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(RequestIdFilter())
+        queue_handler.addFilter(DebugSamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.addHandler(queue_handler)
+        root.propagate = False
+
+        listener = QueueListener(log_queue, *_build_output_handlers(), respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        _listener = listener
+
+def get_logger(name):
+    """Return a logger under the gallery hierarchy"""
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+def get_request_id():
+    """Return the id of the request being served, if any"""
+    return _request_id.get()
+
+def assign_request_id():
+    """before_request hook: adopt the caller's X-Request-ID or generate one"""
+    from flask import request, g
+    request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_id = request_id[:64]
+    g.request_id_token = _request_id.set(g.request_id)
+
+def attach_request_id(response):
+    """after_request hook: echo the request id back to the client"""
+    from flask import g
+    if g.get('request_id'):
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+def clear_request_id(exception=None):
+    """teardown_request hook: reset the request id context"""
+    from flask import g
+    token = g.get('request_id_token')
+    if token is not None:
+        _request_id.reset(token)
+
+def init_request_logging(app):
+    """Register the request id hooks on a Flask app"""
+    app.before_request(assign_request_id)
+    app.after_request(attach_request_id)
+    app.teardown_request(clear_request_id)
+
+def get_logging_stats():
+    """Return counters for dropped and sampled-out records"""
+    return dict(LOGGING_STATS)
@@ -0,0 +1,314 @@
+"""
+Request timing middleware and Prometheus text exposition.
+
+Every worker keeps its own counters in memory. When METRICS_DIR is set (a
+directory shared by all workers of one deployment), a background thread in each
+worker also writes a snapshot of its counters there every
+METRICS_FLUSH_INTERVAL seconds, and /metrics sums the snapshots of every worker
+so counters and histograms aggregate correctly no matter which worker answers
+the scrape.
+
+A worker that has exited keeps counting towards the request counters and
+histograms, but not towards gauges or collector values. The flush threads fold
+the request counters of exited workers into one retired snapshot and delete
+their files, under a file lock so each is folded once.
+"""
+
+import os
+import json
+import time
+import fcntl
+import atexit
+import bisect
+import threading
+from flask import request, g
+from logging_setup import get_logger
+
+logger = get_logger('metrics')
+
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+
+# Upper bounds in seconds / bytes; the implicit last bucket is +Inf
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_lock = threading.Lock()
+_requests = {}
+_errors = {}
+_durations = {}
+_sizes = {}
+_in_flight = [0]
+_state = {"thread": None, "pid": None}
+_start_lock = threading.Lock()
+
+RETIRED_SNAPSHOT = "metrics-retired.json"
+# Snapshot fields that are counters, so still count once their worker has exited
+COUNTER_FIELDS = ("requests", "errors", "durations", "sizes")
+
+# Extra per-worker stats sources, e.g. cache or Daraja client counters.
+# Each callable returns a flat dict of numbers.
+_collectors = {}
+
+def register_collector(name, collect):
+    """Expose the numeric values returned by collect() as <name>_<key> metrics"""
+    _collectors[name] = collect
+
+def _observe(table, key, buckets, value):
+    """Add one observation to a histogram stored as [bucket counts..., sum, count]"""
+    histogram = table.get(key)
+    if histogram is None:
+        histogram = table[key] = [0] * (len(buckets) + 3)
+    histogram[bisect.bisect_left(buckets, value)] += 1
+    histogram[-2] += value
+    histogram[-1] += 1
+
+def _route_label():
+    """Return the route template for the current request"""
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+def start_request_timer():
+    """before_request hook: note the start time and bump the in-flight gauge"""
+    g.metrics_start = time.perf_counter()
+    with _lock:
+        _in_flight[0] += 1
+
+def record_request(response):
+    """after_request hook: record duration, size and status for the route"""
+    start = g.get('metrics_start')
+    if start is None:
+        return response
+    duration = time.perf_counter() - start
+    key = (request.method, _route_label())
+    size = response.calculate_content_length() or 0
+
+    with _lock:
+        status_key = key + (str(response.status_code),)
+        _requests[status_key] = _requests.get(status_key, 0) + 1
+        if response.status_code >= 500:
+            _errors[key] = _errors.get(key, 0) + 1
+        _observe(_durations, key, LATENCY_BUCKETS, duration)
+        _observe(_sizes, key, SIZE_BUCKETS, size)
+
+    g.metrics_recorded = True
+    return response
+
+def finish_request(exception=None):
+    """teardown_request hook: drop the in-flight gauge and count unhandled errors"""
+    if g.get('metrics_start') is None:
+        return
+    with _lock:
+        _in_flight[0] -= 1
+        if exception is not None and not g.get('metrics_recorded'):
+            key = (request.method, _route_label())
+            _errors[key] = _errors.get(key, 0) + 1
+
+def _run_flush():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        flush_snapshot()
+        retire_dead_snapshots()
+
+def start_metrics_flush():
+    """Start the snapshot flush thread in this process if it is not already running"""
+    pid = os.getpid()
+    if _state["pid"] == pid:
+        return
+    with _start_lock:
+        if _state["pid"] == pid:
+            return
+        thread = threading.Thread(target=_run_flush, name='metrics-flush', daemon=True)
+        _state["thread"] = thread
+        _state["pid"] = pid
+        thread.start()
+    atexit.register(flush_snapshot)
+
+def init_metrics(app):
+    """Register the timing hooks on a Flask app, and the snapshot flush when METRICS_DIR is set"""
+    app.before_request(start_request_timer)
+    app.after_request(record_request)
+    app.teardown_request(finish_request)
+    if METRICS_DIR:
+        app.before_request(start_metrics_flush)
+
+def snapshot():
+    """Return this worker's metrics as a JSON-serializable dict"""
+    with _lock:
+        data = {
+            "pid": os.getpid(),
+            "requests": [list(key) + [value] for key, value in _requests.items()],
+            "errors": [list(key) + [value] for key, value in _errors.items()],
+            "durations": [list(key) + [list(value)] for key, value in _durations.items()],
+            "sizes": [list(key) + [list(value)] for key, value in _sizes.items()],
+            "in_flight": _in_flight[0]
+        }
+    collected = {}
+    for name, collect in list(_collectors.items()):
+        try:
+            for key, value in collect().items():
+                if isinstance(value, (int, float)):
+                    collected[f"{name}_{key}"] = value
+        except Exception as e:
+            logger.error("Error collecting %s metrics: %s", name, e)
+    data["collected"] = collected
+    return data
+
+def flush_snapshot():
+    """Write this worker's snapshot into METRICS_DIR atomically"""
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        _write_snapshot(f"metrics-{os.getpid()}.json", snapshot())
+    except Exception as e:
+        logger.error("Error writing metrics snapshot: %s", e)
+
+def _write_snapshot(filename, data):
+    path = os.path.join(METRICS_DIR, filename)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+def _snapshot_files():
+    """Yield (filename, data) for every snapshot file in METRICS_DIR"""
+    if not METRICS_DIR or not os.path.isdir(METRICS_DIR):
+        return
+    for filename in os.listdir(METRICS_DIR):
+        if not filename.startswith("metrics-") or not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, filename)) as f:
+                yield filename, json.load(f)
+        except (OSError, ValueError):
+            continue
+
+def _counters_only(data):
+    return {field: data.get(field, []) for field in COUNTER_FIELDS}
+
+def _load_snapshots():
+    """Return the live snapshot of this worker plus the files of all others"""
+    snapshots = [snapshot()]
+    own_pid = os.getpid()
+    for filename, data in _snapshot_files():
+        pid = data.get("pid")
+        if pid == own_pid:
+            continue
+        # Counters of exited workers still count; their gauges and collector values do not
+        if pid is None or not _pid_alive(pid):
+            data = _counters_only(data)
+        snapshots.append(data)
+    return snapshots
+
+def retire_dead_snapshots():
+    """Fold the counters of exited workers into the retired snapshot and delete their files"""
+    try:
+        with open(os.path.join(METRICS_DIR, "metrics.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            files = dict(_snapshot_files())
+            retired = files.pop(RETIRED_SNAPSHOT, {})
+            dead = [filename for filename, data in files.items()
+                    if data.get("pid") is not None and not _pid_alive(data["pid"])]
+            if not dead:
+                return
+            for filename in dead:
+                retired = _fold(retired, files[filename])
+            _write_snapshot(RETIRED_SNAPSHOT, retired)
+            for filename in dead:
+                os.remove(os.path.join(METRICS_DIR, filename))
+    except Exception as e:
+        logger.error("Error retiring metrics snapshots: %s", e)
+
+def _fold(retired, data):
+    """Return the counters of two snapshots added together"""
+    snapshots = [retired, data]
+    folded = {}
+    for field in ("requests", "errors"):
+        folded[field] = [list(key) + [value] for key, value in _merge_counts(snapshots, field).items()]
+    for field in ("durations", "sizes"):
+        folded[field] = [list(key) + [values] for key, values in _merge_histograms(snapshots, field).items()]
+    return folded
+
+def _merge_counts(snapshots, field):
+    merged = {}
+    for data in snapshots:
+        for row in data.get(field, []):
+            key = tuple(row[:-1])
+            merged[key] = merged.get(key, 0) + row[-1]
+    return merged
+
+def _merge_histograms(snapshots, field):
+    merged = {}
+    for data in snapshots:
+        for row in data.get(field, []):
+            key = tuple(row[:-1])
+            values = row[-1]
+            current = merged.get(key)
+            if current is None:
+                merged[key] = list(values)
+            else:
+                merged[key] = [a + b for a, b in zip(current, values)]
+    return merged
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _render_histogram(lines, name, help_text, histograms, buckets):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), values in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(buckets, values):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+        cumulative += values[len(buckets)]
+        lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {cumulative}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {values[-2]}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {values[-1]}")
+
+def render_metrics():
+    """Render the metrics of all workers in Prometheus text format"""
+    snapshots = _load_snapshots()
+    lines = []
+
+    lines.append("# HELP http_requests_total Requests by method, route and status")
+    lines.append("# TYPE http_requests_total counter")
+    for (method, route, status), count in sorted(_merge_counts(snapshots, "requests").items()):
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines.append("# HELP http_request_errors_total Requests that failed with a 5xx or an unhandled exception")
+    lines.append("# TYPE http_request_errors_total counter")
+    for (method, route), count in sorted(_merge_counts(snapshots, "errors").items()):
+        lines.append(f"http_request_errors_total{_labels(method=method, route=route)} {count}")
+
+    _render_histogram(lines, "http_request_duration_seconds", "Request latency by route",
+                      _merge_histograms(snapshots, "durations"), LATENCY_BUCKETS)
+    _render_histogram(lines, "http_response_size_bytes", "Response body size by route",
+                      _merge_histograms(snapshots, "sizes"), SIZE_BUCKETS)
+
+    lines.append("# HELP http_requests_in_flight Requests currently being served")
+    lines.append("# TYPE http_requests_in_flight gauge")
+    lines.append(f"http_requests_in_flight {sum(data.get('in_flight', 0) for data in snapshots)}")
+
+    lines.append("# HELP gallery_workers Worker processes reporting metrics")
+    lines.append("# TYPE gallery_workers gauge")
+    lines.append(f"gallery_workers {sum(1 for data in snapshots if 'pid' in data)}")
+
+    collected = {}
+    for data in snapshots:
+        for key, value in data.get("collected", {}).items():
+            collected[key] = collected.get(key, 0) + value
+    for key, value in sorted(collected.items()):
+        lines.append(f"# TYPE gallery_{key} untyped")
+        lines.append(f"gallery_{key} {value}")
+
+    return "\n".join(lines) + "\n"
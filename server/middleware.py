@@ -5,6 +5,9 @@ from functools import wraps
 from http.server import BaseHTTPRequestHandler
 from decimal import Decimal
 import json
+from logging_setup import get_logger
+
+logger = get_logger('middleware')
 
 # Secret key for JWT token generation - replace with a secure random string
 SECRET_KEY = "your_secret_key_replace_this_with_a_secure_random_string"
@@ -25,25 +28,24 @@ def generate_token(user_id, name, is_admin):
         "exp": datetime.datetime.utcnow() + datetime.timedelta(days=1)
     }
     
-    print(f"Generating token with payload: {payload}")
+    logger.debug("Generating token for subject %s (admin: %s)", payload["sub"], is_admin)
     token = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
     return token
 
 def verify_token(token):
     """Verify a JWT token"""
     try:
-        print(f"Verifying token: {token[:20]}...")
         payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        print(f"Token decoded successfully: {payload}")
+        logger.debug("Token decoded for subject %s", payload.get("sub"))
         return payload
     except jwt.ExpiredSignatureError:
-        print("Token verification failed: Token expired")
+        logger.info("Token verification failed: Token expired")
         return {"error": "Token expired"}
     except jwt.InvalidTokenError as e:
-        print(f"Token verification failed: Invalid token - {str(e)}")
+        logger.warning("Token verification failed: Invalid token - %s", str(e))
         return {"error": f"Invalid token: {str(e)}"}
     except Exception as e:
-        print(f"Unexpected error during token verification: {str(e)}")
+        logger.error("Unexpected error during token verification: %s", str(e))
         return {"error": f"Token verification error: {str(e)}"}
 
 def extract_auth_token(handler: BaseHTTPRequestHandler):
@@ -115,3 +117,9 @@ def json_dumps(data):
     """Safely convert data to JSON string, handling Decimal types"""
     return json.dumps(data, cls=DecimalEncoder)
 
+
+def set_cors_headers(response):
+    """Flask after_request hook: fill in CORS headers flask-cors leaves unset"""
+    response.headers.setdefault('Access-Control-Allow-Headers', 'Content-Type, Authorization, If-Match')
+    response.headers.setdefault('Access-Control-Allow-Methods', 'GET, POST, PUT, PATCH, DELETE, OPTIONS')
+    return response
@@ -6,6 +6,12 @@ from datetime import datetime
 import time
 from db_setup import get_db_connection, dict_from_row
 from mysql.connector import Error
+from logging_setup import get_logger
+from tracing import span, inject_traceparent
+from analytics import ORDER_TABLES, record_payment_attempt, record_payment_result
+from time_slots import release_time_slot, retake_time_slot
+
+logger = get_logger('mpesa')
 
 # M-Pesa API credentials
 CONSUMER_KEY = "sMwMwGZ8oOiSkNrUIrPbcCeWIO8UiQ3SV4CyX739uAyZVs1F"
@@ -15,6 +21,37 @@ PASSKEY = "bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919"
 CALLBACK_URL = "https://webhook.site/3c1f62b5-4214-47d6-9f26-71c1f4b9c8f0"
 API_BASE_URL = "https://sandbox.safaricom.co.ke"
 
+# Daraja client counters exposed on /metrics
+DARAJA_STATS = {
+    "requests": 0,
+    "errors": 0,
+    "request_seconds_total": 0.0
+}
+
+def daraja_request(method, url, **kwargs):
+    """Send an HTTP request to the Daraja API, recording call counts and latency"""
+    path = url[len(API_BASE_URL):].split('?')[0]
+    with span(f"daraja {method} {path}", kind='client', **{"http.method": method, "http.url": path}) as daraja_span:
+        kwargs["headers"] = inject_traceparent(dict(kwargs.get("headers") or {}))
+        start = time.perf_counter()
+        DARAJA_STATS["requests"] += 1
+        try:
+            response = requests.request(method, url, **kwargs)
+            if daraja_span is not None:
+                daraja_span.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 400:
+                DARAJA_STATS["errors"] += 1
+            return response
+        except Exception:
+            DARAJA_STATS["errors"] += 1
+            raise
+        finally:
+            DARAJA_STATS["request_seconds_total"] += time.perf_counter() - start
+
+def get_daraja_stats():
+    """Return Daraja client counters"""
+    return dict(DARAJA_STATS)
+
 def get_access_token():
     """Get OAuth access token from M-Pesa"""
     url = f"{API_BASE_URL}/oauth/v1/generate?grant_type=client_credentials"
@@ -24,16 +61,16 @@ def get_access_token():
     }
     
     try:
-        response = requests.get(url, headers=headers)
+        response = daraja_request("GET", url, headers=headers)
         response_data = response.json()
         
         if "access_token" in response_data:
             return response_data["access_token"]
         else:
-            print("Error getting access token:", response_data)
+            logger.error("Error getting access token: %s", response_data)
             return None
     except Exception as e:
-        print(f"Exception while getting access token: {e}")
+        logger.error("Exception while getting access token: %s", e)
         return None
 
 def generate_password():
@@ -78,9 +115,9 @@ def initiate_stk_push(phone_number, amount, account_reference, order_type, order
     }
     
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = daraja_request("POST", url, json=payload, headers=headers)
         result = response.json()
-        print(f"STK Push result: {result}")
+        logger.info("STK Push result: %s", result.get("ResponseCode", result.get("errorCode")))
         
         if "ResponseCode" in result and result["ResponseCode"] == "0":
             # Save transaction to database
@@ -105,7 +142,7 @@ def initiate_stk_push(phone_number, amount, account_reference, order_type, order
                 "details": result
             }
     except Exception as e:
-        print(f"Exception during STK Push: {e}")
+        logger.error("Exception during STK Push: %s", e)
         return {"error": str(e)}
 
 def check_transaction_status(checkout_request_id):
@@ -152,9 +189,9 @@ def check_transaction_status(checkout_request_id):
             }
             
             try:
-                response = requests.post(url, json=payload, headers=headers)
+                response = daraja_request("POST", url, json=payload, headers=headers)
                 result = response.json()
-                print(f"Transaction status query result: {result}")
+                logger.info("Transaction status query result: %s", result.get("ResultCode"))
                 
                 if "ResultCode" in result:
                     if result["ResultCode"] == "0":
@@ -198,7 +235,7 @@ def check_transaction_status(checkout_request_id):
                         "message": "Payment is being processed"
                     }
             except Exception as e:
-                print(f"Exception during status check: {e}")
+                logger.error("Exception during status check: %s", e)
                 return {"error": str(e)}
         else:
             # Return status from database
@@ -208,7 +245,7 @@ def check_transaction_status(checkout_request_id):
                           "Payment completed" if transaction["status"] == "completed" else "Payment failed"
             }
     except Exception as e:
-        print(f"Error checking transaction: {e}")
+        logger.error("Error checking transaction: %s", e)
         return {"error": str(e)}
     finally:
         if connection.is_connected():
@@ -239,9 +276,10 @@ def save_transaction_request(checkout_request_id, merchant_request_id, order_typ
             phone_number
         ))
         connection.commit()
+        record_payment_attempt(connection, order_type, order_id)
         return True
     except Error as e:
-        print(f"Error saving transaction: {e}")
+        logger.error("Error saving transaction: %s", e)
         return False
     finally:
         if connection.is_connected():
@@ -266,7 +304,7 @@ def update_transaction_status(checkout_request_id, status, result_code=None, res
         connection.commit()
         return True
     except Error as e:
-        print(f"Error updating transaction: {e}")
+        logger.error("Error updating transaction: %s", e)
         return False
     finally:
         if connection.is_connected():
@@ -286,45 +324,68 @@ def update_order_status(order_type, order_id, payment_status):
             query = """
             UPDATE artwork_orders
             SET payment_status = %s
-            WHERE id = %s
+            WHERE id = %s AND payment_status <> %s
             """
         elif order_type == "exhibition":
             query = """
             UPDATE exhibition_bookings
-            SET payment_status = %s
-            WHERE id = %s
+            SET payment_status = %s, version = version + 1
+            WHERE id = %s AND payment_status <> %s
             """
         else:
             return False
         
-        cursor.execute(query, (payment_status, order_id))
-        connection.commit()
+        # Lock the order and read the status it is leaving, for the rollups
+        cursor.execute(f"SELECT payment_status FROM {ORDER_TABLES[order_type][0]} WHERE id = %s FOR UPDATE",
+                       (order_id,))
+        row = cursor.fetchone()
+        previous_status = row[0] if row else None
+        
+        # A failed slot booking has given its places back; it can only complete
+        # if it takes them again, otherwise it stays failed and is owed a refund
+        if order_type == "exhibition" and payment_status == "completed":
+            if not retake_time_slot(cursor, order_id):
+                connection.commit()
+                return True
+        
+        cursor.execute(query, (payment_status, order_id, payment_status))
+        # A repeated callback or status check finds the status already set;
+        # the side effects below must only run on the transition itself
+        if cursor.rowcount == 0:
+            connection.commit()
+            return True
         
         # If it's an artwork order and payment is completed, update artwork status
         if order_type == "artwork" and payment_status == "completed":
             query = """
             UPDATE artworks a
             JOIN artwork_orders o ON a.id = o.artwork_id
-            SET a.status = 'sold'
+            SET a.status = 'sold', a.version = a.version + 1
             WHERE o.id = %s
             """
             cursor.execute(query, (order_id,))
-            connection.commit()
         
         # If it's an exhibition booking and payment is completed, update available slots
         if order_type == "exhibition" and payment_status == "completed":
             query = """
             UPDATE exhibitions e
             JOIN exhibition_bookings b ON e.id = b.exhibition_id
-            SET e.available_slots = e.available_slots - b.slots
+            SET e.available_slots = e.available_slots - b.slots, e.version = e.version + 1
             WHERE b.id = %s
             """
             cursor.execute(query, (order_id,))
-            connection.commit()
         
+        # A failed booking gives its places in a timed-entry slot back
+        if order_type == "exhibition" and payment_status == "failed":
+            release_time_slot(cursor, order_id)
+        
+        connection.commit()
+        # A rollup error is logged there; the status change above stands
+        record_payment_result(connection, order_type, order_id, payment_status, previous_status)
         return True
     except Error as e:
-        print(f"Error updating order: {e}")
+        connection.rollback()
+        logger.error("Error updating order: %s", e)
         return False
     finally:
         if connection.is_connected():
@@ -380,7 +441,7 @@ def handle_mpesa_callback(callback_data):
         
         return {"success": True}
     except Exception as e:
-        print(f"Error handling M-Pesa callback: {e}")
+        logger.error("Error handling M-Pesa callback: %s", e)
         return {"error": str(e)}
 
 def handle_stk_push_request(request_data):
@@ -398,5 +459,5 @@ def handle_stk_push_request(request_data):
         
         return initiate_stk_push(phone_number, amount, account_reference, order_type, order_id, user_id)
     except Exception as e:
-        print(f"Error handling STK Push request: {e}")
+        logger.error("Error handling STK Push request: %s", e)
         return {"error": str(e)}
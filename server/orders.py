@@ -0,0 +1,172 @@
+"""
+A user's artwork orders and exhibition bookings for the profile page.
+
+Each list is one joined query (orders -> artworks, bookings -> exhibitions)
+that also picks up the status of the latest M-Pesa transaction, read newest
+first straight off the (user_id, order_date) / (user_id, booking_date) indexes.
+
+Lists are keyset-paginated: a response carries nextOrdersCursor and
+nextBookingsCursor (null on the last page), which are passed back as
+?ordersCursor= / ?bookingsCursor= to continue after the last row returned.
+Later pages cost the same as the first however long the history is.
+"""
+
+import os
+from datetime import datetime
+from decimal import Decimal
+from auth import verify_auth_header
+from database import get_db_connection
+from logging_setup import get_logger
+
+logger = get_logger('orders')
+
+USER_ORDERS_PAGE_SIZE = int(os.environ.get('USER_ORDERS_PAGE_SIZE', '100'))
+USER_ORDERS_MAX_PAGE_SIZE = 500
+
+CURSOR_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+USER_ORDERS_QUERY = """
+    SELECT o.id, o.order_date, o.artwork_id, a.title, a.artist, a.price,
+           o.total_amount, o.payment_status, o.delivery_address, a.image_url,
+           (SELECT t.status FROM mpesa_transactions t
+            WHERE t.order_type = 'artwork' AND t.order_id = o.id
+            ORDER BY t.id DESC LIMIT 1)
+    FROM artwork_orders o
+    JOIN artworks a ON a.id = o.artwork_id
+    WHERE o.user_id = %s {keyset}
+    ORDER BY o.order_date DESC, o.id DESC
+    LIMIT %s
+"""
+
+USER_BOOKINGS_QUERY = """
+    SELECT b.id, b.booking_date, b.exhibition_id, e.title, e.location,
+           e.start_date, e.end_date, b.slots, b.total_amount, b.payment_status,
+           e.image_url,
+           (SELECT t.status FROM mpesa_transactions t
+            WHERE t.order_type = 'exhibition' AND t.order_id = b.id
+            ORDER BY t.id DESC LIMIT 1)
+    FROM exhibition_bookings b
+    JOIN exhibitions e ON e.id = b.exhibition_id
+    WHERE b.user_id = %s {keyset}
+    ORDER BY b.booking_date DESC, b.id DESC
+    LIMIT %s
+"""
+
+# The (date, id) < cursor comparison spelled out so MySQL range-scans the index
+_KEYSET = "AND ({date} < %s OR ({date} = %s AND {id} < %s))"
+
+def _number(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+def _order_item(row):
+    (order_id, order_date, artwork_id, title, artist, price, total,
+     payment_status, address, image_url, transaction_status) = row
+    return {
+        "id": str(order_id),
+        "artworkId": str(artwork_id),
+        "artworkTitle": title,
+        "artist": artist,
+        "imageUrl": image_url,
+        "date": _iso(order_date),
+        "price": _number(price),
+        "deliveryFee": max(_number(total) - _number(price), 0),
+        "totalAmount": _number(total),
+        "status": payment_status,
+        "transactionStatus": transaction_status,
+        "deliveryAddress": address
+    }
+
+def _booking_item(row):
+    (booking_id, booking_date, exhibition_id, title, location, start_date, end_date,
+     slots, total, payment_status, image_url, transaction_status) = row
+    return {
+        "id": str(booking_id),
+        "exhibitionId": str(exhibition_id),
+        "exhibitionTitle": title,
+        "imageUrl": image_url,
+        "date": _iso(booking_date),
+        "startDate": _iso(start_date),
+        "endDate": _iso(end_date),
+        "location": location,
+        "slots": slots,
+        "totalAmount": _number(total),
+        "status": payment_status,
+        "transactionStatus": transaction_status
+    }
+
+# list -> (query, date column, id column, row formatter)
+ORDER_LISTS = {
+    "orders": (USER_ORDERS_QUERY, "o.order_date", "o.id", _order_item),
+    "bookings": (USER_BOOKINGS_QUERY, "b.booking_date", "b.id", _booking_item),
+}
+
+def encode_cursor(row_date, row_id):
+    return f"{row_date.strftime(CURSOR_DATE_FORMAT)}_{row_id}"
+
+def decode_cursor(cursor):
+    """Parse a cursor into (datetime, id); raise ValueError if it is malformed"""
+    row_date, _, row_id = cursor.rpartition('_')
+    return datetime.strptime(row_date, CURSOR_DATE_FORMAT), int(row_id)
+
+def _authorize(auth_header, user_id):
+    """Return an error dict unless the token belongs to user_id or to an admin"""
+    payload = verify_auth_header(auth_header)
+    if "error" in payload:
+        return payload
+
+    if payload.get("sub") != str(user_id) and not payload.get("is_admin"):
+        logger.warning("Access denied: user %s requested orders of user %s", payload.get("sub"), user_id)
+        return {"error": "Unauthorized access"}
+    return None
+
+def _fetch_page(cursor, name, user_id, after, limit):
+    """Return one page of a list and the cursor for the next page (None if this is the last)"""
+    query, date_column, id_column, item = ORDER_LISTS[name]
+    if after is None:
+        cursor.execute(query.format(keyset=""), (user_id, limit + 1))
+    else:
+        keyset = _KEYSET.format(date=date_column, id=id_column)
+        cursor.execute(query.format(keyset=keyset), (user_id, after[0], after[0], after[1], limit + 1))
+    # One row past the page says whether there is another
+    rows = cursor.fetchall()
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(rows) > limit else None
+    return [item(row) for row in page], next_cursor
+
+def get_user_orders(auth_header, user_id, cursors=None, limit=USER_ORDERS_PAGE_SIZE, lists=ORDER_LISTS):
+    """Return a page of the user's orders and/or bookings, each continuing from its cursor"""
+    error = _authorize(auth_header, user_id)
+    if error:
+        return error
+
+    limit = max(1, min(limit, USER_ORDERS_MAX_PAGE_SIZE))
+    try:
+        after = {name: decode_cursor(value) for name, value in (cursors or {}).items() if value}
+    except ValueError:
+        return {"error": "Invalid cursor"}
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        result = {}
+        for name in ORDER_LISTS:
+            if name not in lists:
+                continue
+            items, next_cursor = _fetch_page(cursor, name, user_id, after.get(name), limit)
+            result[name] = items
+            result[f"next{name.capitalize()}Cursor"] = next_cursor
+        return result
+    except Exception as e:
+        logger.error("Error fetching orders for user %s: %s", user_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
@@ -0,0 +1,174 @@
+"""
+View and click events, aggregated into decayed popularity scores.
+
+record_event() only updates an in-memory counter, so ingesting an event never
+waits on the database. A background thread in each worker flushes the
+aggregated counts every POPULARITY_FLUSH_INTERVAL seconds with one batched
+upsert into item_popularity, where each item's score decays exponentially:
+
+    score = score * 0.5 ^ (seconds since score_at / half-life) + new events
+
+After each flush the thread reloads the current scores of recently active
+items, so `?sort=popular` reflects events recorded by every worker.
+"""
+
+import os
+import atexit
+import threading
+from database import get_db_connection
+from catalogue_sync import is_known
+from logging_setup import get_logger
+
+logger = get_logger('popularity')
+
+POPULARITY_FLUSH_INTERVAL = float(os.environ.get('POPULARITY_FLUSH_INTERVAL', '10'))
+POPULARITY_HALF_LIFE_HOURS = float(os.environ.get('POPULARITY_HALF_LIFE_HOURS', '72'))
+# Distinct items buffered between flushes; events for further items are dropped
+POPULARITY_MAX_BUFFERED = 50000
+# Items untouched for this many half-lives score under 1/1000 and are not reloaded
+RELOAD_HALF_LIVES = 10
+
+EVENT_WEIGHTS = {"view": 1.0, "click": 3.0}
+POPULARITY_KINDS = ("artworks", "exhibitions")
+
+HALF_LIFE_SECONDS = POPULARITY_HALF_LIFE_HOURS * 3600
+
+# score_at is assigned after score, so the decay uses the previous timestamp.
+# GREATEST keeps workers with slightly different clocks from growing a score.
+UPSERT_POPULARITY = f"""
+    INSERT INTO item_popularity (kind, item_id, views, clicks, score, score_at)
+    VALUES (%s, %s, %s, %s, %s, NOW())
+    ON DUPLICATE KEY UPDATE
+        views = views + VALUES(views),
+        clicks = clicks + VALUES(clicks),
+        score = score * POW(0.5, GREATEST(TIMESTAMPDIFF(SECOND, score_at, VALUES(score_at)), 0) / {HALF_LIFE_SECONDS}) + VALUES(score),
+        score_at = GREATEST(score_at, VALUES(score_at))
+"""
+
+POPULARITY_STATS = {
+    "events": 0,
+    "dropped": 0,
+    "flushes": 0,
+    "flushed_items": 0,
+    "flush_errors": 0
+}
+
+_lock = threading.Lock()
+# (kind, id) -> [views, clicks, score] not yet written
+_buffer = {}
+# (kind, id) -> score as of the last reload
+_scores = {}
+_wake = threading.Event()
+_state = {"thread": None, "pid": None}
+
+def record_event(kind, item_id, event='view'):
+    """Count one event for an item; return False if it was rejected"""
+    if kind not in POPULARITY_KINDS or event not in EVENT_WEIGHTS or not is_known(kind, item_id):
+        return False
+    key = (kind, item_id)
+    with _lock:
+        counts = _buffer.get(key)
+        if counts is None:
+            if len(_buffer) >= POPULARITY_MAX_BUFFERED:
+                POPULARITY_STATS["dropped"] += 1
+                return False
+            counts = _buffer[key] = [0, 0, 0.0]
+        counts[0 if event == 'view' else 1] += 1
+        counts[2] += EVENT_WEIGHTS[event]
+        POPULARITY_STATS["events"] += 1
+    return True
+
+def _restore(pending):
+    """Put counts from a failed flush back into the buffer"""
+    with _lock:
+        for key, (views, clicks, score) in pending.items():
+            counts = _buffer.setdefault(key, [0, 0, 0.0])
+            counts[0] += views
+            counts[1] += clicks
+            counts[2] += score
+
+def flush():
+    """Write buffered counts in one batch and reload current scores"""
+    global _buffer, _scores
+    with _lock:
+        pending, _buffer = _buffer, {}
+
+    connection = get_db_connection()
+    if connection is None:
+        POPULARITY_STATS["flush_errors"] += 1
+        _restore(pending)
+        return False
+
+    cursor = connection.cursor()
+
+    try:
+        if pending:
+            cursor.executemany(UPSERT_POPULARITY, [
+                (kind, item_id, views, clicks, score)
+                for (kind, item_id), (views, clicks, score) in pending.items()
+            ])
+            connection.commit()
+            POPULARITY_STATS["flushed_items"] += len(pending)
+            pending = {}
+        POPULARITY_STATS["flushes"] += 1
+
+        cursor.execute(f"""
+            SELECT kind, item_id,
+                   score * POW(0.5, TIMESTAMPDIFF(SECOND, score_at, NOW()) / {HALF_LIFE_SECONDS})
+            FROM item_popularity
+            WHERE score_at >= NOW() - INTERVAL %s SECOND
+        """, (int(HALF_LIFE_SECONDS * RELOAD_HALF_LIVES),))
+        _scores = {(kind, item_id): float(score) for kind, item_id, score in cursor.fetchall()}
+        return True
+    except Exception as e:
+        POPULARITY_STATS["flush_errors"] += 1
+        logger.error("Error flushing popularity events: %s", e)
+        _restore(pending)
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _run():
+    while True:
+        _wake.wait(POPULARITY_FLUSH_INTERVAL)
+        _wake.clear()
+        flush()
+
+def start_popularity_flush():
+    """Start the flush thread in this process if it is not already running"""
+    pid = os.getpid()
+    if _state["pid"] == pid:
+        return
+    with _lock:
+        if _state["pid"] == pid:
+            return
+        # Counts buffered before a fork belong to the parent
+        _buffer.clear()
+        thread = threading.Thread(target=_run, name='popularity-flush', daemon=True)
+        _state["thread"] = thread
+        _state["pid"] = pid
+        thread.start()
+    _wake.set()
+
+def init_popularity(app):
+    """Start flushing on the first request each worker serves, and once more at exit"""
+    app.before_request(start_popularity_flush)
+    atexit.register(lambda: _buffer and flush())
+
+def popularity(kind, item_id):
+    """Current score of an item, including events not yet flushed"""
+    pending = _buffer.get((kind, item_id))
+    return _scores.get((kind, item_id), 0.0) + (pending[2] if pending else 0.0)
+
+def sort_by_popularity(kind, items):
+    """Order API items (dicts with a string id) by popularity; ties keep their order"""
+    return sorted(items, key=lambda item: -popularity(kind, int(item['id'])))
+
+def get_popularity_stats():
+    """Return event and flush counters"""
+    stats = dict(POPULARITY_STATS)
+    stats["buffered"] = len(_buffer)
+    stats["scored_items"] = len(_scores)
+    return stats
@@ -0,0 +1,278 @@
+"""
+On-demand profiling of live worker requests.
+
+An admin arms a profiling session on the worker that answers the request; the
+session covers the next N requests or a time window on that worker, whichever
+ends first. Two modes are available:
+
+- 'sampling': a background thread samples the stacks of the profiled request
+  threads every PROFILE_SAMPLE_INTERVAL seconds and aggregates them as
+  collapsed stacks (the input format of flamegraph.pl / speedscope).
+- 'pstats': each profiled request runs under cProfile and the results are
+  merged into one pstats report.
+
+With no session armed the request hooks do a single attribute check and the
+sampler thread is not running. Per-request `?profile=1` is only honoured when
+PROFILE_ROUTES_ENABLED=1, which is meant for staging.
+"""
+
+import io
+import os
+import sys
+import time
+import uuid
+import pstats
+import marshal
+import cProfile
+import threading
+from collections import Counter
+from flask import request, g, Response
+from logging_setup import get_logger
+
+logger = get_logger('profiler')
+
+PROFILE_ROUTES_ENABLED = os.environ.get('PROFILE_ROUTES_ENABLED', '0') == '1'
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', '0.005'))
+# Minimum seconds between two sessions on one worker
+PROFILE_MIN_INTERVAL = float(os.environ.get('PROFILE_MIN_INTERVAL', '60'))
+PROFILE_MAX_REQUESTS = 500
+PROFILE_MAX_SECONDS = 120
+MAX_STACK_DEPTH = 128
+# Finished sessions kept for retrieval
+MAX_KEPT_SESSIONS = 5
+
+# Endpoints that manage profiling are never profiled themselves
+EXCLUDED_ENDPOINTS = {'start_profile', 'get_profile'}
+
+_lock = threading.Lock()
+_active = [None]
+_sessions = {}
+_last_started = [0.0]
+
+def _frame_label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}:{code.co_firstlineno}"
+
+def _collapse(frame):
+    """Return a root-first, semicolon-separated stack for a frame"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+class StackSampler:
+    """Samples the stacks of a set of threads from a background thread"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._threads = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+    def watch(self, thread_id):
+        self._threads.add(thread_id)
+
+    def unwatch(self, thread_id):
+        self._threads.discard(thread_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            watched = tuple(self._threads)
+            if not watched:
+                continue
+            frames = sys._current_frames()
+            for thread_id in watched:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.counts[_collapse(frame)] += 1
+                    self.samples += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.counts.most_common()) + "\n"
+
+class ProfileSession:
+    """A bounded profiling window on this worker"""
+
+    def __init__(self, mode, max_requests, seconds):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.remaining = max_requests
+        self.requests = 0
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + seconds
+        self.finished_at = None
+        self.sampler = None
+        self.stats = None
+        if mode == 'sampling':
+            self.sampler = StackSampler(PROFILE_SAMPLE_INTERVAL)
+            self.sampler.start()
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def expired(self):
+        return self.remaining <= 0 or time.monotonic() >= self.deadline
+
+    def add_profile(self, profile):
+        with _lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+
+    def finish(self):
+        if self.done:
+            return
+        self.finished_at = time.time()
+        if self.sampler is not None:
+            self.sampler.stop()
+        logger.info("Profile session %s finished after %s requests", self.id, self.requests)
+
+    def summary(self):
+        data = {
+            "sessionId": self.id,
+            "pid": os.getpid(),
+            "mode": self.mode,
+            "requests": self.requests,
+            "status": "done" if self.done else "running",
+            "startedAt": self.started_at
+        }
+        if self.sampler is not None:
+            data["samples"] = self.sampler.samples
+        return data
+
+    def render(self, output_format):
+        """Return (body, mimetype) for the session results"""
+        if self.mode == 'sampling':
+            return self.sampler.collapsed(), 'text/plain'
+        if self.stats is None:
+            return "No requests were profiled\n", 'text/plain'
+        if output_format == 'raw':
+            # Loadable with pstats.Stats(path) / snakeviz after saving to a file
+            return marshal.dumps(self.stats.stats), 'application/octet-stream'
+        stream = io.StringIO()
+        self.stats.stream = stream
+        self.stats.sort_stats('cumulative').print_stats(60)
+        return stream.getvalue(), 'text/plain'
+
+def start_session(mode='sampling', max_requests=50, seconds=30):
+    """Arm a profiling session; return (session, error)
+
+    error is None or {"error": message, "kind": kind}, where kind is 'invalid'
+    for bad arguments and 'busy' when a session is running or was started too
+    recently on this worker.
+    """
+    if mode not in ('sampling', 'pstats'):
+        return None, {"error": "mode must be 'sampling' or 'pstats'", "kind": "invalid"}
+    try:
+        max_requests = int(max_requests)
+        seconds = float(seconds)
+    except (TypeError, ValueError, OverflowError):
+        return None, {"error": "requests and seconds must be numbers", "kind": "invalid"}
+    if max_requests < 1 or not 0 < seconds < float('inf'):
+        return None, {"error": "requests and seconds must be positive", "kind": "invalid"}
+    max_requests = min(max_requests, PROFILE_MAX_REQUESTS)
+    seconds = min(seconds, PROFILE_MAX_SECONDS)
+    with _lock:
+        if _active[0] is not None and not _active[0].expired():
+            return None, {"error": "A profiling session is already running on this worker", "kind": "busy"}
+        if time.monotonic() - _last_started[0] < PROFILE_MIN_INTERVAL:
+            return None, {"error": "Profiling sessions are rate limited; try again later", "kind": "busy"}
+        _last_started[0] = time.monotonic()
+        previous = _active[0]
+        session = ProfileSession(mode, max_requests, seconds)
+        _active[0] = session
+        _sessions[session.id] = session
+        while len(_sessions) > MAX_KEPT_SESSIONS:
+            del _sessions[next(iter(_sessions))]
+    if previous is not None:
+        previous.finish()
+    logger.info("Profile session %s started (%s, %s requests, %ss)", session.id, mode, max_requests, seconds)
+    return session, None
+
+def get_session(session_id):
+    """Return a session by id, finishing it first if its window has passed"""
+    session = _sessions.get(session_id)
+    if session is not None and not session.done and session.expired():
+        _end_active(session)
+    return session
+
+def _end_active(session):
+    with _lock:
+        if _active[0] is session:
+            _active[0] = None
+    session.finish()
+
+def before_request_profile():
+    """before_request hook: start profiling this request if a session wants it"""
+    session = _active[0]
+    if session is None and not PROFILE_ROUTES_ENABLED:
+        return
+    if request.endpoint in EXCLUDED_ENDPOINTS:
+        return
+
+    if session is not None:
+        if session.expired():
+            _end_active(session)
+        else:
+            with _lock:
+                session.remaining -= 1
+                session.requests += 1
+            g.profile_session = session
+            if session.mode == 'sampling':
+                session.sampler.watch(threading.get_ident())
+            else:
+                g.profile = cProfile.Profile()
+                g.profile.enable()
+            return
+
+    if PROFILE_ROUTES_ENABLED and request.args.get('profile') == '1':
+        g.profile = cProfile.Profile()
+        g.profile_inline = True
+        g.profile.enable()
+
+def after_request_profile(response):
+    """after_request hook: replace the response with the profile for ?profile=1"""
+    if not g.get('profile_inline'):
+        return response
+    profile = g.pop('profile')
+    profile.disable()
+    g.profile_inline = False
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(60)
+    result = Response(stream.getvalue(), mimetype='text/plain')
+    result.headers['X-Profiled-Status'] = str(response.status_code)
+    return result
+
+def teardown_profile(exception=None):
+    """teardown_request hook: stop profiling this request"""
+    session = g.get('profile_session')
+    if session is None:
+        return
+    profile = g.get('profile')
+    if session.mode == 'sampling':
+        session.sampler.unwatch(threading.get_ident())
+    elif profile is not None:
+        profile.disable()
+        session.add_profile(profile)
+    if session.expired():
+        _end_active(session)
+
+def init_profiler(app):
+    """Register the profiling hooks on a Flask app"""
+    app.before_request(before_request_profile)
+    app.after_request(after_request_profile)
+    app.teardown_request(teardown_profile)
@@ -0,0 +1,263 @@
+"""
+Per-statement database instrumentation.
+
+get_db_connection() wraps every connection in an InstrumentedConnection whose
+cursors time each execute()/executemany(), tag it with the calling function
+and the normalized SQL, and fold it into rolling per-statement stats. Statements
+slower than SLOW_QUERY_THRESHOLD_MS are written to the slow-query log as soon as
+they finish. With SLOW_QUERY_EXPLAIN enabled their EXPLAIN plan follows as a second
+record once the cursor's results are consumed: when the cursor or its connection
+is closed. A connection that is shut down drops plans still waiting.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import threading
+from functools import lru_cache
+from logging_setup import get_logger, add_output_handler, ROOT_LOGGER
+from tracing import current_span, span
+
+logger = get_logger('query_stats')
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200'))
+SLOW_QUERY_LOG = os.environ.get(
+    'SLOW_QUERY_LOG', os.path.join(os.path.dirname(__file__), 'logs', 'slow_queries.log'))
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', '0') == '1'
+
+# Distinct normalized statements tracked before new ones are folded into one bucket
+MAX_TRACKED_STATEMENTS = int(os.environ.get('MAX_TRACKED_STATEMENTS', '500'))
+OVERFLOW_STATEMENT = '<other statements>'
+
+EXPLAINABLE = ('select', 'update', 'delete')
+
+_lock = threading.Lock()
+_statements = {}
+QUERY_TOTALS = {
+    "statements": 0,
+    "slow_statements": 0,
+    "statement_seconds_total": 0.0
+}
+
+SLOW_QUERY_LOGGER = f"{ROOT_LOGGER}.slow_query"
+_slow_logger = None
+
+_string_literal = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_number_literal = re.compile(r"\b\d+(?:\.\d+)?\b")
+_placeholder_list = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_whitespace = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    """Collapse whitespace and replace literals/placeholders with ? so equal statements group"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    normalized = _string_literal.sub('?', sql)
+    normalized = normalized.replace('%s', '?')
+    normalized = _number_literal.sub('?', normalized)
+    normalized = _whitespace.sub(' ', normalized).strip()
+    # IN (?, ?, ?) lists of any length are the same statement
+    return _placeholder_list.sub('(...)', normalized)
+
+def _calling_function():
+    """Return module.function of the first caller outside this module"""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get('__name__') == __name__:
+        frame = frame.f_back
+    if frame is None:
+        return 'unknown'
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+def _get_slow_logger():
+    global _slow_logger
+    if _slow_logger is None:
+        # Slow statements also get their own file, written by the logging listener thread
+        try:
+            os.makedirs(os.path.dirname(SLOW_QUERY_LOG), exist_ok=True)
+            handler = logging.FileHandler(SLOW_QUERY_LOG)
+            handler.addFilter(logging.Filter(SLOW_QUERY_LOGGER))
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            add_output_handler(handler)
+        except OSError as e:
+            logger.error("Cannot open slow query log %s: %s", SLOW_QUERY_LOG, e)
+        _slow_logger = get_logger('slow_query')
+    return _slow_logger
+
+def record_statement(sql, caller, elapsed_ms, rowcount):
+    """Fold one executed statement into the rolling stats; return True if it was slow"""
+    normalized = normalize_sql(sql)
+    slow = elapsed_ms >= SLOW_QUERY_THRESHOLD_MS
+    with _lock:
+        QUERY_TOTALS["statements"] += 1
+        QUERY_TOTALS["statement_seconds_total"] += elapsed_ms / 1000.0
+        stats = _statements.get(normalized)
+        if stats is None:
+            if len(_statements) >= MAX_TRACKED_STATEMENTS:
+                normalized = OVERFLOW_STATEMENT
+                stats = _statements.get(normalized)
+            if stats is None:
+                stats = _statements[normalized] = {
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                    "slow": 0, "callers": {}, "explain": None
+                }
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        if rowcount and rowcount > 0:
+            stats["rows"] += rowcount
+        stats["callers"][caller] = stats["callers"].get(caller, 0) + 1
+        if slow:
+            stats["slow"] += 1
+            QUERY_TOTALS["slow_statements"] += 1
+    return slow
+
+def log_slow_statement(sql, caller, elapsed_ms, explain=None):
+    """Append a slow statement (without parameter values) to the slow-query log
+
+    With explain, the record is the plan following up a statement already logged.
+    """
+    entry = {
+        "ts": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "ms": round(elapsed_ms, 2),
+        "caller": caller,
+        "sql": normalize_sql(sql)
+    }
+    if explain is not None:
+        entry["record"] = "explain"
+        entry["explain"] = explain
+    _get_slow_logger().warning(json.dumps(entry, default=str))
+
+class InstrumentedCursor:
+    """Cursor proxy that times every statement it executes"""
+
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+
+    def _timed(self, method, operation, args, kwargs):
+        caller = _calling_function()
+        if current_span() is not None:
+            with span("db.query", kind='client', **{"db.statement": normalize_sql(operation), "code.function": caller}):
+                return self._execute(method, operation, args, kwargs, caller)
+        return self._execute(method, operation, args, kwargs, caller)
+
+    def _execute(self, method, operation, args, kwargs, caller):
+        start = time.perf_counter()
+        try:
+            return method(operation, *args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            if record_statement(operation, caller, elapsed_ms, getattr(self._cursor, 'rowcount', 0)):
+                log_slow_statement(operation, caller, elapsed_ms)
+                if SLOW_QUERY_EXPLAIN and method == self._cursor.execute and self._is_explainable(operation):
+                    # EXPLAIN must wait until this cursor's results are consumed
+                    params = args[0] if args else kwargs.get('params')
+                    self._connection.queue_explain(self, operation, params, caller, elapsed_ms)
+
+    @staticmethod
+    def _is_explainable(operation):
+        text = operation.decode('utf-8', 'replace') if isinstance(operation, bytes) else operation
+        return text.lstrip().lower().startswith(EXPLAINABLE)
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.execute, operation, args, kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.executemany, operation, args, kwargs)
+
+    def close(self):
+        result = self._cursor.close()
+        self._connection.run_explains(self)
+        return result
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are InstrumentedCursors"""
+
+    def __init__(self, connection):
+        self.raw_connection = connection
+        # (cursor, operation, params, caller, elapsed_ms) of slow statements awaiting EXPLAIN
+        self._pending_explains = []
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self.raw_connection.cursor(*args, **kwargs), self)
+
+    def queue_explain(self, cursor, operation, params, caller, elapsed_ms):
+        self._pending_explains.append((cursor, operation, params, caller, elapsed_ms))
+
+    def run_explains(self, cursor=None):
+        """Log the plans waiting for one cursor, or for every cursor when cursor is None"""
+        if not self._pending_explains:
+            return
+        pending, waiting = [], []
+        for entry in self._pending_explains:
+            (pending if cursor is None or entry[0] is cursor else waiting).append(entry)
+        self._pending_explains = waiting
+        for _, operation, params, caller, elapsed_ms in pending:
+            try:
+                explain_cursor = self.raw_connection.cursor(dictionary=True, buffered=True)
+                try:
+                    explain_cursor.execute(f"EXPLAIN {operation}", params)
+                    plan = explain_cursor.fetchall()
+                finally:
+                    explain_cursor.close()
+                with _lock:
+                    stats = _statements.get(normalize_sql(operation))
+                    if stats is not None:
+                        stats["explain"] = plan
+            except Exception as e:
+                plan = [{"error": str(e)}]
+            log_slow_statement(operation, caller, elapsed_ms, plan)
+
+    def close(self):
+        # Cursors that were never closed still get their plans logged
+        self.run_explains()
+        return self.raw_connection.close()
+
+    def shutdown(self):
+        # No statements can run on a connection being torn down; the slow statements are already logged
+        self._pending_explains = []
+        return self.raw_connection.shutdown()
+
+    def __getattr__(self, name):
+        return getattr(self.raw_connection, name)
+
+def instrument_connection(connection):
+    """Wrap a database connection so its statements are timed"""
+    if connection is None:
+        return None
+    return InstrumentedConnection(connection)
+
+def get_top_statements(limit=20, order_by='total_ms'):
+    """Return the top-N statements by total, mean or max time, or by count"""
+    with _lock:
+        rows = []
+        for sql, stats in _statements.items():
+            row = dict(stats)
+            row["sql"] = sql
+            row["mean_ms"] = round(stats["total_ms"] / stats["count"], 3) if stats["count"] else 0.0
+            row["total_ms"] = round(stats["total_ms"], 3)
+            row["max_ms"] = round(stats["max_ms"], 3)
+            row["callers"] = dict(stats["callers"])
+            rows.append(row)
+    if order_by not in ('total_ms', 'mean_ms', 'max_ms', 'count', 'slow'):
+        order_by = 'total_ms'
+    rows.sort(key=lambda row: row[order_by], reverse=True)
+    return rows[:limit]
+
+def get_query_totals():
+    """Return statement counters exposed on /metrics"""
+    return dict(QUERY_TOTALS)
+
+def reset_query_stats():
+    """Clear the rolling per-statement stats"""
+    with _lock:
+        _statements.clear()
@@ -0,0 +1,374 @@
+"""
+Similar-artwork recommendations ("you may also like").
+
+Each artwork is encoded as a feature vector made of blocks: artist, medium,
+description terms, price band and year. Artists, media and terms map to fixed
+pseudo-random unit vectors seeded by a hash of the value, so equal values match
+fully, unrelated ones score about zero, and the width stays fixed however large
+the vocabulary grows; terms are summed with TF-IDF weights. Price (on a log
+scale) and year use radial-basis bumps so nearby values match partially. Each
+block is unit length and scaled by the square root of its weight, so a dot
+product is the weighted sum of the per-feature cosine similarities.
+
+The nearest RECOMMEND_NEIGHBOURS of every artwork are found with one matrix
+product per block of rows. Instead of partially sorting each full row, columns are
+split into interleaved groups and only the k groups with the highest maxima are
+searched; those groups always contain the k best scores.
+
+A background thread rebuilds the table after the initial catalogue load and
+applies later changes incrementally: changed artworks get new vectors and
+neighbour lists, lists that contained a changed or deleted artwork are
+recomputed, and every other list gains a changed artwork that now beats its last
+entry. IDF weights are refreshed on full rebuilds.
+
+numpy is optional; without it the endpoint reports recommendations as unavailable.
+"""
+
+import os
+import math
+import time
+import hashlib
+import threading
+from collections import Counter
+from catalogue_sync import subscribe
+from search import fold, tokenize
+from uploads import public_image_url
+from logging_setup import get_logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = get_logger('recommend')
+
+RECOMMEND_NEIGHBOURS = int(os.environ.get('RECOMMEND_NEIGHBOURS', '12'))
+RECOMMEND_LIMIT = 6
+# Query rows per matrix product; the score block is this many rows by the catalogue size
+RECOMMEND_BLOCK_SIZE = int(os.environ.get('RECOMMEND_BLOCK_SIZE', '512'))
+# Changes touching more than this share of the catalogue trigger a full rebuild
+REBUILD_FRACTION = 0.05
+TOP_K_GROUPS = 64
+
+# (feature, dimensions, weight)
+FEATURES = [
+    ("artist", 24, 0.35),
+    ("medium", 12, 0.2),
+    ("terms", 48, 0.25),
+    ("price", 6, 0.1),
+    ("year", 6, 0.1),
+]
+# Ranges covered by the radial-basis bumps: log10 of the price, and the year
+PRICE_RANGE = (2.5, 6.5)
+YEAR_RANGE = (1900, 2030)
+
+RECOMMEND_STATS = {
+    "rebuilds": 0,
+    "updates": 0,
+    "errors": 0,
+    "last_rebuild_seconds": 0.0
+}
+
+_lock = threading.Lock()
+# id -> latest catalogue row, for encoding and for rendering results
+_rows = {}
+_pending = {"rows": {}, "removed": set(), "rebuild": False}
+_state = {"index": None, "thread": None, "pid": None}
+_wake = threading.Event()
+# (feature, value) -> unit vector; only used by the worker thread
+_vectors = {}
+
+class SimilarityIndex:
+    """Artwork vectors and each artwork's nearest neighbours, replaced as a whole on every change"""
+
+    def __init__(self, ids, vectors, neighbours, scores, idf, default_idf):
+        self.ids = ids
+        self.vectors = vectors
+        self.neighbours = neighbours
+        self.scores = scores
+        self.idf = idf
+        self.default_idf = default_idf
+        self.row_of = {item_id: row for row, item_id in enumerate(ids.tolist())}
+
+def _hashed_vector(feature, value, dims):
+    key = (feature, value)
+    vector = _vectors.get(key)
+    if vector is None:
+        digest = hashlib.blake2b(f"{feature}:{value}".encode('utf-8'), digest_size=8).digest()
+        vector = np.random.default_rng(int.from_bytes(digest, 'little')).standard_normal(dims).astype(np.float32)
+        vector /= np.linalg.norm(vector)
+        _vectors[key] = vector
+    return vector
+
+def _categorical(feature, dims, values):
+    block = np.zeros((len(values), dims), np.float32)
+    for i, value in enumerate(values):
+        if value:
+            block[i] = _hashed_vector(feature, value, dims)
+    return block
+
+def _terms(dims, term_counts, idf, default_idf):
+    block = np.zeros((len(term_counts), dims), np.float32)
+    for i, counts in enumerate(term_counts):
+        if counts:
+            vectors = np.array([_hashed_vector("term", term, dims) for term in counts])
+            weights = np.array([count * idf.get(term, default_idf) for term, count in counts.items()], np.float32)
+            block[i] = weights @ vectors
+    return block
+
+def _bands(dims, values, low, high):
+    """Radial-basis encoding: nearby values share most of their weight"""
+    centres = np.linspace(low, high, dims)
+    width = (high - low) / (dims - 1)
+    values = np.asarray(values, np.float64)
+    with np.errstate(invalid='ignore'):
+        block = np.exp(-((values[:, None] - centres) / width) ** 2)
+    block[np.isnan(values)] = 0
+    return block.astype(np.float32)
+
+def _term_counts(row):
+    return Counter(tokenize(f"{row['title'] or ''} {row['description'] or ''}"))
+
+def _encode(rows, term_counts, idf, default_idf):
+    """Return the float32 feature matrix for rows"""
+    blocks = []
+    for feature, dims, weight in FEATURES:
+        if feature in ("artist", "medium"):
+            block = _categorical(feature, dims, [fold(row[feature] or "").strip() for row in rows])
+        elif feature == "terms":
+            block = _terms(dims, term_counts, idf, default_idf)
+        elif feature == "price":
+            prices = [math.log10(row["price"]) if row["price"] and row["price"] > 0 else math.nan for row in rows]
+            block = _bands(dims, prices, *PRICE_RANGE)
+        else:
+            block = _bands(dims, [row["year"] or math.nan for row in rows], *YEAR_RANGE)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        np.divide(block, norms, out=block, where=norms > 0)
+        blocks.append(block * math.sqrt(weight))
+    return np.hstack(blocks).astype(np.float32)
+
+def _top_k(scores, k):
+    """Return (columns, scores) of the k largest scores in each row, best first"""
+    width = scores.shape[1] // TOP_K_GROUPS
+    if width > k:
+        # Columns j, j + width, j + 2 * width, ... form group j. The k groups with
+        # the highest maxima hold at least k scores that are at least as high as
+        # anything outside them, so only their columns need sorting.
+        grid = scores.reshape(len(scores), TOP_K_GROUPS, width)
+        best = np.argpartition(grid.max(axis=1), -k, axis=1)[:, -k:]
+        columns = (np.arange(TOP_K_GROUPS)[:, None] * width + best[:, None, :]).reshape(len(scores), -1)
+        scores = np.take_along_axis(scores, columns, 1)
+    else:
+        columns = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    part = np.argpartition(scores, -k, axis=1)[:, -k:]
+    values = np.take_along_axis(scores, part, 1)
+    order = np.argsort(-values, axis=1)
+    part = np.take_along_axis(part, order, 1)
+    return np.take_along_axis(columns, part, 1), np.take_along_axis(values, order, 1)
+
+def _nearest(queries, vectors, exclude, k):
+    """Return (columns, scores) of the k vectors scoring highest against each query
+
+    exclude[i] is the column of query i itself, which is never returned.
+    """
+    n = len(vectors)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((len(queries), 0), np.int64), np.empty((len(queries), 0), np.float32)
+    # Zero rows pad the matrix to a whole number of groups; their scores are masked
+    padded = -(-n // TOP_K_GROUPS) * TOP_K_GROUPS
+    matrix = np.zeros((padded, vectors.shape[1]), np.float32)
+    matrix[:n] = vectors
+    columns = np.empty((len(queries), k), np.int64)
+    scores = np.empty((len(queries), k), np.float32)
+    for start in range(0, len(queries), RECOMMEND_BLOCK_SIZE):
+        end = min(start + RECOMMEND_BLOCK_SIZE, len(queries))
+        block = queries[start:end] @ matrix.T
+        block[:, n:] = -np.inf
+        block[np.arange(end - start), exclude[start:end]] = -np.inf
+        columns[start:end], scores[start:end] = _top_k(block, k)
+    return columns, scores
+
+def _neighbour_table(ids, columns, scores):
+    neighbours = np.full((len(columns), RECOMMEND_NEIGHBOURS), -1, np.int64)
+    table_scores = np.full((len(columns), RECOMMEND_NEIGHBOURS), -np.inf, np.float32)
+    neighbours[:, :columns.shape[1]] = ids[columns]
+    table_scores[:, :columns.shape[1]] = scores
+    return neighbours, table_scores
+
+def _build(rows):
+    """Encode every artwork and compute all neighbour lists"""
+    start = time.perf_counter()
+    if len(_vectors) > 500000:
+        _vectors.clear()
+    term_counts = [_term_counts(row) for row in rows]
+    document_frequency = Counter()
+    for counts in term_counts:
+        document_frequency.update(counts.keys())
+    count = len(rows)
+    idf = {term: math.log((1 + count) / (1 + frequency)) + 1 for term, frequency in document_frequency.items()}
+    default_idf = math.log(1 + count) + 1
+
+    vectors = _encode(rows, term_counts, idf, default_idf)
+    ids = np.array([row["id"] for row in rows], np.int64)
+    columns, scores = _nearest(vectors, vectors, np.arange(count), RECOMMEND_NEIGHBOURS)
+    neighbours, scores = _neighbour_table(ids, columns, scores)
+
+    elapsed = time.perf_counter() - start
+    RECOMMEND_STATS["rebuilds"] += 1
+    RECOMMEND_STATS["last_rebuild_seconds"] = round(elapsed, 3)
+    logger.info("Computed similar artworks for %s artworks in %.2fs", count, elapsed)
+    return SimilarityIndex(ids, vectors, neighbours, scores, idf, default_idf)
+
+def _apply(index, changed, removed):
+    """Return a new index with changed rows re-encoded and removed ids dropped"""
+    ids, vectors = index.ids, index.vectors
+    neighbours, scores = index.neighbours, index.scores
+    if removed:
+        keep = ~np.isin(ids, list(removed))
+        ids, vectors, neighbours, scores = ids[keep], vectors[keep], neighbours[keep], scores[keep]
+    else:
+        vectors, neighbours, scores = vectors.copy(), neighbours.copy(), scores.copy()
+    row_of = {item_id: row for row, item_id in enumerate(ids.tolist())}
+
+    encoded = _encode(changed, [_term_counts(row) for row in changed], index.idf, index.default_idf)
+    added = []
+    for i, row in enumerate(changed):
+        if row["id"] in row_of:
+            vectors[row_of[row["id"]]] = encoded[i]
+        else:
+            row_of[row["id"]] = len(ids) + len(added)
+            added.append(i)
+    if added:
+        ids = np.concatenate([ids, np.array([changed[i]["id"] for i in added], np.int64)])
+        vectors = np.vstack([vectors, encoded[added]])
+        neighbours = np.vstack([neighbours, np.full((len(added), RECOMMEND_NEIGHBOURS), -1, np.int64)])
+        scores = np.vstack([scores, np.full((len(added), RECOMMEND_NEIGHBOURS), -np.inf, np.float32)])
+    dirty = np.array([row_of[row["id"]] for row in changed], np.int64)
+
+    # Lists that included a changed or deleted artwork are recomputed from scratch
+    stale = list(removed) + [row["id"] for row in changed]
+    touched = np.isin(neighbours, stale).any(axis=1)
+    touched[dirty] = True
+    recompute = np.nonzero(touched)[0]
+    if len(recompute):
+        columns, values = _nearest(vectors[recompute], vectors, recompute, RECOMMEND_NEIGHBOURS)
+        neighbours[recompute], scores[recompute] = _neighbour_table(ids, columns, values)
+
+    # Every other list only needs a changed artwork that now beats its last entry
+    if len(dirty):
+        gains = vectors @ vectors[dirty].T
+        gains[touched] = -np.inf
+        better = gains > scores[:, -1:]
+        rows = np.nonzero(better.any(axis=1))[0]
+        if len(rows):
+            candidate_ids = np.hstack([neighbours[rows], np.broadcast_to(ids[dirty], (len(rows), len(dirty)))])
+            candidate_scores = np.hstack([scores[rows], np.where(better[rows], gains[rows], -np.inf)])
+            order = np.argsort(-candidate_scores, axis=1, kind='stable')[:, :RECOMMEND_NEIGHBOURS]
+            scores[rows] = np.take_along_axis(candidate_scores, order, 1)
+            neighbours[rows] = np.where(np.isinf(scores[rows]), -1, np.take_along_axis(candidate_ids, order, 1))
+
+    RECOMMEND_STATS["updates"] += 1
+    return SimilarityIndex(ids, vectors, neighbours, scores, index.idf, index.default_idf)
+
+def _run():
+    while True:
+        _wake.wait()
+        _wake.clear()
+        with _lock:
+            rebuild = _pending["rebuild"]
+            changed = list(_pending["rows"].values())
+            removed = set(_pending["removed"])
+            _pending["rows"] = {}
+            _pending["removed"] = set()
+            _pending["rebuild"] = False
+            index = _state["index"]
+        try:
+            if rebuild or index is None or len(changed) + len(removed) > REBUILD_FRACTION * len(index.ids):
+                with _lock:
+                    rows = list(_rows.values())
+                index = _build(rows)
+            elif changed or removed:
+                index = _apply(index, changed, removed)
+            with _lock:
+                _state["index"] = index
+        except Exception as e:
+            RECOMMEND_STATS["errors"] += 1
+            logger.exception("Error updating similar artworks: %s", e)
+
+def _start_worker():
+    pid = os.getpid()
+    if _state["pid"] == pid:
+        return
+    with _lock:
+        if _state["pid"] == pid:
+            return
+        thread = threading.Thread(target=_run, name='recommend', daemon=True)
+        _state["thread"] = thread
+        _state["pid"] = pid
+        thread.start()
+
+def _on_catalogue_change(kind, rows, removed, initial):
+    """catalogue_sync subscriber: queue changed artworks for the worker"""
+    if kind != "artworks" or np is None:
+        return
+    with _lock:
+        if initial:
+            _rows.clear()
+            _pending["rows"] = {}
+            _pending["removed"] = set()
+            _pending["rebuild"] = True
+        for row in rows:
+            _rows[row["id"]] = row
+            if not initial:
+                _pending["rows"][row["id"]] = row
+                _pending["removed"].discard(row["id"])
+        for item_id in removed:
+            _rows.pop(item_id, None)
+            _pending["rows"].pop(item_id, None)
+            _pending["removed"].add(item_id)
+    _start_worker()
+    _wake.set()
+
+subscribe(_on_catalogue_change)
+
+def _summary(row):
+    return {
+        "id": str(row["id"]),
+        "title": row["title"],
+        "artist": row["artist"],
+        "price": float(row["price"]) if row["price"] is not None else None,
+        "imageUrl": public_image_url(row["image_url"]),
+        "dimensions": row["dimensions"],
+        "medium": row["medium"],
+        "year": row["year"],
+        "status": row["status"]
+    }
+
+def similar_artworks(artwork_id, limit=RECOMMEND_LIMIT):
+    """Return the artworks most similar to artwork_id, best first"""
+    if np is None:
+        return {"error": "Recommendations are unavailable"}
+    with _lock:
+        index = _state["index"]
+        if index is None:
+            return {"error": "Recommendations are loading"}
+        if artwork_id not in _rows:
+            return {"error": "Artwork not found"}
+        row = index.row_of.get(artwork_id)
+        similar = []
+        if row is not None:
+            for item_id, score in zip(index.neighbours[row].tolist(), index.scores[row].tolist()):
+                if item_id < 0 or item_id not in _rows:
+                    continue
+                similar.append(dict(_summary(_rows[item_id]), score=round(score, 4)))
+                if len(similar) >= limit:
+                    break
+    return {"artworkId": str(artwork_id), "similar": similar}
+
+def get_recommend_stats():
+    """Return rebuild counters and the table size"""
+    stats = dict(RECOMMEND_STATS)
+    index = _state["index"]
+    stats["artworks"] = len(index.ids) if index is not None else 0
+    return stats
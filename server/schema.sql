@@ -30,7 +30,9 @@ CREATE TABLE IF NOT EXISTS artworks (
     medium TEXT,
     year INTEGER,
     status TEXT NOT NULL DEFAULT 'available',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    version INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Exhibitions table
@@ -46,7 +48,9 @@ CREATE TABLE IF NOT EXISTS exhibitions (
     total_slots INTEGER NOT NULL,
     available_slots INTEGER NOT NULL,
     status TEXT NOT NULL DEFAULT 'upcoming',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    version INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Contact messages table
@@ -82,6 +86,9 @@ CREATE TABLE IF NOT EXISTS exhibition_bookings (
     slots INTEGER NOT NULL,
     amount REAL NOT NULL,
     status TEXT NOT NULL DEFAULT 'pending',
+    version INTEGER NOT NULL DEFAULT 1,
+    time_slot_id INTEGER, -- set when booked against a timed-entry slot
+    refund_due BOOLEAN NOT NULL DEFAULT 0, -- paid after its slot places were given away
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users (id),
     FOREIGN KEY (exhibition_id) REFERENCES exhibitions (id)
@@ -104,3 +111,95 @@ CREATE TABLE IF NOT EXISTS mpesa_transactions (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users (id)
 );
+
+-- Aggregated view/click counts and decayed popularity per catalogue item
+CREATE TABLE IF NOT EXISTS item_popularity (
+    kind TEXT NOT NULL, -- 'artworks' or 'exhibitions'
+    item_id INTEGER NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    clicks INTEGER NOT NULL DEFAULT 0,
+    score REAL NOT NULL DEFAULT 0,
+    score_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (kind, item_id)
+);
+
+-- Ticket check-ins at the door, written in batches (see checkin.py)
+CREATE TABLE IF NOT EXISTS ticket_checkins (
+    booking_id INTEGER PRIMARY KEY,
+    exhibition_id INTEGER NOT NULL,
+    slots INTEGER NOT NULL,
+    checked_in_at TIMESTAMP NOT NULL,
+    source TEXT NOT NULL DEFAULT 'door', -- 'door' or 'offline'
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Timed-entry slots, booked against atomically (see time_slots.py)
+CREATE TABLE IF NOT EXISTS exhibition_time_slots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    exhibition_id INTEGER NOT NULL,
+    slot_date DATE NOT NULL,
+    start_time TIME NOT NULL,
+    capacity INTEGER NOT NULL,
+    booked INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (exhibition_id, slot_date, start_time),
+    FOREIGN KEY (exhibition_id) REFERENCES exhibitions (id)
+);
+
+-- Waitlist for sold-out exhibitions, first in first out (see waitlist.py)
+CREATE TABLE IF NOT EXISTS exhibition_waitlist (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    exhibition_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    slots INTEGER NOT NULL,
+    preferred_date DATE,
+    status TEXT NOT NULL DEFAULT 'waiting', -- 'waiting', 'offered', 'claimed', 'expired' or 'cancelled'
+    active INTEGER DEFAULT 1, -- 1 while waiting or offered, NULL afterwards
+    time_slot_id INTEGER,
+    offer_expires_at TIMESTAMP,
+    booking_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (exhibition_id, user_id, active),
+    FOREIGN KEY (exhibition_id) REFERENCES exhibitions (id),
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+-- Sales rollups, maintained as payments complete (see analytics.py)
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day DATE NOT NULL,
+    order_type TEXT NOT NULL, -- 'artwork' or 'exhibition'
+    attempts INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, order_type)
+);
+
+CREATE TABLE IF NOT EXISTS sales_totals (
+    order_type TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sales_by_artist (
+    artist TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    last_sale_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS sales_by_exhibition (
+    exhibition_id INTEGER PRIMARY KEY,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    last_sale_at TIMESTAMP
+);
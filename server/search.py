@@ -0,0 +1,572 @@
+"""
+Full-text search over artworks and exhibitions.
+
+An in-process inverted index is kept current by catalogue_sync, so queries never
+touch the database. Documents are scored with BM25 using per-field weights
+(title and artist count more than description). The last query word also
+matches as a prefix (for as-you-type searches), and words that match nothing
+are corrected to indexed terms within one edit (two for long words) using a
+symmetric-delete table. A document must match every query word; if none does,
+documents matching the most words are returned instead.
+
+Updates are applied to the writer's copy of the index and then published as a
+new immutable snapshot; postings shared with the previous snapshot are copied
+before they change. Queries score against the snapshot current when they start
+and never take the lock. Multi-word queries walk each word's postings in impact
+order and stop once no unseen document can reach the top results (the
+threshold algorithm); the match count comes from set intersection, not scoring.
+"""
+
+import os
+import re
+import math
+import time
+import heapq
+import bisect
+import threading
+import unicodedata
+from datetime import date
+from decimal import Decimal
+from catalogue_sync import subscribe
+from uploads import public_image_url
+from logging_setup import get_logger
+
+logger = get_logger('search')
+
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', '100'))
+MAX_QUERY_TERMS = 8
+# Prefix expansions kept per query word, most frequent first
+MAX_PREFIX_EXPANSIONS = 50
+MIN_PREFIX_LENGTH = 2
+# Shortest word that typo correction is attempted for
+MIN_FUZZY_LENGTH = 4
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+FIELD_WEIGHTS = {
+    "artworks": {"title": 3.0, "artist": 3.0, "medium": 2.0, "description": 1.0},
+    "exhibitions": {"title": 3.0, "location": 2.0, "description": 1.0},
+}
+
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or the to with".split())
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+# Shards in the document, term and deletion maps; a publish copies only these lists
+INDEX_SHARDS = 1024
+# A term's postings are split into shards of about this many documents once they
+# grow past POSTINGS_SPLIT, so changing one document copies one small shard
+POSTINGS_SHARD_SIZE = 256
+POSTINGS_SPLIT = 4 * POSTINGS_SHARD_SIZE
+
+class ShardedMap:
+    """A dict split into shards; a copy shares every shard until it is written to.
+
+    Readers use get, [], in, len, iteration and items like a dict. Writes copy
+    the shard they touch the first time after the map was copied, so the copy
+    handed to readers never changes.
+    """
+
+    __slots__ = ('shards', 'size', '_owned')
+
+    def __init__(self, shards, size=0, owned=()):
+        self.shards = shards
+        self.size = size
+        self._owned = set(owned)
+
+    @classmethod
+    def empty(cls, count):
+        return cls([{} for _ in range(count)], 0, range(count))
+
+    @classmethod
+    def split(cls, items, count):
+        """Build a map of `count` shards from a dict, owning all of them"""
+        shards = [{} for _ in range(count)]
+        for key, value in items.items():
+            shards[hash(key) % count][key] = value
+        return cls(shards, len(items), range(count))
+
+    def copy(self):
+        """Return a map sharing this one's shards; later writes to either copy the shard first"""
+        self._owned.clear()
+        return ShardedMap(list(self.shards), self.size)
+
+    def get(self, key, default=None):
+        return self.shards[hash(key) % len(self.shards)].get(key, default)
+
+    def __getitem__(self, key):
+        return self.shards[hash(key) % len(self.shards)][key]
+
+    def __contains__(self, key):
+        return key in self.shards[hash(key) % len(self.shards)]
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for shard in self.shards:
+            yield from shard
+
+    def items(self):
+        for shard in self.shards:
+            yield from shard.items()
+
+    def _writable(self, key):
+        index = hash(key) % len(self.shards)
+        if index not in self._owned:
+            self.shards[index] = dict(self.shards[index])
+            self._owned.add(index)
+        return self.shards[index]
+
+    def __setitem__(self, key, value):
+        shard = self._writable(key)
+        if key not in shard:
+            self.size += 1
+        shard[key] = value
+
+    def pop(self, key, default=None):
+        if key not in self:
+            return default
+        self.size -= 1
+        return self._writable(key).pop(key)
+
+    def __delitem__(self, key):
+        if self.pop(key, self) is self:
+            raise KeyError(key)
+
+# Held by index writers only; queries read the published snapshot without it
+_lock = threading.Lock()
+# Writer state. Everything reachable from the published snapshot is shared with
+# it and copied before its first change after each publish: map shards by
+# ShardedMap, postings and deletion sets per term / variant (_writing and
+# _changed_deletes hold those already copied), vocabulary lists per first letter.
+# (kind, id) -> Document
+_docs = ShardedMap.empty(INDEX_SHARDS)
+# term -> {(kind, id): BM25 term weight}, a ShardedMap once large
+_postings = ShardedMap.empty(INDEX_SHARDS)
+# first letter -> sorted terms, for prefix lookups
+_vocab = {}
+# single-character deletion of a term -> terms it came from
+_deletes = ShardedMap.empty(INDEX_SHARDS)
+_length_total = [0.0]
+_writing = {}
+_changed_deletes = set()
+_changed_vocab = set()
+# term -> (postings, value) built lazily by queries and shared by every snapshot;
+# an entry is valid while the snapshot still has that very postings object
+_ranked_cache = {}
+_key_set_cache = {}
+
+SEARCH_STATS = {
+    "queries": 0,
+    "query_seconds_total": 0.0
+}
+
+def fold(text):
+    """Lowercase text and strip accents"""
+    text = str(text).lower()
+    if text.isascii():
+        return text
+    text = unicodedata.normalize('NFKD', text)
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+def tokenize(text):
+    """Lowercase, strip accents and split text into index terms"""
+    if not text:
+        return []
+    return [token for token in _TOKEN_RE.findall(fold(text)) if token not in STOPWORDS]
+
+def _single_deletes(term):
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+def _edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def _summary(kind, row):
+    """Fields returned with a search hit, in the API's camelCase"""
+    if kind == "artworks":
+        summary = {
+            "title": row["title"], "artist": row["artist"], "medium": row["medium"],
+            "price": row["price"], "year": row["year"], "status": row["status"],
+            "imageUrl": public_image_url(row["image_url"])
+        }
+    else:
+        summary = {
+            "title": row["title"], "location": row["location"], "startDate": row["start_date"],
+            "endDate": row["end_date"], "ticketPrice": row["ticket_price"], "status": row["status"],
+            "imageUrl": public_image_url(row["image_url"])
+        }
+    return {key: _json_value(value) for key, value in summary.items()}
+
+class Document:
+    """An indexed item: its weighted term frequencies and display fields"""
+
+    __slots__ = ('key', 'terms', 'length', 'summary')
+
+    def __init__(self, key, terms, length, summary):
+        self.key = key
+        self.terms = terms
+        self.length = length
+        self.summary = summary
+
+def _writable_postings(term):
+    """Return a term's postings for changing, copying them first if the snapshot shares them"""
+    postings = _writing.get(term)
+    if postings is not None:
+        return postings
+    postings = _postings.get(term)
+    if postings is None:
+        postings = {}
+        _add_term(term)
+    else:
+        postings = postings.copy()
+    _postings[term] = _writing[term] = postings
+    return postings
+
+def _split_large_postings():
+    """Split the changed postings that have outgrown their shards, so a change copies one small shard"""
+    for term, postings in _writing.items():
+        shards = len(postings.shards) if isinstance(postings, ShardedMap) else 1
+        if len(postings) >= POSTINGS_SPLIT and len(postings) > 4 * POSTINGS_SHARD_SIZE * shards and term in _postings:
+            count = 1 << (len(postings) // POSTINGS_SHARD_SIZE).bit_length()
+            _postings[term] = ShardedMap.split(postings, count)
+
+def _writable_deletes(variant):
+    terms = _deletes.get(variant)
+    if terms is None:
+        terms = _deletes[variant] = set()
+    elif variant not in _changed_deletes:
+        terms = _deletes[variant] = set(terms)
+    _changed_deletes.add(variant)
+    return terms
+
+def _writable_vocab(letter):
+    terms = _vocab.get(letter)
+    if terms is None:
+        terms = _vocab[letter] = []
+    elif letter not in _changed_vocab:
+        terms = _vocab[letter] = list(terms)
+    _changed_vocab.add(letter)
+    return terms
+
+def _add_term(term):
+    bisect.insort(_writable_vocab(term[0]), term)
+    if len(term) >= MIN_FUZZY_LENGTH:
+        for variant in _single_deletes(term):
+            _writable_deletes(variant).add(term)
+
+def _drop_term(term):
+    terms = _writable_vocab(term[0])
+    index = bisect.bisect_left(terms, term)
+    if index < len(terms) and terms[index] == term:
+        del terms[index]
+    _writing.pop(term, None)
+    _ranked_cache.pop(term, None)
+    _key_set_cache.pop(term, None)
+    if len(term) >= MIN_FUZZY_LENGTH:
+        for variant in _single_deletes(term):
+            if variant in _deletes:
+                terms = _writable_deletes(variant)
+                terms.discard(term)
+                if not terms:
+                    del _deletes[variant]
+
+def _remove_document(key):
+    doc = _docs.pop(key, None)
+    if doc is None:
+        return
+    _length_total[0] -= doc.length
+    for term in doc.terms:
+        if term not in _postings:
+            continue
+        postings = _writable_postings(term)
+        postings.pop(key, None)
+        if not postings:
+            del _postings[term]
+            _drop_term(term)
+
+def _add_document(kind, row):
+    key = (kind, row["id"])
+    weights = {}
+    length = 0.0
+    for field, weight in FIELD_WEIGHTS[kind].items():
+        for token in tokenize(row.get(field)):
+            weights[token] = weights.get(token, 0.0) + weight
+            length += weight
+    doc = Document(key, weights, length, _summary(kind, row))
+    _docs[key] = doc
+    _length_total[0] += length
+
+    # Length normalisation uses the average at indexing time; a full reload refreshes it
+    average = _length_total[0] / len(_docs) if _docs else 1.0
+    norm = K1 * (1 - B + B * (length / average if average else 1.0))
+    for term, frequency in weights.items():
+        _writable_postings(term)[key] = frequency * (K1 + 1) / (frequency + norm)
+
+class IndexSnapshot:
+    """An immutable view of the index that queries score against without locking"""
+
+    def __init__(self, docs, postings, vocab, deletes):
+        self.docs = docs
+        self.postings = postings
+        self.vocab = vocab
+        self.deletes = deletes
+
+    def idf(self, term):
+        frequency = len(self.postings.get(term, ()))
+        count = len(self.docs)
+        return math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+
+    def expand(self, word, prefix):
+        """Return [(term, weight)] of indexed terms a query word should match"""
+        expansions = []
+        if word in self.postings:
+            expansions.append((word, 1.0))
+        if prefix and len(word) >= MIN_PREFIX_LENGTH:
+            vocab = self.vocab.get(word[0], ())
+            start = bisect.bisect_left(vocab, word)
+            end = bisect.bisect_left(vocab, word + "\uffff")
+            candidates = [term for term in vocab[start:end] if term != word]
+            if len(candidates) > MAX_PREFIX_EXPANSIONS:
+                candidates = heapq.nlargest(MAX_PREFIX_EXPANSIONS, candidates,
+                                            key=lambda term: len(self.postings[term]))
+            expansions.extend((term, PREFIX_WEIGHT) for term in candidates)
+        if not expansions and len(word) >= MIN_FUZZY_LENGTH:
+            limit = 2 if len(word) >= 8 else 1
+            candidates = set(self.deletes.get(word, ()))
+            for variant in _single_deletes(word):
+                if variant in self.postings:
+                    candidates.add(variant)
+                candidates.update(self.deletes.get(variant, ()))
+            expansions.extend((term, FUZZY_WEIGHT) for term in candidates
+                              if _edit_distance(word, term, limit) <= limit)
+        return expansions
+
+    def _cached(self, cache, term, build):
+        postings = self.postings[term]
+        entry = cache.get(term)
+        if entry is not None and entry[0] is postings:
+            return entry[1]
+        value = build(postings)
+        cache[term] = (postings, value)
+        return value
+
+    def ranked_postings(self, term):
+        """A term's postings sorted by weight, highest first"""
+        return self._cached(_ranked_cache, term,
+                            lambda postings: sorted(postings.items(), key=lambda item: item[1], reverse=True))
+
+    def key_set(self, term):
+        """The documents containing a term, as a frozenset"""
+        return self._cached(_key_set_cache, term, frozenset)
+
+    def hit(self, key, score):
+        kind, item_id = key
+        return dict(self.docs[key].summary, type=kind[:-1], id=str(item_id), score=round(score, 4))
+
+_snapshot = IndexSnapshot(_docs.copy(), _postings.copy(), {}, _deletes.copy())
+
+def _publish():
+    """Swap in a snapshot of the index as it is now; call with _lock held.
+
+    Costs the shard lists, not the index: everything the writer changes after
+    this is copied first, so the snapshot never changes under a query.
+    """
+    global _snapshot
+    _split_large_postings()
+    _snapshot = IndexSnapshot(_docs.copy(), _postings.copy(), dict(_vocab), _deletes.copy())
+    _writing.clear()
+    _changed_deletes.clear()
+    _changed_vocab.clear()
+
+def _on_catalogue_change(kind, rows, removed, initial):
+    """catalogue_sync subscriber: apply a delta to the index and publish it"""
+    start = time.perf_counter()
+    with _lock:
+        if initial:
+            for key in [key for key in _docs if key[0] == kind]:
+                _remove_document(key)
+        for row in rows:
+            _remove_document((kind, row["id"]))
+            _add_document(kind, row)
+        for item_id in removed:
+            _remove_document((kind, item_id))
+        _publish()
+    if initial:
+        logger.info("Indexed %s %s for search in %.2fs", len(rows), kind, time.perf_counter() - start)
+
+subscribe(_on_catalogue_change)
+
+def _word_stream(index, expansions):
+    """Yield (score, key) for one query word, highest first; a key's first score is its best"""
+    streams = []
+    for term, weight in expansions:
+        factor = index.idf(term) * weight
+        streams.append(((term_weight * factor, key) for key, term_weight in index.ranked_postings(term)))
+    return heapq.merge(*streams, key=lambda item: item[0], reverse=True)
+
+def _shards(postings):
+    return postings.shards if isinstance(postings, ShardedMap) else [postings]
+
+def _word_score(scaled, key):
+    """Best score of a key across one word's (shards, factor) expansions, or None"""
+    best = None
+    slot = hash(key)
+    for shards, factor in scaled:
+        term_weight = shards[slot % len(shards)].get(key)
+        if term_weight is not None and (best is None or term_weight * factor > best):
+            best = term_weight * factor
+    return best
+
+def _top_matching_all(index, per_word, kind, wanted):
+    """Top `wanted` (score, key) of documents matching every word, by the threshold algorithm.
+
+    Each word's postings are walked in impact order, one entry per word in turn;
+    a document is scored fully on first sight. Once the top list is full and its
+    lowest score is at least the sum of the scores at the walk positions, no
+    unseen document can enter it and the walk stops.
+    """
+    scaled = [[(_shards(index.postings[term]), index.idf(term) * weight) for term, weight in expansions]
+              for expansions in per_word]
+    streams = [_word_stream(index, expansions) for expansions in per_word]
+    frontier = [None] * len(streams)
+    seen = set()
+    top = []
+    while True:
+        for i, stream in enumerate(streams):
+            item = next(stream, None)
+            if item is None:
+                # Every document matching all words appears in this word's postings
+                return sorted(top, reverse=True)
+            score, key = item
+            frontier[i] = score
+            if key in seen:
+                continue
+            seen.add(key)
+            if kind is not None and key[0] != kind:
+                continue
+            total = 0.0
+            for j, word in enumerate(scaled):
+                word_score = score if j == i else _word_score(word, key)
+                if word_score is None:
+                    break
+                total += word_score
+            else:
+                if len(top) < wanted:
+                    heapq.heappush(top, (total, key))
+                elif total > top[0][0]:
+                    heapq.heapreplace(top, (total, key))
+        if len(top) >= wanted and top[0][0] >= sum(frontier):
+            return sorted(top, reverse=True)
+
+def _count_matching_all(index, per_word, kind):
+    """Number of documents matching every word, by set intersection"""
+    matching = None
+    for expansions in sorted(per_word, key=lambda expansions: sum(len(index.postings[term])
+                                                                   for term, _ in expansions)):
+        if len(expansions) == 1:
+            keys = index.key_set(expansions[0][0])
+        else:
+            keys = frozenset().union(*(index.key_set(term) for term, _ in expansions))
+        matching = keys if matching is None else matching & keys
+        if not matching:
+            return 0
+    if kind is None:
+        return len(matching)
+    return sum(1 for key in matching if key[0] == kind)
+
+def _top_matching_most(index, per_word, kind, wanted):
+    """(total, top hits) of documents ranked by how many words they match, then score"""
+    totals = {}
+    for expansions in per_word:
+        scores = {}
+        for term, weight in expansions:
+            factor = index.idf(term) * weight
+            for key, term_weight in index.postings[term].items():
+                if kind is not None and key[0] != kind:
+                    continue
+                score = term_weight * factor
+                if score > scores.get(key, 0.0):
+                    scores[key] = score
+        for key, score in scores.items():
+            count, total = totals.get(key, (0, 0.0))
+            totals[key] = (count + 1, total + score)
+    top = heapq.nlargest(wanted, totals.items(), key=lambda item: item[1])
+    return len(totals), [(total, key) for key, (_, total) in top]
+
+def search(query, kind=None, limit=20, offset=0):
+    """Return ranked hits for a query, optionally restricted to 'artworks' or 'exhibitions'"""
+    start = time.perf_counter()
+    words = tokenize(query)[:MAX_QUERY_TERMS]
+    limit = max(1, min(limit, SEARCH_MAX_RESULTS))
+    wanted = offset + limit
+    result = {"query": query, "total": 0, "results": [], "corrected": False}
+
+    # Updates publish a new snapshot; this query keeps using the one it started with
+    index = _snapshot
+    per_word = []
+    for i, word in enumerate(words):
+        expansions = index.expand(word, prefix=(i == len(words) - 1))
+        if any(weight == FUZZY_WEIGHT for _, weight in expansions):
+            result["corrected"] = True
+        per_word.append(expansions)
+
+    if len(per_word) == 1 and len(per_word[0]) == 1 and per_word[0][0][1] == 1.0:
+        # One exact word: walk its presorted postings
+        term = per_word[0][0][0]
+        idf = index.idf(term)
+        ranked = index.ranked_postings(term)
+        if kind is not None:
+            ranked = [(key, weight) for key, weight in ranked if key[0] == kind]
+        result["total"] = len(ranked)
+        result["results"] = [index.hit(key, weight * idf) for key, weight in ranked[offset:wanted]]
+    elif per_word:
+        top = []
+        if all(per_word):
+            result["total"] = _count_matching_all(index, per_word, kind)
+            if result["total"]:
+                top = _top_matching_all(index, per_word, kind, wanted)
+        if not top:
+            # No document has every word: rank those matching the most words
+            result["total"], top = _top_matching_most(index, [expansions for expansions in per_word if expansions],
+                                                      kind, wanted)
+        result["results"] = [index.hit(key, total) for total, key in top[offset:]]
+
+    elapsed = time.perf_counter() - start
+    SEARCH_STATS["queries"] += 1
+    SEARCH_STATS["query_seconds_total"] += elapsed
+    result["tookMs"] = round(elapsed * 1000, 2)
+    return result
+
+def get_search_stats():
+    """Return index sizes and query counters"""
+    index = _snapshot
+    stats = dict(SEARCH_STATS)
+    stats["documents"] = len(index.docs)
+    stats["terms"] = len(index.postings)
+    return stats
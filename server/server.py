@@ -5,13 +5,11 @@ Flask server for the gallery web application.
 
 import os
 import sys
-import base64
 import uuid
-import traceback
 from datetime import datetime
 from flask import (
     Flask, request, jsonify, abort, 
-    render_template, redirect, url_for, g, send_from_directory
+    render_template, redirect, url_for, g, send_from_directory, Response
 )
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -19,116 +17,370 @@ import sqlite3
 from functools import wraps
 
 # Update imports to use correct database functions
-from database import get_db_connection, dict_from_row, json_dumps
+from database import get_db_connection, dict_from_row, json_dumps, get_connection_stats
 from auth import (
     generate_token, verify_token, login_required, 
     admin_required, get_user_id_from_token
 )
 from artwork import (
     get_all_artworks, get_artwork, 
-    create_artwork, update_artwork, delete_artwork
+    create_artwork, update_artwork, patch_artwork, delete_artwork
 )
 from exhibition import (
-    get_all_exhibitions, get_exhibition, 
-    create_exhibition, update_exhibition, delete_exhibition
+    EXHIBITION_STATUSES, get_all_exhibitions, get_exhibition, 
+    create_exhibition, update_exhibition, patch_exhibition, delete_exhibition
 )
 from contact import create_contact_message, get_messages, update_message
-from mpesa import initiate_stk_push
+from mpesa import initiate_stk_push, get_daraja_stats
 from middleware import set_cors_headers
+from cache import get_catalogue_entry, store_catalogue_entry, invalidate_catalogue, get_cache_stats
+from compression import compress_response
+from metrics import init_metrics, register_collector, render_metrics
+from query_stats import get_top_statements, get_query_totals, reset_query_stats
 from setup_uploads import create_upload_directory, verify_static_serving
+from uploads import UPLOAD_FOLDER, process_image_upload
+from bulk_import import IMPORT_KINDS, IMPORT_IMAGE_ROOT, detect_format, import_stream
+from export import EXPORT_FORMATS, parse_date_range, open_export, stream_export
+from bulk_ops import apply_bulk_operations
+from catalogue_sync import init_catalogue_sync, wait_until_loaded, get_sync_stats
+from search import search, get_search_stats
+from autocomplete import AUTOCOMPLETE_FIELDS, AUTOCOMPLETE_LIMIT, suggest, get_autocomplete_stats
+from recommend import RECOMMEND_LIMIT, similar_artworks, get_recommend_stats
+from popularity import init_popularity, record_event, sort_by_popularity, get_popularity_stats
+from analytics import get_sales_analytics
+from orders import ORDER_LISTS, USER_ORDERS_PAGE_SIZE, get_user_orders
+from tickets import (
+    TICKET_CACHE_DIR, get_ticket, open_ticket_pack, stream_ticket_pack,
+    get_pack_progress, get_ticket_stats
+)
+from ticket_list import TICKETS_PAGE_SIZE, list_tickets
+from time_slots import (
+    TIME_SLOTS_MAX_BATCH, save_time_slots, get_day_slots, get_month_calendar,
+    book_time_slot, get_time_slot_stats
+)
+from exhibition_status import init_exhibition_status, get_status_stats
+from waitlist import (
+    init_waitlist, join_waitlist, get_waitlist_entry, leave_waitlist, claim_offer, get_waitlist_stats
+)
+from checkin import CHECKIN_MAX_SYNC, init_checkin, check_in, sync_scans, get_manifest, get_checkin_stats
+from logging_setup import get_logger, init_request_logging, get_logging_stats
+from profiler import init_profiler, start_session, get_session
+from tracing import init_tracing, get_tracing_stats
+
+logger = get_logger('server')
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['DATABASE'] = os.path.join(os.path.dirname(__file__), 'gallery.db')
 
 # Enable CORS
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True, expose_headers=["ETag", "X-Pack-Id", "X-Ticket-Count"])
 
 # Remove the database connection teardown since we're using different db functions
 # app.teardown_appcontext(close_db)
 
 # Ensure upload directory exists
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Register middleware
+# Register middleware. Metrics hooks go first so that, with Flask running
+# after_request hooks in reverse order, response sizes are recorded post-compression
+init_metrics(app)
+init_request_logging(app)
+init_tracing(app)
 app.after_request(set_cors_headers)
+app.after_request(compress_response)
+init_profiler(app)
+init_catalogue_sync(app)
+init_popularity(app)
+init_checkin(app)
+init_waitlist(app)
+init_exhibition_status(app)
+
+register_collector('db_connections', get_connection_stats)
+register_collector('cache', get_cache_stats)
+register_collector('daraja', get_daraja_stats)
+register_collector('db', get_query_totals)
+register_collector('logging', get_logging_stats)
+register_collector('tracing', get_tracing_stats)
+register_collector('catalogue_sync', get_sync_stats)
+register_collector('search', get_search_stats)
+register_collector('autocomplete', get_autocomplete_stats)
+register_collector('recommend', get_recommend_stats)
+register_collector('popularity', get_popularity_stats)
+register_collector('tickets', get_ticket_stats)
+register_collector('checkin', get_checkin_stats)
+register_collector('time_slots', get_time_slot_stats)
+register_collector('waitlist', get_waitlist_stats)
+register_collector('exhibition_status', get_status_stats)
 
 @app.route('/')
 def index():
     return jsonify({"status": "success", "message": "Welcome to the Gallery API"})
 
+# Prometheus scrape endpoint, aggregated across all workers sharing METRICS_DIR
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    metrics_token = os.environ.get('METRICS_TOKEN')
+    if metrics_token and request.headers.get('Authorization') != f"Bearer {metrics_token}":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# Top-N database statements by time for this worker (admin only)
+@app.route('/api/admin/query-stats', methods=['GET'])
+@admin_required
+def query_stats():
+    try:
+        limit = min(int(request.args.get('limit', 20)), 200)
+        order_by = request.args.get('sort', 'total_ms')
+        return jsonify({
+            "pid": os.getpid(),
+            "totals": get_query_totals(),
+            "statements": get_top_statements(limit, order_by)
+        })
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+
+@app.route('/api/admin/query-stats', methods=['DELETE'])
+@admin_required
+def reset_query_stats_route():
+    reset_query_stats()
+    return jsonify({"status": "success", "message": "Query stats reset"})
+
+# Sales and bookings dashboard, served from the rollup tables (admin only)
+@app.route('/api/admin/analytics', methods=['GET'])
+@admin_required
+def sales_analytics():
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({"status": "error", "message": "days must be an integer"}), 400
+    try:
+        result = get_sales_analytics(days)
+        if "error" in result:
+            return jsonify({"status": "error", "message": result["error"]}), 500
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error fetching analytics: %s", e)
+        return jsonify({"status": "error", "message": "Failed to fetch analytics"}), 500
+
+# Arm a profiling session on the worker that answers (admin only)
+@app.route('/api/admin/profile', methods=['POST'])
+@admin_required
+def start_profile():
+    data = request.get_json(silent=True) or {}
+    session, error = start_session(
+        data.get('mode', 'sampling'),
+        data.get('requests', 50),
+        data.get('seconds', 30)
+    )
+    if error:
+        status = 400 if error["kind"] == "invalid" else 429
+        return jsonify({"status": "error", "message": error["error"]}), status
+    return jsonify(session.summary()), 202
+
+# Fetch a profiling session's collapsed stacks or pstats report (admin only)
+@app.route('/api/admin/profile/<session_id>', methods=['GET'])
+@admin_required
+def get_profile(session_id):
+    session = get_session(session_id)
+    if session is None:
+        return jsonify({"status": "error", "message": "Profile session not found on this worker", "pid": os.getpid()}), 404
+    if not session.done:
+        return jsonify(session.summary()), 202
+    body, mimetype = session.render(request.args.get('format', 'text'))
+    return Response(body, mimetype=mimetype)
+
+# Bulk import artworks or exhibitions from an uploaded CSV / JSON-lines file (admin only)
+@app.route('/api/admin/import/<kind>', methods=['POST'])
+@admin_required
+def bulk_import_route(kind):
+    if kind not in IMPORT_KINDS:
+        return jsonify({"status": "error", "message": f"Unknown import kind: {kind}"}), 404
+    upload = request.files.get('file')
+    stream = upload.stream if upload is not None else request.stream
+    filename = upload.filename if upload is not None else None
+    file_format = request.args.get('format') or detect_format(filename, default='jsonl' if request.mimetype in ('application/x-ndjson', 'application/jsonl') else 'csv')
+    if file_format not in ('csv', 'jsonl'):
+        return jsonify({"status": "error", "message": "format must be csv or jsonl"}), 400
+    try:
+        report = import_stream(
+            kind, stream, file_format,
+            atomic=request.args.get('atomic') == '1',
+            dry_run=request.args.get('dryRun') == '1',
+            base_dir=IMPORT_IMAGE_ROOT, image_root=IMPORT_IMAGE_ROOT
+        )
+    except Exception as e:
+        logger.exception("Bulk import of %s failed: %s", kind, e)
+        return jsonify({"status": "error", "message": f"Import failed: {str(e)}"}), 500
+    if report.inserted and request.args.get('dryRun') != '1':
+        invalidate_catalogue(kind)
+    return jsonify(dict(report.to_dict(), status="success" if report.error is None else "partial"))
+
+# Stream a table as NDJSON or CSV, optionally gzipped, in constant memory (admin only)
+@app.route('/api/admin/export/<kind>', methods=['GET'])
+@admin_required
+def export_route(kind):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"status": "error", "message": "format must be ndjson or csv"}), 400
+    start, end, error = parse_date_range(request.args.get('from'), request.args.get('to'))
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+    result = open_export(kind, start, end)
+    if isinstance(result, dict):
+        status = 404 if result["error"].startswith("Unknown export") else 500
+        return jsonify({"status": "error", "message": result["error"]}), status
+
+    connection, cursor, columns = result
+    gzip = request.args.get('gzip') == '1'
+    filename = f"{kind}-{datetime.now().strftime('%Y%m%d%H%M%S')}.{export_format}" + (".gz" if gzip else "")
+    response = Response(
+        stream_export(kind, connection, cursor, columns, export_format, gzip),
+        mimetype='application/gzip' if gzip else EXPORT_FORMATS[export_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# Every paid ticket of an exhibition as a ZIP streamed while the tickets render (admin only)
+@app.route('/api/admin/exhibitions/<int:exhibition_id>/tickets.zip', methods=['GET'])
+@admin_required
+def ticket_pack_route(exhibition_id):
+    result = open_ticket_pack(exhibition_id)
+    if isinstance(result, dict):
+        if result["error"] == "Exhibition not found":
+            return jsonify({"status": "error", "message": result["error"]}), 404
+        status = 503 if result["error"] == "Ticket rendering is unavailable" else 500
+        return jsonify({"status": "error", "message": result["error"]}), status
+
+    pack_id, tickets = result
+    response = Response(stream_ticket_pack(pack_id, exhibition_id, tickets), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="tickets-exhibition-{exhibition_id}.zip"'
+    response.headers['X-Pack-Id'] = pack_id
+    response.headers['X-Ticket-Count'] = str(len(tickets))
+    return response
+
+# Progress of a ticket pack download, from any worker (admin only)
+@app.route('/api/admin/ticket-packs/<pack_id>', methods=['GET'])
+@admin_required
+def ticket_pack_progress(pack_id):
+    progress = get_pack_progress(pack_id)
+    if progress is None:
+        return jsonify({"status": "error", "message": "Ticket pack not found"}), 404
+    return jsonify(progress)
+
+# Optional exhibitionId a scanner is admitting to; returns (id, error response)
+def scanner_exhibition(data):
+    exhibition_id = data.get('exhibitionId')
+    if exhibition_id is None:
+        return None, None
+    try:
+        return int(exhibition_id), None
+    except (TypeError, ValueError):
+        return None, (jsonify({"status": "error", "message": "exhibitionId must be an integer"}), 400)
+
+# Admit a scanned ticket, verified from its signature without a database lookup (admin only)
+@app.route('/api/tickets/check-in', methods=['POST'])
+@admin_required
+def ticket_check_in():
+    data = request.get_json(silent=True) or {}
+    exhibition_id, error = scanner_exhibition(data)
+    if error:
+        return error
+    try:
+        result = check_in(data.get('code'), exhibition_id)
+        if "error" in result:
+            return jsonify({"status": "error", "message": result["error"]}), 400
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error checking in ticket: %s", e)
+        return jsonify({"status": "error", "message": "Failed to check in ticket"}), 500
+
+# Upload the scans an offline scanner admitted (admin only)
+@app.route('/api/tickets/check-in/sync', methods=['POST'])
+@admin_required
+def ticket_check_in_sync():
+    data = request.get_json(silent=True) or {}
+    scans = data.get('scans')
+    if not isinstance(scans, list):
+        return jsonify({"status": "error", "message": "scans must be a list"}), 400
+    if len(scans) > CHECKIN_MAX_SYNC:
+        return jsonify({"status": "error", "message": f"At most {CHECKIN_MAX_SYNC} scans per request"}), 413
+    exhibition_id, error = scanner_exhibition(data)
+    if error:
+        return error
+    try:
+        return jsonify(sync_scans(scans, exhibition_id, data.get('generatedAt')))
+    except Exception as e:
+        logger.error("Error syncing offline check-ins: %s", e)
+        return jsonify({"status": "error", "message": "Failed to sync check-ins"}), 500
+
+# Signing key and used tickets for an offline scanner at one exhibition (admin only)
+@app.route('/api/admin/exhibitions/<int:exhibition_id>/checkin-manifest', methods=['GET'])
+@admin_required
+def checkin_manifest(exhibition_id):
+    try:
+        response = jsonify(get_manifest(exhibition_id))
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        logger.error("Error building check-in manifest: %s", e)
+        return jsonify({"status": "error", "message": "Failed to build manifest"}), 500
+
 # Serve static files from the static directory
 @app.route('/static/<path:path>')
 def serve_static(path):
     return send_from_directory('static', path)
 
-# Process base64 image and save to file
-def process_image_upload(image_data):
-    if not image_data or not isinstance(image_data, str) or not image_data.startswith('data:'):
-        print("Invalid image data:", image_data[:30] if image_data else "None")
-        return None
-        
+# Serve a catalogue list from the in-process cache, loading it on a miss
+def catalogue_response(kind, loader, variant=''):
+    entry = get_catalogue_entry(kind, variant)
+    if entry is None:
+        result = loader()
+        if isinstance(result, dict) and "error" in result:
+            return jsonify(result)
+        entry = store_catalogue_entry(kind, variant, json_dumps(result).encode('utf-8'))
+    # Lets compress_response reuse the compressed bytes stored with the entry
+    g.catalogue_entry = entry
+    response = app.response_class(entry.body, mimetype='application/json')
+    response.headers['ETag'] = entry.etag
+    return response
+
+# Catalogue list ordered by decayed view/click popularity instead of newest first
+def popular_catalogue(kind, loader):
+    result = loader()
+    if isinstance(result, dict) and kind in result:
+        result[kind] = sort_by_popularity(kind, result[kind])
+    return result
+
+# Artworks and exhibitions expose their row version as the ETag
+def version_etag(version):
+    return f'"{version}"'
+
+# Read the version a conditional write expects from If-Match; returns (version, error response).
+# If-Match: * applies the write to whatever version is current
+def if_match_version():
+    if 'If-Match' not in request.headers:
+        return None, (jsonify({"status": "error", "message": "If-Match header with the item's ETag is required"}), 428)
+    if request.if_match.star_tag:
+        return None, None
+    tags = request.if_match.as_set(include_weak=True)
     try:
-        # Extract mimetype
-        mimetype = image_data.split(';')[0].split(':')[1] if ';' in image_data and ':' in image_data else 'image/jpeg'
-        print(f"Detected mimetype: {mimetype}")
-        
-        # Extract content after the comma
-        if ',' in image_data:
-            image_data = image_data.split(",")[1]
-        else:
-            print("No comma found in base64 string")
-            return None
-        
-        # Get file extension from mimetype
-        file_extension = "jpg"  # Default to jpg
-        if "image/png" in mimetype:
-            file_extension = "png"
-        elif "image/jpeg" in mimetype or "image/jpg" in mimetype:
-            file_extension = "jpg"
-        elif "image/webp" in mimetype:
-            file_extension = "webp"
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = f"{timestamp}_image.{file_extension}"
-        
-        # Decode the base64 string
-        try:
-            image_binary = base64.b64decode(image_data)
-            
-            # Save to file
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            
-            print(f"Saving image to: {filepath}")
-            print(f"Directory exists: {os.path.exists(os.path.dirname(filepath))}")
-            print(f"Directory is writable: {os.access(os.path.dirname(filepath), os.W_OK)}")
-            
-            with open(filepath, "wb") as f:
-                f.write(image_binary)
-                
-            print(f"Image saved successfully, size: {len(image_binary)} bytes")
-            
-            # Verify file was actually created
-            if os.path.exists(filepath):
-                print(f"File exists after save: {os.path.getsize(filepath)} bytes")
-            else:
-                print("File does not exist after attempted save!")
-                return None
-                
-            # Return the relative URL
-            return f"/static/uploads/{filename}"
-            
-        except Exception as e:
-            print(f"Error decoding base64 data: {e}")
-            print(f"First 30 chars of data: {image_data[:30]}")
-            return None
-            
-    except Exception as e:
-        print(f"Error processing image: {e}")
-        traceback.print_exc()
-        return None
+        if len(tags) != 1:
+            raise ValueError
+        return int(tags.pop()), None
+    except ValueError:
+        return None, (jsonify({"status": "error", "message": "If-Match must be a single ETag returned by this API"}), 412)
+
+# 412 response for a write based on a stale version, carrying the current ETag
+def version_conflict_response(result):
+    response = jsonify({
+        "status": "error",
+        "message": "The item was changed by someone else; reload it and try again",
+        "version": result.get("version")
+    })
+    if result.get("version") is not None:
+        response.headers['ETag'] = version_etag(result["version"])
+    return response, 412
 
 # Authentication routes
 @app.route('/register', methods=['POST'])
@@ -163,27 +415,125 @@ def verify_token_middleware(f):
         return f(*args, **kwargs)
     return decorated
 
+# Search
+SEARCH_TYPES = {"all": None, "artworks": "artworks", "exhibitions": "exhibitions"}
+
+@app.route('/api/search', methods=['GET'])
+def search_catalogue():
+    try:
+        query = request.args.get('q', '').strip()
+        search_type = request.args.get('type', 'all')
+        if search_type not in SEARCH_TYPES:
+            return jsonify({"status": "error", "message": "type must be all, artworks or exhibitions"}), 400
+        try:
+            limit = int(request.args.get('limit', 20))
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({"status": "error", "message": "limit and offset must be integers"}), 400
+        if not query:
+            return jsonify({"query": query, "total": 0, "results": [], "corrected": False, "tookMs": 0})
+        # The index is built in the background when a worker starts
+        if not wait_until_loaded(2):
+            response = jsonify({"status": "error", "message": "Search index is loading"})
+            response.headers['Retry-After'] = '2'
+            return response, 503
+        return jsonify(search(query, SEARCH_TYPES[search_type], limit=limit, offset=max(offset, 0)))
+    except Exception as e:
+        logger.error("Error searching catalogue: %s", e)
+        return jsonify({"status": "error", "message": "Search failed"}), 500
+
+@app.route('/api/autocomplete', methods=['GET'])
+def autocomplete():
+    try:
+        fields = [field for field in request.args.get('field', '').split(',') if field]
+        unknown = [field for field in fields if field not in AUTOCOMPLETE_FIELDS]
+        if unknown:
+            return jsonify({"status": "error", "message": f"field must be one of {', '.join(AUTOCOMPLETE_FIELDS)}"}), 400
+        try:
+            limit = int(request.args.get('limit', AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+        if not wait_until_loaded(2):
+            response = jsonify({"status": "error", "message": "Search index is loading"})
+            response.headers['Retry-After'] = '2'
+            return response, 503
+        response = jsonify(suggest(request.args.get('q', ''), fields, limit))
+        # Suggestions change rarely; let browsers reuse them across keystrokes
+        response.headers['Cache-Control'] = 'public, max-age=30'
+        return response
+    except Exception as e:
+        logger.error("Error fetching suggestions: %s", e)
+        return jsonify({"status": "error", "message": "Failed to fetch suggestions"}), 500
+
+# View and click events
+EVENT_KINDS = {"artwork": "artworks", "artworks": "artworks", "exhibition": "exhibitions", "exhibitions": "exhibitions"}
+MAX_EVENTS_PER_REQUEST = 100
+
+@app.route('/api/events', methods=['POST'])
+def events():
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('events') if isinstance(data.get('events'), list) else [data]
+        if len(items) > MAX_EVENTS_PER_REQUEST:
+            return jsonify({"status": "error", "message": f"At most {MAX_EVENTS_PER_REQUEST} events per request"}), 400
+        accepted = 0
+        for item in items:
+            if not isinstance(item, dict) or item.get('kind') not in EVENT_KINDS:
+                continue
+            try:
+                item_id = int(item.get('id'))
+            except (TypeError, ValueError):
+                continue
+            if record_event(EVENT_KINDS[item['kind']], item_id, item.get('event', 'view')):
+                accepted += 1
+        return jsonify({"accepted": accepted, "rejected": len(items) - accepted}), 202
+    except Exception as e:
+        logger.error("Error recording events: %s", e)
+        return jsonify({"status": "error", "message": "Failed to record events"}), 500
+
 # Artwork routes
 @app.route('/api/artworks', methods=['GET'])
 def artworks():
     try:
-        all_artworks = get_all_artworks()
-        return jsonify(all_artworks)
+        if request.args.get('sort') == 'popular':
+            return catalogue_response('artworks', lambda: popular_catalogue('artworks', get_all_artworks), variant='popular')
+        return catalogue_response('artworks', get_all_artworks)
     except Exception as e:
-        print(f"Error fetching artworks: {e}")
+        logger.error("Error fetching artworks: %s", e)
         return jsonify({"status": "error", "message": "Failed to fetch artworks"}), 500
 
 @app.route('/api/artworks/<int:artwork_id>', methods=['GET'])
 def artwork(artwork_id):
     try:
         artwork = get_artwork(artwork_id)
-        if not artwork:
+        if not artwork or "error" in artwork:
             return jsonify({"status": "error", "message": "Artwork not found"}), 404
-        return jsonify(artwork)
+        response = jsonify(artwork)
+        response.headers['ETag'] = version_etag(artwork['version'])
+        return response
     except Exception as e:
-        print(f"Error fetching artwork: {e}")
+        logger.error("Error fetching artwork: %s", e)
         return jsonify({"status": "error", "message": "Failed to fetch artwork"}), 500
 
+@app.route('/api/artworks/<int:artwork_id>/similar', methods=['GET'])
+def similar(artwork_id):
+    try:
+        try:
+            limit = max(1, min(int(request.args.get('limit', RECOMMEND_LIMIT)), 12))
+        except ValueError:
+            return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+        result = similar_artworks(artwork_id, limit)
+        if "error" in result:
+            if result["error"] == "Artwork not found":
+                return jsonify({"status": "error", "message": result["error"]}), 404
+            response = jsonify({"status": "error", "message": result["error"]})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error fetching similar artworks: %s", e)
+        return jsonify({"status": "error", "message": "Failed to fetch similar artworks"}), 500
+
 @app.route('/api/artworks', methods=['POST'])
 @admin_required
 def add_artwork():
@@ -192,57 +542,87 @@ def add_artwork():
         
         # Process image if it's a base64 string
         if data.get('imageUrl') and data['imageUrl'].startswith('data:'):
-            print("Processing base64 image from artwork submission")
+            logger.debug("Processing base64 image from artwork submission")
             image_url = process_image_upload(data['imageUrl'])
             if image_url:
-                print(f"Image successfully processed and saved: {image_url}")
+                logger.debug("Image successfully processed and saved: %s", image_url)
                 data['imageUrl'] = image_url
             else:
-                print("Failed to process image, using default")
+                logger.warning("Failed to process image, responding with error")
                 return jsonify({
                     "status": "error", 
                     "message": "Failed to process image"
                 }), 400
         
-        print(f"Inserting artwork data: {data}")
+        logger.debug("Inserting artwork: %s", data.get("title"))
         artwork_id = create_artwork(request.headers.get('Authorization'), data)
+        invalidate_catalogue('artworks')
         return jsonify({
             "status": "success", 
             "message": f"Artwork created successfully with ID: {artwork_id}",
             "id": artwork_id
         }), 201
     except Exception as e:
-        print(f"Error creating artwork: {e}")
-        traceback.print_exc()
+        logger.exception("Error creating artwork: %s", e)
         return jsonify({"status": "error", "message": f"Failed to create artwork: {str(e)}"}), 500
 
 @app.route('/api/artworks/<int:artwork_id>', methods=['PUT'])
 @admin_required
 def update_artwork_route(artwork_id):
+    expected_version, error = if_match_version()
+    if error:
+        return error
     try:
         data = request.get_json()
         
         # Process image if it's a base64 string
         if data.get('imageUrl') and data['imageUrl'].startswith('data:'):
-            print("Processing base64 image from artwork update")
+            logger.debug("Processing base64 image from artwork update")
             image_url = process_image_upload(data['imageUrl'])
             if image_url:
-                print(f"Image successfully processed and saved: {image_url}")
+                logger.debug("Image successfully processed and saved: %s", image_url)
                 data['imageUrl'] = image_url
             else:
-                print("Failed to process image, responding with error")
+                logger.warning("Failed to process image, responding with error")
                 return jsonify({
                     "status": "error", 
                     "message": "Failed to process image"
                 }), 400
         
-        success = update_artwork(request.headers.get('Authorization'), artwork_id, data)
-        if not success:
-            return jsonify({"status": "error", "message": "Artwork not found"}), 404
-        return jsonify({"status": "success", "message": "Artwork updated successfully"})
+        result = update_artwork(request.headers.get('Authorization'), artwork_id, data, expected_version)
+        if "error" in result:
+            if result["error"] == "Version conflict":
+                return version_conflict_response(result)
+            status = 404 if result["error"] == "Artwork not found" else 400
+            return jsonify({"status": "error", "message": result["error"]}), status
+        invalidate_catalogue('artworks')
+        response = jsonify({"status": "success", "message": "Artwork updated successfully", "version": result["version"]})
+        response.headers['ETag'] = version_etag(result["version"])
+        return response
     except Exception as e:
-        print(f"Error updating artwork: {e}")
-        traceback.print_exc()
+        logger.exception("Error updating artwork: %s", e)
+        return jsonify({"status": "error", "message": f"Failed to update artwork: {str(e)}"}), 500
+
+@app.route('/api/artworks/<int:artwork_id>', methods=['PATCH'])
+@admin_required
+def patch_artwork_route(artwork_id):
+    expected_version, error = if_match_version()
+    if error:
+        return error
+    try:
+        result = patch_artwork(request.headers.get('Authorization'), artwork_id, request.get_json(silent=True), expected_version)
+        if "error" in result:
+            if result["error"] == "Version conflict":
+                return version_conflict_response(result)
+            status = 404 if result["error"] == "Artwork not found" else 400
+            return jsonify({"status": "error", "message": result["error"]}), status
+        if result["changed"]:
+            invalidate_catalogue('artworks')
+        response = jsonify(dict(result, status="success"))
+        response.headers['ETag'] = version_etag(result["version"])
+        return response
+    except Exception as e:
+        logger.exception("Error patching artwork: %s", e)
         return jsonify({"status": "error", "message": f"Failed to update artwork: {str(e)}"}), 500
 
 @app.route('/api/artworks/<int:artwork_id>', methods=['DELETE'])
@@ -250,33 +630,72 @@ def update_artwork_route(artwork_id):
 def delete_artwork_route(artwork_id):
     try:
         success = delete_artwork(request.headers.get('Authorization'), artwork_id)
+        invalidate_catalogue('artworks')
         if not success:
             return jsonify({"status": "error", "message": "Artwork not found"}), 404
         return jsonify({"status": "success", "message": "Artwork deleted successfully"})
     except Exception as e:
-        print(f"Error deleting artwork: {e}")
-        traceback.print_exc()
+        logger.exception("Error deleting artwork: %s", e)
         return jsonify({"status": "error", "message": f"Failed to delete artwork: {str(e)}"}), 500
 
+# Apply many creates/updates/deletes/status changes in one transaction (admin only)
+@app.route('/api/<any(artworks, exhibitions):kind>/bulk', methods=['POST'])
+@admin_required
+def bulk_operations_route(kind):
+    data = request.get_json(silent=True) or {}
+    try:
+        result = apply_bulk_operations(kind, data.get('operations'), atomic=bool(data.get('atomic')))
+        if "error" in result:
+            status = 500 if result["error"] == "Database connection failed" else 400
+            return jsonify({"status": "error", "message": result["error"]}), status
+        if result["applied"]:
+            invalidate_catalogue(kind)
+        return jsonify(dict(result, status="success" if result["failed"] == 0 else "partial"))
+    except Exception as e:
+        logger.exception("Error applying bulk %s operations: %s", kind, e)
+        return jsonify({"status": "error", "message": f"Failed to apply operations: {str(e)}"}), 500
+
 # Exhibition routes
+# ?status=upcoming|ongoing|past is today's status; ?from=&to= keeps exhibitions running in that range
 @app.route('/api/exhibitions', methods=['GET'])
 def exhibitions():
     try:
-        all_exhibitions = get_all_exhibitions()
-        return jsonify(all_exhibitions)
+        status = request.args.get('status') or None
+        if status is not None and status not in EXHIBITION_STATUSES:
+            return jsonify({"status": "error", "message": "status must be one of: " + ", ".join(EXHIBITION_STATUSES)}), 400
+        start, end, error = parse_date_range(request.args.get('from'), request.args.get('to'))
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
+
+        load = lambda: get_all_exhibitions(status, start, end)
+        variant = ''
+        if request.args.get('sort') == 'popular':
+            loader = lambda: popular_catalogue('exhibitions', load)
+            variant = 'popular'
+        else:
+            loader = load
+        # Date ranges are open-ended, so only the status views are cached
+        if start is not None or end is not None:
+            result = loader()
+            return jsonify(result), 500 if "error" in result else 200
+        if status is not None:
+            variant = f"{variant}:{status}"
+        return catalogue_response('exhibitions', loader, variant=variant)
     except Exception as e:
-        print(f"Error fetching exhibitions: {e}")
+        logger.error("Error fetching exhibitions: %s", e)
         return jsonify({"status": "error", "message": "Failed to fetch exhibitions"}), 500
 
 @app.route('/api/exhibitions/<int:exhibition_id>', methods=['GET'])
 def exhibition(exhibition_id):
     try:
         exhibition = get_exhibition(exhibition_id)
-        if not exhibition:
+        if not exhibition or "error" in exhibition:
             return jsonify({"status": "error", "message": "Exhibition not found"}), 404
-        return jsonify(exhibition)
+        response = jsonify(exhibition)
+        response.headers['ETag'] = version_etag(exhibition['version'])
+        return response
     except Exception as e:
-        print(f"Error fetching exhibition: {e}")
+        logger.error("Error fetching exhibition: %s", e)
         return jsonify({"status": "error", "message": "Failed to fetch exhibition"}), 500
 
 @app.route('/api/exhibitions', methods=['POST'])
@@ -287,71 +706,227 @@ def add_exhibition():
         
         # Process image if it's a base64 string
         if data.get('imageUrl') and data['imageUrl'].startswith('data:'):
-            print("Processing base64 image from exhibition submission")
+            logger.debug("Processing base64 image from exhibition submission")
             image_url = process_image_upload(data['imageUrl'])
             if image_url:
-                print(f"Image successfully processed and saved: {image_url}")
+                logger.debug("Image successfully processed and saved: %s", image_url)
                 data['imageUrl'] = image_url
             else:
-                print("Failed to process image, responding with error")
+                logger.warning("Failed to process image, responding with error")
                 return jsonify({
                     "status": "error", 
                     "message": "Failed to process image"
                 }), 400
         
-        exhibition_id = create_exhibition(data)
+        exhibition = create_exhibition(request.headers.get('Authorization'), data)
+        if "error" in exhibition:
+            status = 500 if exhibition["error"] == "Database connection failed" else 400
+            return jsonify({"status": "error", "message": exhibition["error"]}), status
+        invalidate_catalogue('exhibitions')
         return jsonify({
             "status": "success", 
             "message": "Exhibition created successfully",
-            "id": exhibition_id
+            "id": exhibition["id"]
         }), 201
     except Exception as e:
-        print(f"Error creating exhibition: {e}")
-        traceback.print_exc()
+        logger.exception("Error creating exhibition: %s", e)
         return jsonify({"status": "error", "message": f"Failed to create exhibition: {str(e)}"}), 500
 
 @app.route('/api/exhibitions/<int:exhibition_id>', methods=['PUT'])
 @admin_required
 def update_exhibition_route(exhibition_id):
+    expected_version, error = if_match_version()
+    if error:
+        return error
     try:
         data = request.get_json()
         
         # Process image if it's a base64 string
         if data.get('imageUrl') and data['imageUrl'].startswith('data:'):
-            print("Processing base64 image from exhibition update")
+            logger.debug("Processing base64 image from exhibition update")
             image_url = process_image_upload(data['imageUrl'])
             if image_url:
-                print(f"Image successfully processed and saved: {image_url}")
+                logger.debug("Image successfully processed and saved: %s", image_url)
                 data['imageUrl'] = image_url
             else:
-                print("Failed to process image, responding with error")
+                logger.warning("Failed to process image, responding with error")
                 return jsonify({
                     "status": "error", 
                     "message": "Failed to process image"
                 }), 400
         
-        success = update_exhibition(exhibition_id, data)
-        if not success:
-            return jsonify({"status": "error", "message": "Exhibition not found"}), 404
-        return jsonify({"status": "success", "message": "Exhibition updated successfully"})
+        result = update_exhibition(request.headers.get('Authorization'), exhibition_id, data, expected_version)
+        if "error" in result:
+            if result["error"] == "Version conflict":
+                return version_conflict_response(result)
+            status = 404 if result["error"] == "Exhibition not found" else 400
+            return jsonify({"status": "error", "message": result["error"]}), status
+        invalidate_catalogue('exhibitions')
+        response = jsonify({"status": "success", "message": "Exhibition updated successfully", "version": result["version"]})
+        response.headers['ETag'] = version_etag(result["version"])
+        return response
+    except Exception as e:
+        logger.exception("Error updating exhibition: %s", e)
+        return jsonify({"status": "error", "message": f"Failed to update exhibition: {str(e)}"}), 500
+
+@app.route('/api/exhibitions/<int:exhibition_id>', methods=['PATCH'])
+@admin_required
+def patch_exhibition_route(exhibition_id):
+    expected_version, error = if_match_version()
+    if error:
+        return error
+    try:
+        result = patch_exhibition(request.headers.get('Authorization'), exhibition_id, request.get_json(silent=True), expected_version)
+        if "error" in result:
+            if result["error"] == "Version conflict":
+                return version_conflict_response(result)
+            status = 404 if result["error"] == "Exhibition not found" else 400
+            return jsonify({"status": "error", "message": result["error"]}), status
+        if result["changed"]:
+            invalidate_catalogue('exhibitions')
+        response = jsonify(dict(result, status="success"))
+        response.headers['ETag'] = version_etag(result["version"])
+        return response
     except Exception as e:
-        print(f"Error updating exhibition: {e}")
-        traceback.print_exc()
+        logger.exception("Error patching exhibition: %s", e)
         return jsonify({"status": "error", "message": f"Failed to update exhibition: {str(e)}"}), 500
 
 @app.route('/api/exhibitions/<int:exhibition_id>', methods=['DELETE'])
 @admin_required
 def delete_exhibition_route(exhibition_id):
     try:
-        success = delete_exhibition(exhibition_id)
-        if not success:
-            return jsonify({"status": "error", "message": "Exhibition not found"}), 404
+        result = delete_exhibition(request.headers.get('Authorization'), exhibition_id)
+        if "error" in result:
+            status = 404 if result["error"] == "Exhibition not found" else 500
+            return jsonify({"status": "error", "message": result["error"]}), status
+        invalidate_catalogue('exhibitions')
         return jsonify({"status": "success", "message": "Exhibition deleted successfully"})
     except Exception as e:
-        print(f"Error deleting exhibition: {e}")
-        traceback.print_exc()
+        logger.exception("Error deleting exhibition: %s", e)
         return jsonify({"status": "error", "message": f"Failed to delete exhibition: {str(e)}"}), 500
 
+# Timed-entry slots on one day with the places left in each
+@app.route('/api/exhibitions/<int:exhibition_id>/time-slots', methods=['GET'])
+def exhibition_time_slots(exhibition_id):
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({"status": "error", "message": "date must be YYYY-MM-DD"}), 400
+    try:
+        result = get_day_slots(exhibition_id, day)
+        if "error" in result:
+            return jsonify({"status": "error", "message": result["error"]}), 500
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error fetching time slots: %s", e)
+        return jsonify({"status": "error", "message": "Failed to fetch time slots"}), 500
+
+# Availability of every day in a month with slots, from one query
+@app.route('/api/exhibitions/<int:exhibition_id>/time-slots/calendar', methods=['GET'])
+def exhibition_slot_calendar(exhibition_id):
+    try:
+        month = datetime.strptime(request.args.get('month', ''), '%Y-%m')
+    except ValueError:
+        return jsonify({"status": "error", "message": "month must be YYYY-MM"}), 400
+    try:
+        result = get_month_calendar(exhibition_id, month.year, month.month)
+        if "error" in result:
+            return jsonify({"status": "error", "message": result["error"]}), 500
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error fetching slot calendar: %s", e)
+        return jsonify({"status": "error", "message": "Failed to fetch slot calendar"}), 500
+
+# Create slots or change their capacity (admin only)
+@app.route('/api/exhibitions/<int:exhibition_id>/time-slots', methods=['PUT'])
+@admin_required
+def save_exhibition_time_slots(exhibition_id):
+    data = request.get_json(silent=True) or {}
+    slots = data.get('slots')
+    if not isinstance(slots, list) or not slots:
+        return jsonify({"status": "error", "message": "slots must be a non-empty list"}), 400
+    if len(slots) > TIME_SLOTS_MAX_BATCH:
+        return jsonify({"status": "error", "message": f"At most {TIME_SLOTS_MAX_BATCH} slots per request"}), 413
+    try:
+        result = save_time_slots(exhibition_id, slots)
+        if "error" in result:
+            if result["error"] == "Exhibition not found":
+                return jsonify({"status": "error", "message": result["error"]}), 404
+            status = 500 if result["error"] == "Database connection failed" else 400
+            return jsonify({"status": "error", "message": result["error"]}), status
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error saving time slots: %s", e)
+        return jsonify({"status": "error", "message": "Failed to save time slots"}), 500
+
+# Book places in one slot; the booking is then paid like any other
+@app.route('/api/exhibitions/<int:exhibition_id>/time-slots/<int:slot_id>/bookings', methods=['POST'])
+def book_exhibition_time_slot(exhibition_id, slot_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        result = book_time_slot(request.headers.get('Authorization'), exhibition_id, slot_id, data)
+        if "error" in result:
+            if result["error"].startswith(("slots must", "Missing required fields")):
+                return jsonify({"status": "error", "message": result["error"]}), 400
+            return user_error_response(result["error"])
+        return jsonify(result), 201
+    except Exception as e:
+        logger.error("Error booking time slot: %s", e)
+        return jsonify({"status": "error", "message": "Failed to book time slot"}), 500
+
+# Queue for a sold-out exhibition; free slot places are offered in join order
+@app.route('/api/exhibitions/<int:exhibition_id>/waitlist', methods=['POST'])
+def join_exhibition_waitlist(exhibition_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        result = join_waitlist(request.headers.get('Authorization'), exhibition_id, data)
+        if "error" in result:
+            if result["error"].startswith(("slots must", "date must")):
+                return jsonify({"status": "error", "message": result["error"]}), 400
+            return user_error_response(result["error"])
+        return jsonify(result), 201
+    except Exception as e:
+        logger.error("Error joining waitlist: %s", e)
+        return jsonify({"status": "error", "message": "Failed to join waitlist"}), 500
+
+# A waitlist entry's place in the queue, or the offer waiting to be claimed
+@app.route('/api/waitlist/<int:entry_id>', methods=['GET'])
+def waitlist_entry(entry_id):
+    try:
+        result = get_waitlist_entry(request.headers.get('Authorization'), entry_id)
+        if "error" in result:
+            return user_error_response(result["error"])
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error fetching waitlist entry: %s", e)
+        return jsonify({"status": "error", "message": "Failed to fetch waitlist entry"}), 500
+
+@app.route('/api/waitlist/<int:entry_id>', methods=['DELETE'])
+def leave_exhibition_waitlist(entry_id):
+    try:
+        result = leave_waitlist(request.headers.get('Authorization'), entry_id)
+        if "error" in result:
+            return user_error_response(result["error"])
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error leaving waitlist: %s", e)
+        return jsonify({"status": "error", "message": "Failed to leave waitlist"}), 500
+
+# Turn an offer into a pending booking, paid like any other
+@app.route('/api/waitlist/<int:entry_id>/claim', methods=['POST'])
+def claim_waitlist_offer(entry_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        result = claim_offer(request.headers.get('Authorization'), entry_id, data)
+        if "error" in result:
+            if result["error"].startswith("Missing required fields"):
+                return jsonify({"status": "error", "message": result["error"]}), 400
+            return user_error_response(result["error"])
+        return jsonify(result), 201
+    except Exception as e:
+        logger.error("Error claiming waitlist offer: %s", e)
+        return jsonify({"status": "error", "message": "Failed to claim offer"}), 500
+
 # Contact routes
 @app.route('/contact', methods=['POST'])
 def contact():
@@ -374,6 +949,94 @@ def update_message_route(message_id):
     result = update_message(auth_header, message_id, data)
     return jsonify(result)
 
+# Status codes for the errors returned by routes that check the caller's token themselves
+USER_ERROR_STATUS = {
+    "Invalid cursor": 400,
+    "Authentication required": 401,
+    "Invalid authentication token": 401,
+    "Unauthorized access": 403,
+    "Booking not found": 404,
+    "Booking is not paid": 409,
+    "Time slot not found": 404,
+    "Time slot is full": 409,
+    "Time slot has already started": 409,
+    "Exhibition not found": 404,
+    "Already on the waitlist": 409,
+    "Waitlist entry not found": 404,
+    "Waitlist entry is no longer active": 409,
+    "No offer to claim": 409,
+    "Offer has expired": 409,
+    "Ticket rendering is unavailable": 503
+}
+
+def user_error_response(error):
+    status = USER_ERROR_STATUS.get(error, 401 if error.startswith("Token verification failed") else 500)
+    return jsonify({"status": "error", "message": error}), status
+
+# A user's orders and bookings, newest first; each list pages with its own cursor
+ORDER_LIST_TYPES = {"all": tuple(ORDER_LISTS), "orders": ("orders",), "bookings": ("bookings",)}
+
+@app.route('/orders/user/<int:user_id>', methods=['GET'])
+def user_orders(user_id):
+    try:
+        lists = ORDER_LIST_TYPES.get(request.args.get('type', 'all'))
+        if lists is None:
+            return jsonify({"status": "error", "message": "type must be one of: " + ", ".join(ORDER_LIST_TYPES)}), 400
+        try:
+            limit = int(request.args.get('limit', USER_ORDERS_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+        cursors = {
+            "orders": request.args.get('ordersCursor'),
+            "bookings": request.args.get('bookingsCursor')
+        }
+        result = get_user_orders(request.headers.get('Authorization'), user_id, cursors, limit, lists)
+        if "error" in result:
+            return user_error_response(result["error"])
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error fetching user orders: %s", e)
+        return jsonify({"status": "error", "message": "Failed to fetch orders"}), 500
+
+# Bookings as tickets, newest first, with sold/remaining per exhibition on the page (admin only)
+@app.route('/tickets', methods=['GET'])
+@admin_required
+def tickets_route():
+    try:
+        exhibition_id = request.args.get('exhibitionId', type=int)
+        limit = request.args.get('limit', type=int)
+        start, end, error = parse_date_range(request.args.get('from'), request.args.get('to'))
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
+        result = list_tickets(
+            exhibition_id, request.args.get('status') or None, start, end,
+            request.args.get('cursor'), limit or TICKETS_PAGE_SIZE
+        )
+        if "error" in result:
+            status = 400 if result["error"] == "Invalid cursor" or result["error"].startswith("status must") else 500
+            return jsonify({"status": "error", "message": result["error"]}), status
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error listing tickets: %s", e)
+        return jsonify({"status": "error", "message": "Failed to fetch tickets"}), 500
+
+# Ticket PDF for a paid booking (its owner or an admin), rendered once per booking version
+@app.route('/tickets/generate/<int:booking_id>', methods=['GET'])
+def generate_ticket(booking_id):
+    try:
+        result = get_ticket(request.headers.get('Authorization'), booking_id)
+        if "error" in result:
+            return user_error_response(result["error"])
+        return jsonify(result)
+    except Exception as e:
+        logger.error("Error generating ticket: %s", e)
+        return jsonify({"status": "error", "message": "Failed to generate ticket"}), 500
+
+# Cached ticket PDFs; a file's name changes whenever its content would
+@app.route('/tickets/files/<filename>')
+def ticket_file(filename):
+    return send_from_directory(TICKET_CACHE_DIR, filename, mimetype='application/pdf', max_age=31536000)
+
 # Payment routes
 @app.route('/mpesa/stk-push', methods=['POST'])
 def stk_push():
@@ -389,7 +1052,7 @@ def stk_push():
         response = initiate_stk_push(phone_number, amount, order_type, order_id, user_id, account_reference)
         return jsonify(response)
     except Exception as e:
-        print(f"M-Pesa Error: {e}")
+        logger.error("M-Pesa Error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # Main entry point
@@ -398,19 +1061,18 @@ if __name__ == '__main__':
     try:
         create_upload_directory()
         verify_static_serving()
-        print("Upload directory and static serving initialized successfully.")
+        logger.info("Upload directory and static serving initialized successfully.")
     except Exception as e:
-        print(f"Error initializing upload directory: {e}")
-        traceback.print_exc()
+        logger.exception("Error initializing upload directory: %s", e)
     
     # Initialize the database table structure (moved init_db logic)
     try:
         # Use MySQL-specific initialization
         from db_setup import initialize_database
         initialize_database()
-        print("Database initialized successfully.")
+        logger.info("Database initialized successfully.")
     except Exception as e:
-        print(f"Error initializing database: {e}")
+        logger.error("Error initializing database: %s", e)
         sys.exit(1)
     
     # Check upload directory permissions
@@ -420,18 +1082,18 @@ if __name__ == '__main__':
             f.write("Testing write permissions\n")
         if os.path.exists(test_file_path):
             os.remove(test_file_path)
-            print(f"Upload directory {UPLOAD_FOLDER} is writable")
+            logger.info("Upload directory %s is writable", UPLOAD_FOLDER)
         else:
-            print(f"Failed to verify write permissions for {UPLOAD_FOLDER}")
+            logger.error("Failed to verify write permissions for %s", UPLOAD_FOLDER)
     except Exception as e:
-        print(f"Error checking upload directory permissions: {e}")
-        print("Attempting to set permissions...")
+        logger.error("Error checking upload directory permissions: %s", e)
+        logger.warning("Attempting to set permissions...")
         try:
             # Try to set more permissive permissions
             os.chmod(UPLOAD_FOLDER, 0o777)  # rwxrwxrwx
-            print("Set permissions to 0o777 for uploads directory")
+            logger.info("Set permissions to 0o777 for uploads directory")
         except Exception as e:
-            print(f"Failed to set permissions: {e}")
+            logger.error("Failed to set permissions: %s", e)
     
     # Start the Flask server
     app.run(debug=True, host='0.0.0.0')
@@ -0,0 +1,65 @@
+"""Concurrency checks for the search index: queries run while updates publish."""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search  # noqa: E402
+
+WORDS = "harvest river city market garden light stone night quiet bloom".split()
+
+
+def _artwork(number, title=None):
+    return {
+        "id": number,
+        "title": title or "%s %s" % (WORDS[number % 10], WORDS[(number * 7) % 10]),
+        "artist": "Artist %d" % (number % 40),
+        "description": " ".join(WORDS[(number + i) % 10] for i in range(6)),
+        "medium": "oil",
+        "price": 100,
+        "image_url": None,
+        "dimensions": None,
+        "year": 2020,
+        "status": "available",
+    }
+
+
+def test_queries_and_updates_run_concurrently():
+    search._on_catalogue_change("artworks", [_artwork(n) for n in range(1, 3001)], [], True)
+    errors = []
+    done = threading.Event()
+    queries = ["%s %s" % (WORDS[i], WORDS[j]) for i in range(10) for j in range(10) if i != j]
+
+    def read():
+        try:
+            while not done.is_set():
+                for query in queries + ["market cit", "gardn", "harvest"]:
+                    search.search(query, kind="artworks", limit=10)
+        except Exception as error:
+            errors.append(error)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    for reader in readers:
+        reader.start()
+    try:
+        for step in range(1500):
+            number = step % 3000 + 1
+            if step % 5 == 4:
+                search._on_catalogue_change("artworks", [], [number], False)
+            else:
+                search._on_catalogue_change(
+                    "artworks", [_artwork(number, "Zephyr%d %s" % (step, WORDS[step % 10]))], [], False)
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    results = search.search("zephyr1498", kind="artworks")
+    assert [item["id"] for item in results["results"]] == ["1499"]
+    assert search.get_search_stats()["documents"] == 2700
@@ -0,0 +1,158 @@
+"""
+Admin listing of exhibition bookings as tickets.
+
+Pages are read newest first by keyset on (booking_date, id), so each page is
+an index range scan whatever its depth: (booking_date) unfiltered, or
+(exhibition_id, booking_date) / (payment_status, booking_date) when filtered.
+
+Per-exhibition aggregates for the exhibitions on the page come from counters
+kept as payments complete (exhibitions.available_slots and the
+sales_by_exhibition rollup) plus an index count of ticket_checkins, never from
+the bookings themselves.
+"""
+
+import os
+from decimal import Decimal
+from database import get_db_connection
+from logging_setup import get_logger
+from orders import encode_cursor, decode_cursor
+from tickets import sign_ticket, ticket_expiry
+
+logger = get_logger('ticket_list')
+
+TICKETS_PAGE_SIZE = int(os.environ.get('TICKETS_PAGE_SIZE', '50'))
+TICKETS_MAX_PAGE_SIZE = 500
+
+PAYMENT_STATUSES = ("pending", "completed", "failed")
+
+TICKETS_QUERY = """
+    SELECT b.id, b.booking_date, b.user_id, b.name, b.email, b.exhibition_id, e.title,
+           e.end_date, b.slots, b.total_amount, b.payment_status, b.refund_due, c.checked_in_at
+    FROM exhibition_bookings b
+    JOIN exhibitions e ON e.id = b.exhibition_id
+    LEFT JOIN ticket_checkins c ON c.booking_id = b.id
+    WHERE {conditions}
+    ORDER BY b.booking_date DESC, b.id DESC
+    LIMIT %s
+"""
+
+AGGREGATES_QUERY = """
+    SELECT e.id, e.title, e.total_slots, e.available_slots,
+           COALESCE(s.completed, 0), COALESCE(s.units, 0), COALESCE(s.revenue, 0),
+           (SELECT COUNT(*) FROM ticket_checkins c WHERE c.exhibition_id = e.id)
+    FROM exhibitions e
+    LEFT JOIN sales_by_exhibition s ON s.exhibition_id = e.id
+    WHERE e.id IN ({ids})
+"""
+
+def _number(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+def ticket_status(payment_status, checked_in_at, refund_due=False):
+    if refund_due:
+        return "refund_due"
+    if checked_in_at is not None:
+        return "used"
+    if payment_status == "completed":
+        return "active"
+    return "cancelled" if payment_status == "failed" else "pending"
+
+def _ticket_item(row):
+    (booking_id, booking_date, user_id, name, email, exhibition_id, title, end_date,
+     slots, total, payment_status, refund_due, checked_in_at) = row
+    return {
+        "id": str(booking_id),
+        "userId": str(user_id),
+        "userName": name,
+        "email": email,
+        "exhibitionId": str(exhibition_id),
+        "exhibitionTitle": title,
+        "bookingDate": booking_date.isoformat() if booking_date else None,
+        "slots": slots,
+        "totalAmount": _number(total),
+        "paymentStatus": payment_status,
+        "status": ticket_status(payment_status, checked_in_at, refund_due),
+        "checkedInAt": checked_in_at.isoformat() if checked_in_at else None,
+        # Only a paid booking has a code that admits anyone
+        "ticketCode": sign_ticket(booking_id, exhibition_id, slots, ticket_expiry(end_date))
+                      if payment_status == "completed" else None
+    }
+
+def _aggregate_item(row):
+    exhibition_id, title, total_slots, available_slots, completed, sold, revenue, checked_in = row
+    return {
+        "exhibitionId": str(exhibition_id),
+        "title": title,
+        "totalSlots": total_slots,
+        "sold": int(sold),
+        "remaining": available_slots,
+        "paidBookings": int(completed),
+        "revenue": _number(revenue),
+        "checkedIn": checked_in
+    }
+
+def list_tickets(exhibition_id=None, payment_status=None, start=None, end=None, cursor=None,
+                 limit=TICKETS_PAGE_SIZE):
+    """Return a page of tickets, newest first, with aggregates for the exhibitions on it"""
+    if payment_status is not None and payment_status not in PAYMENT_STATUSES:
+        return {"error": "status must be one of: " + ", ".join(PAYMENT_STATUSES)}
+    limit = max(1, min(limit, TICKETS_MAX_PAGE_SIZE))
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return {"error": "Invalid cursor"}
+
+    conditions = ["1 = 1"]
+    params = []
+    if exhibition_id is not None:
+        conditions.append("b.exhibition_id = %s")
+        params.append(exhibition_id)
+    if payment_status is not None:
+        conditions.append("b.payment_status = %s")
+        params.append(payment_status)
+    if start is not None:
+        conditions.append("b.booking_date >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("b.booking_date < %s")
+        params.append(end)
+    if after is not None:
+        # The (date, id) < cursor comparison spelled out so MySQL range-scans the index
+        conditions.append("(b.booking_date < %s OR (b.booking_date = %s AND b.id < %s))")
+        params.extend([after[0], after[0], after[1]])
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    db_cursor = connection.cursor()
+
+    try:
+        db_cursor.execute(TICKETS_QUERY.format(conditions=" AND ".join(conditions)), params + [limit + 1])
+        rows = db_cursor.fetchall()
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(rows) > limit else None
+
+        exhibition_ids = {row[5] for row in page}
+        if exhibition_id is not None:
+            exhibition_ids.add(exhibition_id)
+        aggregates = []
+        if exhibition_ids:
+            db_cursor.execute(
+                AGGREGATES_QUERY.format(ids=", ".join(["%s"] * len(exhibition_ids))),
+                sorted(exhibition_ids)
+            )
+            aggregates = [_aggregate_item(row) for row in db_cursor.fetchall()]
+
+        return {
+            "tickets": [_ticket_item(row) for row in page],
+            "nextCursor": next_cursor,
+            "exhibitions": aggregates
+        }
+    except Exception as e:
+        logger.error("Error listing tickets: %s", e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            db_cursor.close()
+            connection.close()
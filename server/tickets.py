@@ -0,0 +1,467 @@
+"""
+Exhibition ticket PDFs.
+
+A ticket shows the booking details and a QR code holding a signed ticket code:
+booking id, exhibition id, slots and expiry, authenticated with an HMAC under a
+key derived for the exhibition, so a code can be checked without the database.
+
+PDFs are rendered with reportlab on a pool of TICKET_RENDER_WORKERS processes
+(default: one per core) and cached in TICKET_CACHE_DIR as
+
+    <booking id>-<booking version>-<tag>.pdf
+
+where the tag is an HMAC of the booking and the exhibition details printed on
+the ticket, so file names cannot be guessed and /tickets/files/ serves them
+directly. A payment update bumps the booking version and editing the
+exhibition's title, place or dates changes the tag, so the next request renders
+a fresh ticket and removes the stale file. Without reportlab installed,
+tickets are unavailable.
+
+stream_ticket_pack() streams every paid ticket of an exhibition as a ZIP,
+writing cached tickets first and the rest as the pool finishes them, so only
+the ticket being copied is ever held in memory. Pack progress is written to a
+small JSON file in the cache directory so any worker can report it.
+"""
+
+import os
+import glob
+import hmac
+import json
+import time
+import uuid
+import zipfile
+import struct
+import base64
+import binascii
+import hashlib
+import functools
+import threading
+import multiprocessing
+from datetime import datetime, time as day_time, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from auth import SECRET_KEY, verify_auth_header
+from database import get_db_connection
+from logging_setup import get_logger
+
+try:
+    from reportlab.lib.pagesizes import A6, landscape
+    from reportlab.pdfgen import canvas
+    from reportlab.graphics import renderPDF
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics.barcode.qr import QrCodeWidget
+except ImportError:
+    canvas = None
+
+logger = get_logger('tickets')
+
+TICKET_CACHE_DIR = os.environ.get('TICKET_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'ticket_cache'))
+TICKET_RENDER_WORKERS = int(os.environ.get('TICKET_RENDER_WORKERS', str(os.cpu_count() or 1)))
+TICKET_RENDER_TIMEOUT = float(os.environ.get('TICKET_RENDER_TIMEOUT', '30'))
+TICKET_SECRET = os.environ.get('TICKET_SECRET', SECRET_KEY).encode('utf-8')
+TICKET_PACK_DIR = os.path.join(TICKET_CACHE_DIR, 'packs')
+# Seconds between progress file updates while a pack streams
+TICKET_PACK_PROGRESS_INTERVAL = 0.5
+# Progress files older than this are removed when a new pack starts
+TICKET_PACK_KEEP_SECONDS = 86400
+# Codes stay valid until this many days after the exhibition ends
+TICKET_GRACE_DAYS = 1
+
+TICKET_CODE_PREFIX = "T1."
+# booking id, exhibition id, slots, expiry (unix seconds)
+TICKET_PAYLOAD = struct.Struct(">IIHI")
+TICKET_MAC_BYTES = 12
+
+TICKET_QUERY = """
+    SELECT b.id, b.user_id, b.exhibition_id, b.name, b.email, b.slots, b.total_amount,
+           b.payment_status, b.booking_date, b.version,
+           e.title, e.location, e.start_date, e.end_date
+    FROM exhibition_bookings b
+    JOIN exhibitions e ON e.id = b.exhibition_id
+"""
+
+TICKET_STATS = {
+    "requests": 0,
+    "cache_hits": 0,
+    "renders": 0,
+    "render_errors": 0,
+    "render_seconds_total": 0.0,
+    "packs": 0,
+    "pack_tickets": 0
+}
+
+_lock = threading.Lock()
+# cache file path -> future of the render writing it
+_inflight = {}
+_state = {"executor": None, "pid": None}
+
+@functools.lru_cache(maxsize=1024)
+def exhibition_key(exhibition_id):
+    """Signing key for one exhibition's ticket codes, derived from TICKET_SECRET"""
+    return hmac.new(TICKET_SECRET, b"exhibition:%d" % exhibition_id, hashlib.sha256).digest()
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode('ascii')
+
+def sign_ticket(booking_id, exhibition_id, slots, expires):
+    """Return the compact signed code printed in a ticket's QR code"""
+    payload = TICKET_PAYLOAD.pack(booking_id, exhibition_id, slots, expires)
+    mac = hmac.new(exhibition_key(exhibition_id), payload, hashlib.sha256).digest()[:TICKET_MAC_BYTES]
+    return TICKET_CODE_PREFIX + _b64(payload + mac)
+
+def verify_ticket_code(code, now=None):
+    """Check a ticket code's signature and expiry without the database; return its fields or an error dict"""
+    if not isinstance(code, str) or not code.startswith(TICKET_CODE_PREFIX):
+        return {"error": "Invalid ticket"}
+    body = code[len(TICKET_CODE_PREFIX):]
+    try:
+        raw = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+    except (ValueError, binascii.Error):
+        return {"error": "Invalid ticket"}
+    if len(raw) != TICKET_PAYLOAD.size + TICKET_MAC_BYTES:
+        return {"error": "Invalid ticket"}
+
+    payload, mac = raw[:TICKET_PAYLOAD.size], raw[TICKET_PAYLOAD.size:]
+    booking_id, exhibition_id, slots, expires = TICKET_PAYLOAD.unpack(payload)
+    expected = hmac.new(exhibition_key(exhibition_id), payload, hashlib.sha256).digest()[:TICKET_MAC_BYTES]
+    if not hmac.compare_digest(mac, expected):
+        return {"error": "Invalid ticket"}
+    if expires < (now if now is not None else time.time()):
+        return {"error": "Ticket expired"}
+    return {"bookingId": booking_id, "exhibitionId": exhibition_id, "slots": slots, "expires": expires}
+
+def ticket_expiry(end_date):
+    """Unix time at which codes for an exhibition ending on end_date stop being valid"""
+    expires = datetime.combine(end_date + timedelta(days=TICKET_GRACE_DAYS + 1), day_time(), timezone.utc)
+    return int(expires.timestamp())
+
+def ticket_from_row(row):
+    """Turn a TICKET_QUERY row into the picklable dict the renderer takes"""
+    (booking_id, user_id, exhibition_id, name, email, slots, total, payment_status, booking_date,
+     booking_version, title, location, start_date, end_date) = row
+    ticket = {
+        "bookingId": booking_id,
+        "userId": user_id,
+        "exhibitionId": exhibition_id,
+        "name": name,
+        "email": email,
+        "slots": slots,
+        "totalAmount": float(total),
+        "paymentStatus": payment_status,
+        "bookingDate": booking_date.strftime('%d %b %Y %H:%M') if booking_date else "",
+        "title": title,
+        "location": location,
+        "startDate": start_date.strftime('%d %b %Y'),
+        "endDate": end_date.strftime('%d %b %Y'),
+        "code": sign_ticket(booking_id, exhibition_id, slots, ticket_expiry(end_date))
+    }
+    ticket["filename"] = ticket_filename(ticket, booking_version)
+    return ticket
+
+def ticket_filename(ticket, booking_version):
+    name = f"{ticket['bookingId']}-{booking_version}"
+    printed = "\x1f".join(str(ticket[field]) for field in ("title", "location", "startDate", "endDate", "code"))
+    tag = hmac.new(TICKET_SECRET, f"{name}\x1f{printed}".encode('utf-8'), hashlib.sha256).hexdigest()[:20]
+    return f"{name}-{tag}.pdf"
+
+def ticket_url(ticket):
+    return f"/tickets/files/{ticket['filename']}"
+
+def _fit(pdf, text, font, size, max_width):
+    """Cut text so it fits in max_width points"""
+    while text and pdf.stringWidth(text, font, size) > max_width:
+        text = text[:-2] + "\u2026" if len(text) > 1 else ""
+    return text
+
+def render_ticket_pdf(ticket, path):
+    """Draw one ticket into a PDF at path; runs in a pool worker"""
+    start = time.perf_counter()
+    width, height = landscape(A6)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pdf = canvas.Canvas(tmp_path, pagesize=(width, height), invariant=1)
+    pdf.setTitle(f"Ticket {ticket['bookingId']} - {ticket['title']}")
+
+    qr_size = 120
+    text_width = width - qr_size - 66
+
+    pdf.setFont("Helvetica-Bold", 9)
+    pdf.drawString(24, height - 30, "EXHIBITION TICKET")
+    pdf.setFont("Helvetica-Bold", 15)
+    pdf.drawString(24, height - 52, _fit(pdf, ticket["title"], "Helvetica-Bold", 15, text_width))
+    pdf.setFont("Helvetica", 9)
+    lines = [
+        ticket["location"],
+        f"{ticket['startDate']} - {ticket['endDate']}",
+        "",
+        f"Name: {ticket['name']}",
+        f"Tickets: {ticket['slots']}",
+        f"Paid: KES {ticket['totalAmount']:,.2f}",
+        f"Booked: {ticket['bookingDate']}",
+        f"Booking #{ticket['bookingId']}",
+    ]
+    for i, line in enumerate(lines):
+        pdf.drawString(24, height - 74 - i * 13, _fit(pdf, line, "Helvetica", 9, text_width))
+
+    widget = QrCodeWidget(ticket["code"], barLevel='M')
+    x0, y0, x1, y1 = widget.getBounds()
+    drawing = Drawing(qr_size, qr_size, transform=[qr_size / (x1 - x0), 0, 0, qr_size / (y1 - y0), 0, 0])
+    drawing.add(widget)
+    renderPDF.draw(drawing, pdf, width - qr_size - 18, height - qr_size - 40)
+    pdf.setFont("Helvetica", 6)
+    pdf.drawCentredString(width - qr_size / 2 - 18, height - qr_size - 46, ticket["code"])
+
+    pdf.showPage()
+    pdf.save()
+    os.replace(tmp_path, path)
+    return time.perf_counter() - start
+
+def _executor():
+    """This process's render pool, created on first use"""
+    pid = os.getpid()
+    if _state["pid"] != pid:
+        with _lock:
+            if _state["pid"] != pid:
+                # Workers only run render_ticket_pdf, so forking them from a
+                # threaded server is safe and avoids re-importing the app
+                _state["executor"] = ProcessPoolExecutor(
+                    max_workers=TICKET_RENDER_WORKERS, mp_context=multiprocessing.get_context('fork')
+                )
+                _inflight.clear()
+                _state["pid"] = pid
+    return _state["executor"]
+
+def _finished(ticket, path, future):
+    with _lock:
+        _inflight.pop(path, None)
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        TICKET_STATS["render_errors"] += 1
+        logger.error("Error rendering ticket for booking %s: %s", ticket["bookingId"], future.exception())
+        return
+    TICKET_STATS["renders"] += 1
+    TICKET_STATS["render_seconds_total"] += future.result()
+    # Earlier versions of this booking's ticket are stale now
+    for stale in glob.glob(os.path.join(TICKET_CACHE_DIR, f"{ticket['bookingId']}-*.pdf")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+def submit_render(ticket):
+    """Return a future for the ticket's cached PDF path, or None if it is already cached"""
+    path = os.path.join(TICKET_CACHE_DIR, ticket["filename"])
+    if os.path.exists(path):
+        TICKET_STATS["cache_hits"] += 1
+        return None
+    executor = _executor()
+    with _lock:
+        future = _inflight.get(path)
+        if future is None:
+            os.makedirs(TICKET_CACHE_DIR, exist_ok=True)
+            future = _inflight[path] = executor.submit(render_ticket_pdf, ticket, path)
+            future.add_done_callback(lambda done: _finished(ticket, path, done))
+    return future
+
+def get_ticket(auth_header, booking_id):
+    """Return the URL of a paid booking's ticket PDF, rendering it if it is not cached"""
+    TICKET_STATS["requests"] += 1
+    payload = verify_auth_header(auth_header)
+    if "error" in payload:
+        return payload
+    if canvas is None:
+        return {"error": "Ticket rendering is unavailable"}
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute(TICKET_QUERY + " WHERE b.id = %s", (booking_id,))
+        row = cursor.fetchone()
+    except Exception as e:
+        logger.error("Error fetching booking %s: %s", booking_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+    if row is None:
+        return {"error": "Booking not found"}
+    ticket = ticket_from_row(row)
+    if payload.get("sub") != str(ticket["userId"]) and not payload.get("is_admin"):
+        logger.warning("Access denied: user %s requested ticket for booking %s", payload.get("sub"), booking_id)
+        return {"error": "Unauthorized access"}
+    if ticket["paymentStatus"] != "completed":
+        return {"error": "Booking is not paid"}
+
+    future = submit_render(ticket)
+    if future is not None:
+        try:
+            future.result(timeout=TICKET_RENDER_TIMEOUT)
+        except Exception as e:
+            logger.error("Ticket for booking %s failed to render: %s", booking_id, e)
+            return {"error": "Failed to render ticket"}
+    return {"bookingId": str(booking_id), "ticketUrl": ticket_url(ticket), "cached": future is None}
+
+def open_ticket_pack(exhibition_id):
+    """Return (pack id, tickets) for an exhibition's paid bookings, or an error dict"""
+    if canvas is None:
+        return {"error": "Ticket rendering is unavailable"}
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT id FROM exhibitions WHERE id = %s", (exhibition_id,))
+        if cursor.fetchone() is None:
+            return {"error": "Exhibition not found"}
+        cursor.execute(
+            TICKET_QUERY + " WHERE b.exhibition_id = %s AND b.payment_status = 'completed' ORDER BY b.id",
+            (exhibition_id,)
+        )
+        tickets = [ticket_from_row(row) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error("Error fetching tickets for exhibition %s: %s", exhibition_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+    return uuid.uuid4().hex[:16], tickets
+
+class _ChunkSink:
+    """Write-only file object collecting ZipFile output until it is drained"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+class _PackProgress:
+    def __init__(self, pack_id, exhibition_id, total):
+        self.state = {
+            "packId": pack_id,
+            "exhibitionId": exhibition_id,
+            "total": total,
+            "written": 0,
+            "cached": 0,
+            "rendered": 0,
+            "failed": 0,
+            "status": "running",
+            "startedAt": time.time(),
+            "finishedAt": None
+        }
+        self.path = os.path.join(TICKET_PACK_DIR, f"{pack_id}.json")
+        self.saved_at = 0
+        os.makedirs(TICKET_PACK_DIR, exist_ok=True)
+        for old in glob.glob(os.path.join(TICKET_PACK_DIR, "*.json")):
+            try:
+                if os.path.getmtime(old) < time.time() - TICKET_PACK_KEEP_SECONDS:
+                    os.remove(old)
+            except OSError:
+                pass
+        self.save(force=True)
+
+    def count(self, key):
+        self.state[key] += 1
+        if key != "failed":
+            self.state["written"] += 1
+        self.save()
+
+    def finish(self, status):
+        self.state["status"] = status
+        self.state["finishedAt"] = time.time()
+        self.save(force=True)
+
+    def save(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.saved_at < TICKET_PACK_PROGRESS_INTERVAL:
+            return
+        self.saved_at = now
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Error saving ticket pack progress: %s", e)
+
+def stream_ticket_pack(pack_id, exhibition_id, tickets):
+    """Yield a ZIP of the tickets, rendering missing ones in parallel and writing each as it is ready"""
+    progress = _PackProgress(pack_id, exhibition_id, len(tickets))
+    sink = _ChunkSink()
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED)
+    pending = {}
+    status = "aborted"
+    TICKET_STATS["packs"] += 1
+
+    def add(ticket):
+        try:
+            archive.write(os.path.join(TICKET_CACHE_DIR, ticket["filename"]), f"ticket-{ticket['bookingId']}.pdf")
+            return True
+        except OSError as e:
+            logger.error("Error adding ticket for booking %s to pack %s: %s", ticket["bookingId"], pack_id, e)
+            return False
+
+    try:
+        for ticket in tickets:
+            future = submit_render(ticket)
+            if future is not None:
+                pending[future] = ticket
+            elif add(ticket):
+                progress.count("cached")
+                yield sink.drain()
+            else:
+                progress.count("failed")
+        for future in as_completed(pending):
+            ticket = pending.pop(future)
+            if future.exception() is None and add(ticket):
+                progress.count("rendered")
+                yield sink.drain()
+            else:
+                progress.count("failed")
+        archive.close()
+        yield sink.drain()
+        status = "finished"
+    finally:
+        # A client that went away leaves renders not yet started to be dropped
+        for future in pending:
+            future.cancel()
+        TICKET_STATS["pack_tickets"] += progress.state["written"]
+        progress.finish(status)
+        logger.info("Ticket pack %s for exhibition %s %s: %s of %s tickets", pack_id, exhibition_id,
+                    status, progress.state["written"], len(tickets))
+
+def get_pack_progress(pack_id):
+    """Return the saved progress of a ticket pack, or None if it is unknown"""
+    if not pack_id.isalnum():
+        return None
+    try:
+        with open(os.path.join(TICKET_PACK_DIR, f"{pack_id}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def get_ticket_stats():
+    """Return ticket request and render counters"""
+    stats = dict(TICKET_STATS)
+    stats["rendering"] = len(_inflight)
+    return stats
@@ -0,0 +1,385 @@
+"""
+Timed-entry slots for exhibitions.
+
+An exhibition's run can be split into slots (a date, a start time and a
+capacity) so visitors are spread over the day instead of arriving at once.
+Each slot keeps its own `booked` counter. A booking reserves its places with
+one conditional UPDATE (booked + n <= capacity), so concurrent bookings can
+never oversell a slot, and the places are released in the same transaction
+that marks the booking's payment failed, or when the booking is still unpaid
+after BOOKING_HOLD_MINUTES (see expire_held_bookings) with no M-Pesa
+payment started in the last BOOKING_PAYMENT_GRACE_MINUTES. A payment that
+completes after the booking failed must take the places again in the
+completing transaction (retake_time_slot); if the slot has filled meanwhile
+the booking stays failed and is marked refund_due.
+
+Slots are stored in exhibition_time_slots, keyed by (exhibition_id,
+slot_date, start_time): a day's slots are one range of that index and a
+month's availability calendar is one GROUP BY over the same range.
+"""
+
+import os
+import calendar
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from analytics import record_payment_result
+from auth import verify_auth_header
+from database import get_db_connection
+from logging_setup import get_logger
+
+logger = get_logger('time_slots')
+
+# Slots accepted per request when an admin sets up a schedule
+TIME_SLOTS_MAX_BATCH = int(os.environ.get('TIME_SLOTS_MAX_BATCH', '2000'))
+# Tickets one booking may take from a slot
+BOOKING_MAX_SLOTS = int(os.environ.get('BOOKING_MAX_SLOTS', '20'))
+# An unpaid slot booking holds its places this long; an M-Pesa prompt expires well before
+BOOKING_HOLD_MINUTES = int(os.environ.get('BOOKING_HOLD_MINUTES', '15'))
+# A hold with an M-Pesa payment still in progress is kept this much longer, so
+# expiry does not free places that the payment is about to complete
+BOOKING_PAYMENT_GRACE_MINUTES = int(os.environ.get('BOOKING_PAYMENT_GRACE_MINUTES', '60'))
+
+# A capacity lowered below what is already booked stops at the booked count
+UPSERT_TIME_SLOT = """
+    INSERT INTO exhibition_time_slots (exhibition_id, slot_date, start_time, capacity)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE capacity = GREATEST(VALUES(capacity), booked)
+"""
+
+DAY_SLOTS_QUERY = """
+    SELECT id, start_time, capacity, booked
+    FROM exhibition_time_slots
+    WHERE exhibition_id = %s AND slot_date = %s
+    ORDER BY start_time
+"""
+
+CALENDAR_QUERY = """
+    SELECT slot_date, COUNT(*), SUM(capacity), SUM(booked), SUM(booked >= capacity)
+    FROM exhibition_time_slots
+    WHERE exhibition_id = %s AND slot_date >= %s AND slot_date < %s
+    GROUP BY slot_date
+    ORDER BY slot_date
+"""
+
+# Checked per booking on the (order_type, order_id) index of mpesa_transactions
+PAYMENT_IN_PROGRESS = """
+    EXISTS (SELECT 1 FROM mpesa_transactions t
+            WHERE t.order_type = 'exhibition' AND t.order_id = b.id AND t.status = 'pending'
+              AND t.transaction_date >= NOW() - INTERVAL %s MINUTE)
+"""
+
+# Read off the (payment_status, booking_date) index
+EXPIRED_HOLDS_QUERY = f"""
+    SELECT b.id FROM exhibition_bookings b
+    WHERE b.payment_status = 'pending' AND b.booking_date < NOW() - INTERVAL %s MINUTE
+      AND b.time_slot_id IS NOT NULL AND NOT {PAYMENT_IN_PROGRESS}
+    LIMIT 500
+"""
+
+# Rechecked as the booking is failed, in case a payment was started since the SELECT
+EXPIRE_HOLD = f"""
+    UPDATE exhibition_bookings b SET b.payment_status = 'failed', b.version = b.version + 1
+    WHERE b.id = %s AND b.payment_status = 'pending' AND NOT {PAYMENT_IN_PROGRESS}
+"""
+
+TIME_SLOT_STATS = {
+    "reserved": 0,
+    "full": 0,
+    "released": 0,
+    "expired_holds": 0,
+    "refunds_due": 0
+}
+
+def format_clock(value):
+    """Format a TIME column (returned as a timedelta) as HH:MM"""
+    if isinstance(value, timedelta):
+        minutes = int(value.total_seconds()) // 60
+        return "%02d:%02d" % (minutes // 60, minutes % 60)
+    return value.strftime("%H:%M")
+
+def _slot_item(row):
+    slot_id, start_time, capacity, booked = row
+    return {
+        "id": str(slot_id),
+        "startTime": format_clock(start_time),
+        "capacity": capacity,
+        "available": max(capacity - booked, 0)
+    }
+
+def parse_time_slot(item):
+    """Validate one {"date", "startTime", "capacity"} item; return (date, time, capacity) or raise ValueError"""
+    if not isinstance(item, dict):
+        raise ValueError("Each slot must be an object")
+    try:
+        slot_date = datetime.strptime(str(item.get("date")), "%Y-%m-%d").date()
+        start_time = datetime.strptime(str(item.get("startTime")), "%H:%M").time()
+    except ValueError:
+        raise ValueError("date must be YYYY-MM-DD and startTime HH:MM")
+    capacity = item.get("capacity")
+    if not isinstance(capacity, int) or isinstance(capacity, bool) or capacity < 1:
+        raise ValueError("capacity must be a positive integer")
+    return slot_date, start_time, capacity
+
+def save_time_slots(exhibition_id, items):
+    """Create slots, or change the capacity of existing ones, within the exhibition's dates"""
+    try:
+        slots = [parse_time_slot(item) for item in items]
+    except ValueError as e:
+        return {"error": str(e)}
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT start_date, end_date FROM exhibitions WHERE id = %s", (exhibition_id,))
+        row = cursor.fetchone()
+        if not row:
+            return {"error": "Exhibition not found"}
+        start_date, end_date = row
+        outside = [slot_date for slot_date, _, _ in slots if not start_date <= slot_date <= end_date]
+        if outside:
+            return {"error": f"Slot dates must fall between {start_date.isoformat()} and {end_date.isoformat()}"}
+
+        cursor.executemany(UPSERT_TIME_SLOT, [
+            (exhibition_id, slot_date, start_time, capacity) for slot_date, start_time, capacity in slots
+        ])
+        connection.commit()
+        return {"saved": len(slots)}
+    except Exception as e:
+        connection.rollback()
+        logger.error("Error saving time slots for exhibition %s: %s", exhibition_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_day_slots(exhibition_id, day):
+    """Return the exhibition's slots on one day with the places left in each"""
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute(DAY_SLOTS_QUERY, (exhibition_id, day))
+        return {
+            "exhibitionId": str(exhibition_id),
+            "date": day.isoformat(),
+            "slots": [_slot_item(row) for row in cursor.fetchall()]
+        }
+    except Exception as e:
+        logger.error("Error fetching time slots for exhibition %s: %s", exhibition_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_month_calendar(exhibition_id, year, month):
+    """Return per-day slot availability for one month in a single query"""
+    first = date(year, month, 1)
+    after = first + timedelta(days=calendar.monthrange(year, month)[1])
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute(CALENDAR_QUERY, (exhibition_id, first, after))
+        days = []
+        for slot_date, count, capacity, booked, full in cursor.fetchall():
+            days.append({
+                "date": slot_date.isoformat(),
+                "slots": int(count),
+                "capacity": int(capacity),
+                "available": max(int(capacity) - int(booked), 0),
+                "soldOut": int(full) == int(count)
+            })
+        return {"exhibitionId": str(exhibition_id), "month": first.strftime("%Y-%m"), "days": days}
+    except Exception as e:
+        logger.error("Error fetching slot calendar for exhibition %s: %s", exhibition_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def reserve_time_slot(cursor, slot_id, slots):
+    """Take places from a slot if it has them; call inside the transaction that creates the booking"""
+    cursor.execute(
+        "UPDATE exhibition_time_slots SET booked = booked + %s WHERE id = %s AND booked + %s <= capacity",
+        (slots, slot_id, slots)
+    )
+    if cursor.rowcount == 0:
+        TIME_SLOT_STATS["full"] += 1
+        return False
+    TIME_SLOT_STATS["reserved"] += slots
+    return True
+
+def release_places(cursor, slot_id, slots):
+    """Give places held outside a booking (e.g. a waitlist offer) back to a slot"""
+    cursor.execute("UPDATE exhibition_time_slots SET booked = GREATEST(booked - %s, 0) WHERE id = %s",
+                   (slots, slot_id))
+    if cursor.rowcount:
+        TIME_SLOT_STATS["released"] += 1
+
+def release_time_slot(cursor, booking_id):
+    """Give a booking's places back to its slot; call inside the transaction that fails the booking"""
+    cursor.execute("""
+        UPDATE exhibition_time_slots s
+        JOIN exhibition_bookings b ON b.time_slot_id = s.id
+        SET s.booked = GREATEST(s.booked - b.slots, 0)
+        WHERE b.id = %s
+    """, (booking_id,))
+    if cursor.rowcount:
+        TIME_SLOT_STATS["released"] += 1
+
+def retake_time_slot(cursor, booking_id):
+    """Reserve a failed booking's places again before its payment completes late.
+
+    Returns True when the booking holds its places (or has no slot) and may be
+    completed. Otherwise the slot has been sold on since the booking failed, so
+    the booking stays failed and is marked refund_due for an admin to refund.
+    Call inside the transaction that completes the booking.
+    """
+    cursor.execute("""
+        SELECT payment_status, time_slot_id, slots FROM exhibition_bookings
+        WHERE id = %s FOR UPDATE
+    """, (booking_id,))
+    row = cursor.fetchone()
+    if not row:
+        return True
+    payment_status, slot_id, slots = row
+    # Only a failed booking has given its places back
+    if payment_status != "failed" or slot_id is None:
+        return True
+    if reserve_time_slot(cursor, slot_id, slots):
+        return True
+    cursor.execute("""
+        UPDATE exhibition_bookings SET refund_due = TRUE, version = version + 1
+        WHERE id = %s AND NOT refund_due
+    """, (booking_id,))
+    if cursor.rowcount:
+        TIME_SLOT_STATS["refunds_due"] += 1
+        logger.warning("Booking %s was paid after its slot %s filled; marked for refund", booking_id, slot_id)
+    return False
+
+def expire_held_bookings():
+    """Fail slot bookings left unpaid past their hold and give their places back; return how many"""
+    connection = get_db_connection()
+    if connection is None:
+        return 0
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute(EXPIRED_HOLDS_QUERY, (BOOKING_HOLD_MINUTES, BOOKING_PAYMENT_GRACE_MINUTES))
+        expired = 0
+        for (booking_id,) in cursor.fetchall():
+            # A payment completing meanwhile wins; the booking is then no longer pending.
+            # One completing after this (past the grace period) must retake the places
+            cursor.execute(EXPIRE_HOLD, (booking_id, BOOKING_PAYMENT_GRACE_MINUTES))
+            if cursor.rowcount:
+                release_time_slot(cursor, booking_id)
+                expired += 1
+                connection.commit()
+                record_payment_result(connection, "exhibition", booking_id, "failed", "pending")
+            else:
+                connection.commit()
+        TIME_SLOT_STATS["expired_holds"] += expired
+        return expired
+    except Exception as e:
+        connection.rollback()
+        logger.error("Error expiring held bookings: %s", e)
+        return 0
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def booking_details_error(data):
+    """Return an error message unless data has the contact details a booking needs"""
+    missing = [field for field in ("name", "email", "phone") if not data.get(field)]
+    return "Missing required fields: " + ", ".join(missing) if missing else None
+
+def slot_start(slot_date, start_time):
+    return datetime.combine(slot_date, datetime.min.time()) + start_time
+
+def insert_slot_booking(cursor, user_id, exhibition_id, slot_id, slot_date, start_time, slots, ticket_price, data):
+    """Insert a pending booking for places already reserved in a slot; return what the client pays for"""
+    total_amount = Decimal(ticket_price) * slots
+    cursor.execute("""
+        INSERT INTO exhibition_bookings
+            (user_id, exhibition_id, name, email, phone, slots, payment_method, total_amount, time_slot_id)
+        VALUES (%s, %s, %s, %s, %s, %s, 'mpesa', %s, %s)
+    """, (user_id, exhibition_id, data["name"], data["email"], data["phone"], slots, total_amount, slot_id))
+    return {
+        "bookingId": str(cursor.lastrowid),
+        "exhibitionId": str(exhibition_id),
+        "timeSlotId": str(slot_id),
+        "date": slot_date.isoformat(),
+        "startTime": format_clock(start_time),
+        "slots": slots,
+        "totalAmount": float(total_amount)
+    }
+
+def book_time_slot(auth_header, exhibition_id, slot_id, data):
+    """Create a pending booking holding places in one slot; return the booking or an error dict"""
+    payload = verify_auth_header(auth_header)
+    if "error" in payload:
+        return payload
+
+    slots = data.get("slots", 1)
+    if not isinstance(slots, int) or isinstance(slots, bool) or not 1 <= slots <= BOOKING_MAX_SLOTS:
+        return {"error": f"slots must be between 1 and {BOOKING_MAX_SLOTS}"}
+    error = booking_details_error(data)
+    if error:
+        return {"error": error}
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT s.slot_date, s.start_time, e.ticket_price
+            FROM exhibition_time_slots s
+            JOIN exhibitions e ON e.id = s.exhibition_id
+            WHERE s.id = %s AND s.exhibition_id = %s
+        """, (slot_id, exhibition_id))
+        row = cursor.fetchone()
+        if not row:
+            return {"error": "Time slot not found"}
+        slot_date, start_time, ticket_price = row
+        if slot_start(slot_date, start_time) < datetime.now():
+            return {"error": "Time slot has already started"}
+
+        if not reserve_time_slot(cursor, slot_id, slots):
+            connection.rollback()
+            return {"error": "Time slot is full"}
+
+        booking = insert_slot_booking(cursor, payload.get("sub"), exhibition_id, slot_id,
+                                      slot_date, start_time, slots, ticket_price, data)
+        connection.commit()
+        return booking
+    except Exception as e:
+        connection.rollback()
+        logger.error("Error booking time slot %s: %s", slot_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_time_slot_stats():
+    """Return slot reservation counters"""
+    return dict(TIME_SLOT_STATS)
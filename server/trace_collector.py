@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Local stand-in for a tracing collector.
+
+Receives span batches POSTed by tracing.py (TRACE_COLLECTOR_URL) and appends
+them to a JSON-lines file; GET /v1/traces/<trace_id> returns one trace's spans
+ordered by start time.
+
+Usage:
+    python trace_collector.py [--port 4319] [--output logs/collected_spans.jsonl]
+    TRACE_COLLECTOR_URL=http://127.0.0.1:4319/v1/spans TRACE_SAMPLE_RATE=1 python server.py
+"""
+
+import os
+import json
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_write_lock = threading.Lock()
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    output_path = None
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != '/v1/spans':
+            self._send_json(404, {"error": "Not found"})
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            spans = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send_json(400, {"error": "Invalid JSON"})
+            return
+        with _write_lock:
+            with open(self.output_path, 'a') as f:
+                for span in spans:
+                    f.write(json.dumps(span) + "\n")
+        self._send_json(200, {"accepted": len(spans)})
+
+    def do_GET(self):
+        prefix = '/v1/traces/'
+        if not self.path.startswith(prefix):
+            self._send_json(404, {"error": "Not found"})
+            return
+        trace_id = self.path[len(prefix):]
+        spans = []
+        if os.path.exists(self.output_path):
+            with open(self.output_path) as f:
+                for line in f:
+                    span = json.loads(line)
+                    if span.get("traceId") == trace_id:
+                        spans.append(span)
+        spans.sort(key=lambda span: span.get("startTimeUnixNano", 0))
+        self._send_json(200, {"traceId": trace_id, "spans": spans})
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Local span collector")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4319)
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(__file__), 'logs', 'collected_spans.jsonl'))
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    CollectorHandler.output_path = args.output
+    server = ThreadingHTTPServer((args.host, args.port), CollectorHandler)
+    print(f"Collecting spans on http://{args.host}:{args.port}/v1/spans into {args.output}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Collector stopped.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+Lightweight distributed tracing.
+
+A span is opened for every sampled Flask request, and child spans for each
+database connection checkout, each SQL statement and each Daraja HTTP call.
+Trace context is read from and propagated with W3C `traceparent` headers.
+
+Whether a request is traced is decided once, at the root: an incoming
+traceparent's sampled flag is honoured, otherwise TRACE_SAMPLE_RATE applies.
+Unsampled requests create no span objects at all, so child instrumentation
+costs a single context-variable lookup.
+
+Finished spans are queued and written by a background thread to TRACE_FILE
+(JSON lines) or posted in batches to TRACE_COLLECTOR_URL (see trace_collector.py
+for a local stand-in collector).
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import atexit
+import threading
+import contextvars
+import urllib.request
+from contextlib import contextmanager
+from logging_setup import get_logger
+
+logger = get_logger('tracing')
+
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.01'))
+TRACE_FILE = os.environ.get('TRACE_FILE')
+TRACE_COLLECTOR_URL = os.environ.get('TRACE_COLLECTOR_URL')
+TRACE_SERVICE_NAME = os.environ.get('TRACE_SERVICE_NAME', 'gallery-api')
+TRACE_QUEUE_SIZE = 10000
+TRACE_BATCH_SIZE = 200
+TRACE_FLUSH_INTERVAL = 1.0
+
+# Tracing is only active when somewhere to send spans is configured
+TRACING_ENABLED = bool(TRACE_FILE or TRACE_COLLECTOR_URL)
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+TRACING_STATS = {
+    "spans_exported": 0,
+    "spans_dropped": 0,
+    "export_errors": 0
+}
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind',
+                 'start_ns', '_start_perf', 'duration_ns', 'attributes', 'status')
+
+    def __init__(self, name, trace_id, parent_id=None, kind='internal', attributes=None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.duration_ns = None
+        self.attributes = attributes or {}
+        self.status = 'ok'
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, error):
+        self.status = 'error'
+        self.attributes['error'] = str(error)
+
+    def end(self):
+        if self.duration_ns is None:
+            self.duration_ns = time.perf_counter_ns() - self._start_perf
+            _exporter.submit(self)
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self):
+        return {
+            "service": TRACE_SERVICE_NAME,
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentId": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_ns,
+            "durationNano": self.duration_ns,
+            "attributes": self.attributes,
+            "status": self.status
+        }
+
+class SpanExporter:
+    """Batches finished spans and writes them from a background thread"""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, span):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            TRACING_STATS["spans_dropped"] += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _drain(self):
+        batch = []
+        while len(batch) < TRACE_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            time.sleep(TRACE_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        batch = self._drain()
+        while batch:
+            self._export([span.to_dict() for span in batch])
+            batch = self._drain()
+
+    def _export(self, spans):
+        try:
+            if TRACE_COLLECTOR_URL:
+                body = json.dumps(spans, default=str).encode('utf-8')
+                req = urllib.request.Request(TRACE_COLLECTOR_URL, data=body,
+                                             headers={'Content-Type': 'application/json'})
+                urllib.request.urlopen(req, timeout=2).close()
+            else:
+                with open(TRACE_FILE, 'a') as f:
+                    for span in spans:
+                        f.write(json.dumps(span, default=str) + "\n")
+            TRACING_STATS["spans_exported"] += len(spans)
+        except Exception as e:
+            TRACING_STATS["export_errors"] += 1
+            logger.warning("Failed to export %s spans: %s", len(spans), e)
+
+_exporter = SpanExporter()
+
+def parse_traceparent(value):
+    """Parse a W3C traceparent header into (trace_id, parent_id, sampled)"""
+    if not value:
+        return None
+    parts = value.strip().split('-')
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    version, trace_id, parent_id, flags = parts[:4]
+    if version == 'ff' or trace_id == '0' * 32 or parent_id == '0' * 16:
+        return None
+    try:
+        int(trace_id, 16)
+        int(parent_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    return trace_id, parent_id, sampled
+
+def current_span():
+    """Return the active span, or None when the current work is not traced"""
+    return _current_span.get()
+
+@contextmanager
+def span(name, kind='internal', **attributes):
+    """Open a child span of the active span; a no-op when nothing is being traced"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+def inject_traceparent(headers):
+    """Add the active span's traceparent to an outgoing header dict"""
+    active = _current_span.get()
+    if active is not None:
+        headers['traceparent'] = active.traceparent()
+    return headers
+
+def start_request_span():
+    """before_request hook: continue or start a trace for this request"""
+    if not TRACING_ENABLED:
+        return
+    from flask import request, g
+    incoming = parse_traceparent(request.headers.get('traceparent'))
+    if incoming is not None:
+        trace_id, parent_id, sampled = incoming
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    if not sampled:
+        return
+    root = Span(f"{request.method} {request.path}", trace_id, parent_id, 'server', {
+        "http.method": request.method,
+        "http.target": request.full_path.rstrip('?')
+    })
+    g.trace_span = root
+    g.trace_token = _current_span.set(root)
+
+def finish_request_span_response(response):
+    """after_request hook: name the span by route and return the trace context"""
+    from flask import request, g
+    root = g.get('trace_span')
+    if root is not None:
+        if request.url_rule is not None:
+            root.name = f"{request.method} {request.url_rule.rule}"
+        root.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            root.status = 'error'
+        response.headers['traceresponse'] = root.traceparent()
+    return response
+
+def end_request_span(exception=None):
+    """teardown_request hook: close the request span"""
+    from flask import g
+    root = g.get('trace_span')
+    if root is None:
+        return
+    if exception is not None:
+        root.set_error(exception)
+    _current_span.reset(g.trace_token)
+    root.end()
+
+def init_tracing(app):
+    """Register the request span hooks on a Flask app"""
+    app.before_request(start_request_span)
+    app.after_request(finish_request_span_response)
+    app.teardown_request(end_request_span)
+
+def get_tracing_stats():
+    """Return exporter counters"""
+    return dict(TRACING_STATS)
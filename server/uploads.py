@@ -0,0 +1,86 @@
+"""
+Image upload pipeline shared by the API routes and the bulk importer.
+"""
+
+import os
+import base64
+import hashlib
+from logging_setup import get_logger
+
+logger = get_logger('uploads')
+
+UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
+
+# Extensions accepted for images copied from local files
+IMAGE_EXTENSIONS = {'.jpg': 'jpg', '.jpeg': 'jpg', '.png': 'png', '.webp': 'webp', '.gif': 'gif'}
+
+def store_image(image_binary, file_extension):
+    """Write image bytes to the uploads folder and return the relative URL"""
+    # Named by content hash, so concurrent uploads never overwrite each other
+    # and re-importing the same image reuses the stored copy
+    digest = hashlib.sha1(image_binary).hexdigest()[:20]
+    filename = f"{digest}.{file_extension}"
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    if not os.path.exists(filepath):
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        with open(filepath, "wb") as f:
+            f.write(image_binary)
+        logger.debug("Saved image to %s (%s bytes)", filepath, len(image_binary))
+    return f"/static/uploads/{filename}"
+
+def public_image_url(image_url):
+    """Return the URL the frontend loads a stored image from (older rows hold bare filenames)"""
+    if image_url and not image_url.startswith(('http', 'data:', '/static/')):
+        return f"/static/uploads/{image_url}"
+    return image_url
+
+# Process base64 image and save to file
+def process_image_upload(image_data):
+    if not image_data or not isinstance(image_data, str) or not image_data.startswith('data:'):
+        logger.warning("Invalid image data: %s", image_data[:30] if isinstance(image_data, str) else type(image_data).__name__)
+        return None
+
+    try:
+        # Extract mimetype
+        mimetype = image_data.split(';')[0].split(':')[1] if ';' in image_data and ':' in image_data else 'image/jpeg'
+
+        # Extract content after the comma
+        if ',' in image_data:
+            image_data = image_data.split(",")[1]
+        else:
+            logger.warning("No comma found in base64 string")
+            return None
+
+        # Get file extension from mimetype
+        file_extension = "jpg"  # Default to jpg
+        if "image/png" in mimetype:
+            file_extension = "png"
+        elif "image/jpeg" in mimetype or "image/jpg" in mimetype:
+            file_extension = "jpg"
+        elif "image/webp" in mimetype:
+            file_extension = "webp"
+
+        # Decode the base64 string
+        try:
+            image_binary = base64.b64decode(image_data)
+            return store_image(image_binary, file_extension)
+        except Exception as e:
+            logger.error("Error decoding base64 data: %s (starts with %r)", e, image_data[:30])
+            return None
+
+    except Exception as e:
+        logger.exception("Error processing image: %s", e)
+        return None
+
+def process_image_file(path):
+    """Copy a local image file into the uploads folder and return the relative URL"""
+    file_extension = IMAGE_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if file_extension is None:
+        logger.warning("Unsupported image file type: %s", path)
+        return None
+    try:
+        with open(path, "rb") as f:
+            return store_image(f.read(), file_extension)
+    except OSError as e:
+        logger.error("Error reading image file %s: %s", path, e)
+        return None
@@ -0,0 +1,388 @@
+"""
+Waitlist for sold-out exhibitions.
+
+Joining is a single INSERT into exhibition_waitlist; a unique key on
+(exhibition_id, user_id, active), where `active` is 1 while an entry is
+waiting or offered and NULL afterwards, keeps a user in each queue once
+without reading anything first. Entries are served first in, first out per
+exhibition, off the (status, exhibition_id, id) index.
+
+A background thread in each worker runs a pass every WAITLIST_INTERVAL
+seconds, one worker at a time (MySQL GET_LOCK):
+
+  1. slot bookings still unpaid after their hold are failed, giving their
+     places back (time_slots.expire_held_bookings);
+  2. offers not claimed within WAITLIST_CLAIM_MINUTES expire and their places
+     go back to the slot;
+  3. free places in upcoming timed-entry slots are offered down each queue.
+     An offer reserves the places in the slot (the same atomic counter as a
+     booking), so nobody else can take them while the user claims.
+
+An entry no free slot can fit (too many tickets, or not on its preferred
+date) keeps its place while later entries that fit are offered. Claiming
+turns the offer into an ordinary pending booking to pay for.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+from mysql.connector import IntegrityError
+from auth import verify_auth_header
+from database import get_db_connection
+from logging_setup import get_logger
+from time_slots import (
+    BOOKING_MAX_SLOTS, reserve_time_slot, release_places, expire_held_bookings,
+    booking_details_error, insert_slot_booking, slot_start, format_clock
+)
+
+logger = get_logger('waitlist')
+
+WAITLIST_INTERVAL = float(os.environ.get('WAITLIST_INTERVAL', '15'))
+WAITLIST_CLAIM_MINUTES = int(os.environ.get('WAITLIST_CLAIM_MINUTES', '15'))
+# Entries considered per exhibition in one pass
+WAITLIST_OFFER_BATCH = 200
+
+DUPLICATE_KEY = 1062
+
+WAITING_EXHIBITIONS_QUERY = """
+    SELECT DISTINCT exhibition_id FROM exhibition_waitlist WHERE status = 'waiting'
+"""
+
+WAITING_ENTRIES_QUERY = """
+    SELECT id, slots, preferred_date FROM exhibition_waitlist
+    WHERE status = 'waiting' AND exhibition_id = %s
+    ORDER BY id
+    LIMIT %s
+"""
+
+FREE_SLOTS_QUERY = """
+    SELECT id, slot_date, start_time, capacity - booked
+    FROM exhibition_time_slots
+    WHERE exhibition_id = %s AND slot_date >= CURDATE() AND booked < capacity
+    ORDER BY slot_date, start_time
+"""
+
+EXPIRED_OFFERS_QUERY = """
+    SELECT id, time_slot_id, slots FROM exhibition_waitlist
+    WHERE status = 'offered' AND offer_expires_at < NOW()
+    LIMIT 500
+"""
+
+ENTRY_QUERY = """
+    SELECT w.id, w.user_id, w.exhibition_id, w.slots, w.preferred_date, w.status, w.time_slot_id,
+           w.offer_expires_at, w.booking_id, w.created_at, e.title, e.ticket_price,
+           s.slot_date, s.start_time
+    FROM exhibition_waitlist w
+    JOIN exhibitions e ON e.id = w.exhibition_id
+    LEFT JOIN exhibition_time_slots s ON s.id = w.time_slot_id
+    WHERE w.id = %s
+"""
+
+WAITLIST_STATS = {
+    "joined": 0,
+    "offered": 0,
+    "claimed": 0,
+    "expired": 0,
+    "cancelled": 0,
+    "passes": 0,
+    "pass_errors": 0
+}
+
+_lock = threading.Lock()
+_state = {"thread": None, "pid": None}
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+def _entry_item(row, position=None):
+    (entry_id, user_id, exhibition_id, slots, preferred_date, status, slot_id,
+     expires_at, booking_id, created_at, title, _, slot_date, start_time) = row
+    item = {
+        "id": str(entry_id),
+        "exhibitionId": str(exhibition_id),
+        "exhibitionTitle": title,
+        "slots": slots,
+        "preferredDate": _iso(preferred_date),
+        "status": status,
+        "joinedAt": _iso(created_at),
+        "position": position,
+        "bookingId": str(booking_id) if booking_id else None,
+        "offer": None
+    }
+    if status == "offered":
+        item["offer"] = {
+            "timeSlotId": str(slot_id),
+            "date": _iso(slot_date),
+            "startTime": format_clock(start_time),
+            "expiresAt": _iso(expires_at)
+        }
+    return item
+
+def _load_entry(cursor, auth_header, entry_id, lock=False):
+    """Return (payload, row) for an entry the caller owns, or (error dict, None)"""
+    payload = verify_auth_header(auth_header)
+    if "error" in payload:
+        return payload, None
+    cursor.execute(ENTRY_QUERY + (" FOR UPDATE" if lock else ""), (entry_id,))
+    row = cursor.fetchone()
+    if not row:
+        return {"error": "Waitlist entry not found"}, None
+    if str(row[1]) != payload.get("sub") and not payload.get("is_admin"):
+        return {"error": "Unauthorized access"}, None
+    return payload, row
+
+def join_waitlist(auth_header, exhibition_id, data):
+    """Queue the user for an exhibition with one INSERT; return the entry or an error dict"""
+    payload = verify_auth_header(auth_header)
+    if "error" in payload:
+        return payload
+
+    slots = data.get("slots", 1)
+    if not isinstance(slots, int) or isinstance(slots, bool) or not 1 <= slots <= BOOKING_MAX_SLOTS:
+        return {"error": f"slots must be between 1 and {BOOKING_MAX_SLOTS}"}
+    preferred_date = None
+    if data.get("date"):
+        try:
+            preferred_date = datetime.strptime(str(data["date"]), "%Y-%m-%d").date()
+        except ValueError:
+            return {"error": "date must be YYYY-MM-DD"}
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("""
+            INSERT INTO exhibition_waitlist (exhibition_id, user_id, slots, preferred_date)
+            VALUES (%s, %s, %s, %s)
+        """, (exhibition_id, payload.get("sub"), slots, preferred_date))
+        connection.commit()
+        WAITLIST_STATS["joined"] += 1
+        return {"id": str(cursor.lastrowid), "exhibitionId": str(exhibition_id), "slots": slots,
+                "preferredDate": _iso(preferred_date), "status": "waiting"}
+    except IntegrityError as e:
+        connection.rollback()
+        if e.errno == DUPLICATE_KEY:
+            return {"error": "Already on the waitlist"}
+        # The exhibition foreign key
+        return {"error": "Exhibition not found"}
+    except Exception as e:
+        connection.rollback()
+        logger.error("Error joining waitlist for exhibition %s: %s", exhibition_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_waitlist_entry(auth_header, entry_id):
+    """Return an entry with its place in the queue or its current offer"""
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        result, row = _load_entry(cursor, auth_header, entry_id)
+        if row is None:
+            return result
+        position = None
+        if row[5] == "waiting":
+            # An index range count of the entries ahead in the same queue
+            cursor.execute("""
+                SELECT COUNT(*) FROM exhibition_waitlist
+                WHERE status = 'waiting' AND exhibition_id = %s AND id < %s
+            """, (row[2], entry_id))
+            position = cursor.fetchone()[0] + 1
+        return _entry_item(row, position)
+    except Exception as e:
+        logger.error("Error fetching waitlist entry %s: %s", entry_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def leave_waitlist(auth_header, entry_id):
+    """Cancel a waiting or offered entry, giving back any places held for it"""
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        result, row = _load_entry(cursor, auth_header, entry_id, lock=True)
+        if row is None:
+            return result
+        status, slot_id, slots = row[5], row[6], row[3]
+        if status not in ("waiting", "offered"):
+            connection.rollback()
+            return {"error": "Waitlist entry is no longer active"}
+        cursor.execute("UPDATE exhibition_waitlist SET status = 'cancelled', active = NULL WHERE id = %s",
+                       (entry_id,))
+        if status == "offered":
+            release_places(cursor, slot_id, slots)
+        connection.commit()
+        WAITLIST_STATS["cancelled"] += 1
+        return {"id": str(entry_id), "status": "cancelled"}
+    except Exception as e:
+        connection.rollback()
+        logger.error("Error leaving waitlist entry %s: %s", entry_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def claim_offer(auth_header, entry_id, data):
+    """Turn an unexpired offer into a pending booking for the places it holds"""
+    error = booking_details_error(data)
+    if error:
+        return {"error": error}
+
+    connection = get_db_connection()
+    if connection is None:
+        return {"error": "Database connection failed"}
+
+    cursor = connection.cursor()
+
+    try:
+        result, row = _load_entry(cursor, auth_header, entry_id, lock=True)
+        if row is None:
+            return result
+        (_, user_id, exhibition_id, slots, _, status, slot_id, expires_at,
+         _, _, _, ticket_price, slot_date, start_time) = row
+        if status != "offered":
+            connection.rollback()
+            return {"error": "No offer to claim"}
+        if expires_at < datetime.now():
+            connection.rollback()
+            return {"error": "Offer has expired"}
+
+        booking = insert_slot_booking(cursor, user_id, exhibition_id, slot_id, slot_date, start_time,
+                                      slots, ticket_price, data)
+        cursor.execute("""
+            UPDATE exhibition_waitlist SET status = 'claimed', active = NULL, booking_id = %s
+            WHERE id = %s
+        """, (booking["bookingId"], entry_id))
+        connection.commit()
+        WAITLIST_STATS["claimed"] += 1
+        return booking
+    except Exception as e:
+        connection.rollback()
+        logger.error("Error claiming waitlist offer %s: %s", entry_id, e)
+        return {"error": str(e)}
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _expire_offers(connection, cursor):
+    cursor.execute(EXPIRED_OFFERS_QUERY)
+    for entry_id, slot_id, slots in cursor.fetchall():
+        cursor.execute("""
+            UPDATE exhibition_waitlist SET status = 'expired', active = NULL
+            WHERE id = %s AND status = 'offered'
+        """, (entry_id,))
+        # Claimed or cancelled while this pass ran
+        if cursor.rowcount:
+            release_places(cursor, slot_id, slots)
+            WAITLIST_STATS["expired"] += 1
+        connection.commit()
+
+def _offer_places(connection, cursor, exhibition_id):
+    now = datetime.now()
+    cursor.execute(FREE_SLOTS_QUERY, (exhibition_id,))
+    free = [[slot_id, slot_date, places] for slot_id, slot_date, start_time, places in cursor.fetchall()
+            if slot_start(slot_date, start_time) > now]
+    if not free:
+        return
+    cursor.execute(WAITING_ENTRIES_QUERY, (exhibition_id, WAITLIST_OFFER_BATCH))
+    for entry_id, slots, preferred_date in cursor.fetchall():
+        slot = next((slot for slot in free if slot[2] >= slots and preferred_date in (None, slot[1])), None)
+        if slot is None:
+            continue
+        cursor.execute("""
+            UPDATE exhibition_waitlist
+            SET status = 'offered', time_slot_id = %s,
+                offer_expires_at = NOW() + INTERVAL %s MINUTE
+            WHERE id = %s AND status = 'waiting'
+        """, (slot[0], WAITLIST_CLAIM_MINUTES, entry_id))
+        if not cursor.rowcount:
+            connection.rollback()
+            continue
+        # A booking may have taken the places since they were read
+        if not reserve_time_slot(cursor, slot[0], slots):
+            connection.rollback()
+            slot[2] = 0
+            continue
+        connection.commit()
+        slot[2] -= slots
+        WAITLIST_STATS["offered"] += 1
+
+def run_waitlist_pass():
+    """Expire holds and offers, then offer free places down each queue"""
+    expire_held_bookings()
+
+    connection = get_db_connection()
+    if connection is None:
+        WAITLIST_STATS["pass_errors"] += 1
+        return False
+
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT GET_LOCK('exhibition_waitlist', 0)")
+        if not cursor.fetchone()[0]:
+            # Another worker is running a pass
+            return True
+        try:
+            _expire_offers(connection, cursor)
+            cursor.execute(WAITING_EXHIBITIONS_QUERY)
+            for (exhibition_id,) in cursor.fetchall():
+                _offer_places(connection, cursor, exhibition_id)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('exhibition_waitlist')")
+            cursor.fetchone()
+        WAITLIST_STATS["passes"] += 1
+        return True
+    except Exception as e:
+        connection.rollback()
+        WAITLIST_STATS["pass_errors"] += 1
+        logger.error("Error running waitlist pass: %s", e)
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def _run():
+    while True:
+        run_waitlist_pass()
+        time.sleep(WAITLIST_INTERVAL)
+
+def start_waitlist_worker():
+    """Start the waitlist thread in this process if it is not already running"""
+    pid = os.getpid()
+    if _state["pid"] == pid:
+        return
+    with _lock:
+        if _state["pid"] == pid:
+            return
+        thread = threading.Thread(target=_run, name='waitlist', daemon=True)
+        _state["thread"] = thread
+        _state["pid"] = pid
+        thread.start()
+
+def init_waitlist(app):
+    """Start the waitlist worker on the first request each worker serves"""
+    app.before_request(start_waitlist_worker)
+
+def get_waitlist_stats():
+    """Return waitlist counters"""
+    return dict(WAITLIST_STATS)
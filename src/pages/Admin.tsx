@@ -1,7 +1,8 @@
 
-import React, { useEffect } from 'react';
+import React, { useEffect, useState } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
-import { isAdmin } from '@/services/api';
+import { isAdmin, getSalesAnalytics, SalesAnalytics } from '@/services/api';
+import { formatPrice } from '@/utils/formatters';
 import { Card, CardContent, CardDescription, CardFooter, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { MessageSquare, ShoppingBag, Ticket, Image, Calendar } from 'lucide-react';
@@ -9,17 +10,58 @@ import { MessageSquare, ShoppingBag, Ticket, Image, Calendar } from 'lucide-reac
 const Admin = () => {
   const navigate = useNavigate();
   
+  const [analytics, setAnalytics] = useState<SalesAnalytics | null>(null);
+  
   // Check if user is an admin
   useEffect(() => {
     if (!isAdmin()) {
       navigate('/admin-login');
+      return;
     }
+    getSalesAnalytics(30)
+      .then(setAnalytics)
+      .catch((error) => console.error('Failed to load sales analytics:', error));
   }, [navigate]);
 
+  const summary = analytics ? [
+    { label: 'Artwork sales (30 days)', value: analytics.window.artwork.completed, detail: formatPrice(analytics.window.artwork.revenue) },
+    { label: 'Tickets sold (30 days)', value: analytics.window.exhibition.units, detail: formatPrice(analytics.window.exhibition.revenue) },
+    {
+      label: 'Payment conversion (30 days)',
+      value: (() => {
+        const attempts = analytics.window.artwork.attempts + analytics.window.exhibition.attempts;
+        const completed = analytics.window.artwork.completed + analytics.window.exhibition.completed;
+        return attempts ? `${Math.round((completed / attempts) * 100)}%` : '—';
+      })(),
+      detail: `${analytics.window.artwork.attempts + analytics.window.exhibition.attempts} payment attempts`,
+    },
+    {
+      label: 'All-time revenue',
+      value: formatPrice(analytics.totals.artwork.revenue + analytics.totals.exhibition.revenue),
+      detail: analytics.topArtists[0] ? `Top artist: ${analytics.topArtists[0].artist}` : 'No sales yet',
+    },
+  ] : [];
+
   return (
     <div className="container mx-auto py-12 px-4">
       <h1 className="text-3xl font-bold mb-8">Admin Dashboard</h1>
       
+      {summary.length > 0 && (
+        <div className="grid gap-6 md:grid-cols-4 mb-8">
+          {summary.map((item) => (
+            <Card key={item.label}>
+              <CardHeader className="pb-2">
+                <CardDescription>{item.label}</CardDescription>
+                <CardTitle className="text-2xl">{item.value}</CardTitle>
+              </CardHeader>
+              <CardContent>
+                <p className="text-sm text-gray-600">{item.detail}</p>
+              </CardContent>
+            </Card>
+          ))}
+        </div>
+      )}
+      
       <div className="grid gap-6 md:grid-cols-3">
         {/* Artworks Management */}
         <Card className="overflow-hidden">
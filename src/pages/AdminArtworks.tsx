@@ -146,7 +146,7 @@ const AdminArtworks = () => {
     if (selectedArtwork?.id) {
       updateArtworkMutation.mutate({ 
         id: selectedArtwork.id, 
-        data: formData 
+        data: { ...formData, version: selectedArtwork.version }
       });
     } else {
       createArtworkMutation.mutate(formData);
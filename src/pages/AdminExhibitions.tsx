@@ -1,7 +1,7 @@
 
 import React, { useState } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
-import { getAllExhibitions, createExhibition, updateExhibition, deleteExhibition, ExhibitionData } from '@/services/api';
+import { getAllExhibitions, createExhibition, updateExhibition, deleteExhibition, downloadTicketPack, ExhibitionData, TicketPackProgress } from '@/services/api';
 import { Button } from "@/components/ui/button";
 import { Card } from "@/components/ui/card";
 import {
@@ -13,7 +13,7 @@ import {
   TableRow,
 } from "@/components/ui/table";
 import { Badge } from "@/components/ui/badge";
-import { Pencil, Plus, Trash2 } from 'lucide-react';
+import { Download, Pencil, Plus, Trash2 } from 'lucide-react';
 import { useToast } from "@/hooks/use-toast";
 import { format } from 'date-fns';
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from "@/components/ui/dialog";
@@ -36,6 +36,8 @@ const AdminExhibitions = () => {
   const [isAlertDialogOpen, setIsAlertDialogOpen] = useState(false);
   const [selectedExhibition, setSelectedExhibition] = useState<ExhibitionData | null>(null);
   const [exhibitionToDelete, setExhibitionToDelete] = useState<ExhibitionData | null>(null);
+  const [packExhibitionId, setPackExhibitionId] = useState<string | null>(null);
+  const [packProgress, setPackProgress] = useState<TicketPackProgress | null>(null);
   
   // Fetch all exhibitions
   const { data, isLoading, error } = useQuery({
@@ -135,6 +137,28 @@ const AdminExhibitions = () => {
     setIsAlertDialogOpen(true);
   };
 
+  const handleDownloadTickets = async (exhibition: ExhibitionData) => {
+    if (!exhibition.id) return;
+    setPackExhibitionId(exhibition.id);
+    setPackProgress(null);
+    try {
+      await downloadTicketPack(exhibition.id, setPackProgress);
+      toast({
+        title: "Tickets downloaded",
+        description: `Ticket pack for ${exhibition.title} is ready.`,
+      });
+    } catch (error) {
+      console.error("Ticket pack error:", error);
+      toast({
+        variant: "destructive",
+        title: "Error",
+        description: "Failed to download tickets. Please try again.",
+      });
+    } finally {
+      setPackExhibitionId(null);
+    }
+  };
+
   const handleConfirmDelete = () => {
     if (exhibitionToDelete?.id) {
       deleteExhibitionMutation.mutate(exhibitionToDelete.id);
@@ -155,7 +179,7 @@ const AdminExhibitions = () => {
     if (selectedExhibition?.id) {
       updateExhibitionMutation.mutate({ 
         id: selectedExhibition.id, 
-        data: formData 
+        data: { ...formData, version: selectedExhibition.version }
       });
     } else {
       createExhibitionMutation.mutate(formData);
@@ -295,6 +319,18 @@ const AdminExhibitions = () => {
                         >
                           <Pencil className="h-4 w-4" />
                         </Button>
+                        <Button
+                          variant="outline"
+                          size="sm"
+                          title="Download all tickets"
+                          disabled={packExhibitionId !== null}
+                          onClick={() => handleDownloadTickets(exhibition)}
+                        >
+                          <Download className="h-4 w-4" />
+                          {packExhibitionId === exhibition.id && packProgress && (
+                            <span className="ml-1 text-xs">{packProgress.written}/{packProgress.total}</span>
+                          )}
+                        </Button>
                         <Button 
                           variant="outline" 
                           size="sm"
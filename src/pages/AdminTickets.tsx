@@ -1,8 +1,8 @@
 
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { useQuery } from '@tanstack/react-query';
-import { isAdmin, getAllTickets, generateExhibitionTicket } from '@/services/api';
+import { useInfiniteQuery } from '@tanstack/react-query';
+import { isAdmin, getAllTickets, generateExhibitionTicket, ExhibitionTicketTotals, TicketFilters } from '@/services/api';
 import { Badge } from "@/components/ui/badge";
 import { Button } from "@/components/ui/button";
 import { Card } from "@/components/ui/card";
@@ -14,6 +14,7 @@ import {
   TableHeader,
   TableRow,
 } from "@/components/ui/table";
+import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { useToast } from "@/hooks/use-toast";
 import { format } from 'date-fns';
 
@@ -24,15 +25,16 @@ interface Ticket {
   exhibitionId: string;
   exhibitionTitle: string;
   bookingDate: string;
-  ticketCode: string;
+  ticketCode: string | null;
   slots: number;
-  status: 'active' | 'used' | 'cancelled';
+  status: 'active' | 'used' | 'cancelled' | 'pending' | 'refund_due';
 }
 
 const AdminTickets = () => {
   const navigate = useNavigate();
   const { toast } = useToast();
   const [selectedTicket, setSelectedTicket] = useState<Ticket | null>(null);
+  const [statusFilter, setStatusFilter] = useState<string>('all');
 
   // Check if user is an admin
   useEffect(() => {
@@ -41,22 +43,23 @@ const AdminTickets = () => {
     }
   }, [navigate]);
 
-  // Fetch all tickets
-  const { data, isLoading, error } = useQuery({
-    queryKey: ['tickets'],
-    queryFn: getAllTickets,
+  // Fetch tickets a page at a time
+  const { data, isLoading, error, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
+    queryKey: ['tickets', statusFilter],
+    queryFn: ({ pageParam }) => getAllTickets({
+      cursor: pageParam,
+      status: statusFilter === 'all' ? undefined : statusFilter as TicketFilters['status'],
+    }),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.nextCursor ?? undefined,
   });
 
   const handlePrintTicket = async (bookingId: string) => {
     try {
       const response = await generateExhibitionTicket(bookingId);
       
-      // Create a blob from the PDF data
-      const pdfBlob = new Blob([response.pdfData], { type: 'application/pdf' });
-      const pdfUrl = URL.createObjectURL(pdfBlob);
-      
-      // Open the PDF in a new window
-      window.open(pdfUrl, '_blank');
+      // Open the rendered PDF in a new window
+      window.open(response.ticketUrl, '_blank');
       
       toast({
         title: "Success",
@@ -87,6 +90,8 @@ const AdminTickets = () => {
         return 'bg-yellow-500';
       case 'cancelled':
         return 'bg-red-500';
+      case 'refund_due':
+        return 'bg-orange-500';
       default:
         return 'bg-gray-500';
     }
@@ -110,15 +115,46 @@ const AdminTickets = () => {
     );
   }
 
-  const tickets = data?.tickets || [];
+  const tickets: Ticket[] = data?.pages.flatMap((page) => page.tickets) || [];
+  // Later pages carry fresher totals for the exhibitions they share
+  const totals = new Map<string, ExhibitionTicketTotals>();
+  data?.pages.forEach((page) => {
+    page.exhibitions.forEach((item: ExhibitionTicketTotals) => totals.set(item.exhibitionId, item));
+  });
 
   return (
     <div className="container mx-auto py-8 px-4">
-      <h1 className="text-2xl font-bold mb-6">Exhibition Tickets</h1>
+      <div className="flex justify-between items-center mb-6">
+        <h1 className="text-2xl font-bold">Exhibition Tickets</h1>
+        <Select value={statusFilter} onValueChange={setStatusFilter}>
+          <SelectTrigger className="w-48">
+            <SelectValue placeholder="Payment status" />
+          </SelectTrigger>
+          <SelectContent>
+            <SelectItem value="all">All payments</SelectItem>
+            <SelectItem value="completed">Paid</SelectItem>
+            <SelectItem value="pending">Pending</SelectItem>
+            <SelectItem value="failed">Failed</SelectItem>
+          </SelectContent>
+        </Select>
+      </div>
+
+      {totals.size > 0 && (
+        <div className="grid gap-4 md:grid-cols-3 mb-6">
+          {Array.from(totals.values()).map((item) => (
+            <Card key={item.exhibitionId} className="p-4">
+              <p className="font-medium truncate">{item.title}</p>
+              <p className="text-sm text-gray-600">
+                {item.sold} sold · {item.remaining} of {item.totalSlots} remaining · {item.checkedIn} checked in
+              </p>
+            </Card>
+          ))}
+        </div>
+      )}
       
       <div className="grid gap-6 md:grid-cols-[1fr_1fr]">
         <Card className="p-4">
-          <h2 className="text-xl font-semibold mb-4">All Tickets ({tickets.length})</h2>
+          <h2 className="text-xl font-semibold mb-4">Tickets ({tickets.length}{hasNextPage ? '+' : ''})</h2>
           
           {tickets.length === 0 ? (
             <p className="text-gray-500">No tickets to display</p>
@@ -168,6 +204,13 @@ const AdminTickets = () => {
                   ))}
                 </TableBody>
               </Table>
+              {hasNextPage && (
+                <div className="text-center mt-4">
+                  <Button variant="outline" disabled={isFetchingNextPage} onClick={() => fetchNextPage()}>
+                    {isFetchingNextPage ? 'Loading...' : 'Load more'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </Card>
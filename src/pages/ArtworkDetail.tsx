@@ -8,7 +8,7 @@ import { useAuth } from '@/contexts/AuthContext';
 import { useToast } from '@/hooks/use-toast';
 import ArtworkCard from '@/components/ArtworkCard';
 import { Artwork } from '@/types';
-import { getArtwork, getAllArtworks } from '@/services/api';
+import { getArtwork, getAllArtworks, getSimilarArtworks, recordEvent } from '@/services/api';
 import { Ban } from 'lucide-react';
 import { getValidImageUrl, handleImageError } from '@/utils/imageUtils';
 
@@ -30,14 +30,18 @@ const ArtworkDetail = () => {
         setLoading(true);
         const data = await getArtwork(id);
         setArtwork(data);
+        recordEvent('artwork', id);
         
-        // Fetch all artworks to get related ones by the same artist
-        const allArtworks = await getAllArtworks();
-        const related = allArtworks
-          .filter((a: Artwork) => a.id !== id && a.artist === data.artist)
-          .slice(0, 3);
-        
-        setRelatedArtworks(related);
+        try {
+          setRelatedArtworks(await getSimilarArtworks(id, 3));
+        } catch {
+          // Recommendations unavailable: fall back to other works by the same artist
+          const allArtworks = await getAllArtworks();
+          const related = allArtworks
+            .filter((a: Artwork) => a.id !== id && a.artist === data.artist)
+            .slice(0, 3);
+          setRelatedArtworks(related);
+        }
       } catch (error) {
         console.error('Failed to fetch artwork:', error);
         toast({
@@ -183,7 +187,7 @@ const ArtworkDetail = () => {
         {relatedArtworks.length > 0 && (
           <div className="mt-16">
             <h2 className="text-2xl font-serif font-bold mb-8">
-              More by {artwork.artist}
+              You may also like
             </h2>
             <div className="artwork-grid">
               {relatedArtworks.map((relatedArtwork) => (
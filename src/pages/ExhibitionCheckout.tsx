@@ -7,9 +7,11 @@ import { Label } from '@/components/ui/label';
 import { formatPrice } from '@/utils/formatters';
 import { useAuth } from '@/contexts/AuthContext';
 import { useToast } from '@/hooks/use-toast';
-import { getExhibition } from '@/services/api';
+import { Calendar } from '@/components/ui/calendar';
+import { getExhibition, getSlotCalendar, getTimeSlots, bookTimeSlot, SlotCalendarDay, TimeSlot } from '@/services/api';
 import { Exhibition } from '@/types';
 import { Check } from 'lucide-react';
+import { format } from 'date-fns';
 
 const ExhibitionCheckout = () => {
   const { id } = useParams<{ id: string }>();
@@ -28,6 +30,13 @@ const ExhibitionCheckout = () => {
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [loading, setLoading] = useState(true);
   const [currentStep, setCurrentStep] = useState<1 | 2>(1);
+  // Timed entry: shown once the exhibition turns out to have slots
+  const [timedEntry, setTimedEntry] = useState(false);
+  const [calendarMonth, setCalendarMonth] = useState<Date>(new Date());
+  const [calendarDays, setCalendarDays] = useState<Record<string, SlotCalendarDay>>({});
+  const [selectedDate, setSelectedDate] = useState<Date | undefined>();
+  const [daySlots, setDaySlots] = useState<TimeSlot[]>([]);
+  const [selectedSlot, setSelectedSlot] = useState<TimeSlot | null>(null);
 
   useEffect(() => {
     const fetchExhibition = async () => {
@@ -37,6 +46,8 @@ const ExhibitionCheckout = () => {
         setLoading(true);
         const data = await getExhibition(id);
         setExhibition(data);
+        const start = new Date(data.startDate);
+        if (start > new Date()) setCalendarMonth(start);
       } catch (error) {
         console.error('Failed to fetch exhibition:', error);
         toast({
@@ -52,6 +63,31 @@ const ExhibitionCheckout = () => {
     fetchExhibition();
   }, [id, toast]);
 
+  // One request per month shown: which days have slots and whether they are sold out
+  useEffect(() => {
+    if (!id || !exhibition) return;
+    getSlotCalendar(id, format(calendarMonth, 'yyyy-MM'))
+      .then(({ days }) => {
+        setCalendarDays(Object.fromEntries(days.map((day) => [day.date, day])));
+        if (days.length > 0) setTimedEntry(true);
+      })
+      .catch((error) => console.error('Failed to load slot calendar:', error));
+  }, [id, exhibition, calendarMonth]);
+
+  useEffect(() => {
+    setSelectedSlot(null);
+    setDaySlots([]);
+    if (!id || !selectedDate) return;
+    getTimeSlots(id, format(selectedDate, 'yyyy-MM-dd'))
+      .then(({ slots }) => setDaySlots(slots))
+      .catch((error) => console.error('Failed to load time slots:', error));
+  }, [id, selectedDate]);
+
+  const isDayUnavailable = (day: Date) => {
+    const entry = calendarDays[format(day, 'yyyy-MM-dd')];
+    return !entry || entry.available < slots;
+  };
+
   const handleInputChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     const { name, value } = e.target;
     setFormData(prev => ({
@@ -70,15 +106,44 @@ const ExhibitionCheckout = () => {
       });
       return;
     }
+    if (timedEntry && !selectedSlot) {
+      toast({
+        title: "Time Required",
+        description: "Please choose a date and entry time.",
+        variant: "destructive",
+      });
+      return;
+    }
     setCurrentStep(2);
   };
 
-  const handleSubmit = (e: React.FormEvent) => {
+  const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     setIsSubmitting(true);
+
+    // A timed-entry booking holds its places now, before payment
+    let booking: { bookingId: string; date: string; startTime: string } | null = null;
+    if (id && selectedSlot) {
+      try {
+        booking = await bookTimeSlot(id, selectedSlot.id, { ...formData, slots });
+      } catch (error) {
+        console.error('Failed to book time slot:', error);
+        toast({
+          title: "Time Unavailable",
+          description: "That entry time no longer has enough places. Please choose another.",
+          variant: "destructive",
+        });
+        setIsSubmitting(false);
+        setCurrentStep(1);
+        setSelectedDate(selectedDate ? new Date(selectedDate) : undefined);
+        return;
+      }
+    }
     
     // Store order details in localStorage for the payment page
     const orderDetails = {
+      bookingId: booking?.bookingId,
+      entryTime: booking ? `${booking.date} ${booking.startTime}` : undefined,
       type: 'exhibition',
       itemId: exhibition?.id,
       title: exhibition?.title,
@@ -218,6 +283,37 @@ const ExhibitionCheckout = () => {
                         <p className="text-sm text-gray-500 mt-1">Required for ticket confirmation</p>
                       </div>
                       
+                      {timedEntry && (
+                        <div>
+                          <Label>Date and Entry Time*</Label>
+                          <Calendar
+                            mode="single"
+                            selected={selectedDate}
+                            onSelect={setSelectedDate}
+                            month={calendarMonth}
+                            onMonthChange={setCalendarMonth}
+                            disabled={isDayUnavailable}
+                            className="rounded-md border mt-2 w-fit"
+                          />
+                          {selectedDate && (
+                            <div className="grid grid-cols-3 gap-2 mt-3">
+                              {daySlots.map((slot) => (
+                                <Button
+                                  key={slot.id}
+                                  type="button"
+                                  variant={selectedSlot?.id === slot.id ? 'default' : 'outline'}
+                                  disabled={slot.available < slots}
+                                  onClick={() => setSelectedSlot(slot)}
+                                >
+                                  {slot.startTime}
+                                  <span className="ml-1 text-xs opacity-70">({slot.available} left)</span>
+                                </Button>
+                              ))}
+                            </div>
+                          )}
+                        </div>
+                      )}
+                      
                       <div className="pt-4">
                         <Button 
                           type="submit" 
@@ -242,6 +338,12 @@ const ExhibitionCheckout = () => {
                           <div>{formData.phone}</div>
                           <div className="text-gray-600">Tickets:</div>
                           <div>{slots}</div>
+                          {selectedDate && selectedSlot && (
+                            <>
+                              <div className="text-gray-600">Entry:</div>
+                              <div>{format(selectedDate, 'PPP')} at {selectedSlot.startTime}</div>
+                            </>
+                          )}
                           <div className="text-gray-600">Total Amount:</div>
                           <div className="font-semibold">{formatPrice(totalAmount)}</div>
                         </div>
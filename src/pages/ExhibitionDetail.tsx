@@ -11,17 +11,41 @@ import ExhibitionCard from '@/components/ExhibitionCard';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Exhibition } from '@/types';
-import { getExhibition, getAllExhibitions } from '@/services/api';
+import {
+  getExhibition, getAllExhibitions, recordEvent,
+  joinWaitlist, getWaitlistEntry, leaveWaitlist, claimWaitlistOffer, WaitlistEntry
+} from '@/services/api';
 
 const ExhibitionDetail = () => {
   const { id } = useParams<{ id: string }>();
   const navigate = useNavigate();
-  const { isAuthenticated } = useAuth();
+  const { isAuthenticated, currentUser } = useAuth();
   const { toast } = useToast();
   const [slots, setSlots] = useState(1);
   const [exhibition, setExhibition] = useState<Exhibition | null>(null);
   const [relatedExhibitions, setRelatedExhibitions] = useState<Exhibition[]>([]);
   const [loading, setLoading] = useState(true);
+  const [waitlistEntry, setWaitlistEntry] = useState<WaitlistEntry | null>(null);
+  const waitlistKey = `waitlist:${id}`;
+
+  // Follow a waitlist entry joined earlier until it is offered places or ends
+  useEffect(() => {
+    const entryId = localStorage.getItem(waitlistKey);
+    if (!entryId || !isAuthenticated) return;
+    const refresh = () => getWaitlistEntry(entryId)
+      .then((entry) => {
+        if (entry.status === 'waiting' || entry.status === 'offered') {
+          setWaitlistEntry(entry);
+        } else {
+          localStorage.removeItem(waitlistKey);
+          setWaitlistEntry(null);
+        }
+      })
+      .catch((error) => console.error('Failed to fetch waitlist entry:', error));
+    refresh();
+    const interval = window.setInterval(refresh, 30000);
+    return () => window.clearInterval(interval);
+  }, [waitlistKey, isAuthenticated]);
 
   useEffect(() => {
     const fetchExhibition = async () => {
@@ -31,6 +55,7 @@ const ExhibitionDetail = () => {
         setLoading(true);
         const data = await getExhibition(id);
         setExhibition(data);
+        recordEvent('exhibition', id);
         
         // Fetch all exhibitions to get related ones
         const allExhibitions = await getAllExhibitions();
@@ -77,6 +102,72 @@ const ExhibitionDetail = () => {
     navigate(`/checkout/exhibition/${id}?slots=${slots}`);
   };
 
+  const handleJoinWaitlist = async () => {
+    if (!isAuthenticated || !id) {
+      navigate('/login');
+      return;
+    }
+    try {
+      const entry = await joinWaitlist(id, slots);
+      localStorage.setItem(waitlistKey, entry.id);
+      setWaitlistEntry({ ...entry, position: null, bookingId: null, offer: null });
+      toast({
+        title: "You're on the waitlist",
+        description: "We'll hold tickets for you here as soon as places free up.",
+      });
+    } catch (error) {
+      toast({
+        title: "Error",
+        description: error instanceof Error ? error.message : "Failed to join the waitlist.",
+        variant: "destructive",
+      });
+    }
+  };
+
+  const handleLeaveWaitlist = async () => {
+    if (!waitlistEntry) return;
+    try {
+      await leaveWaitlist(waitlistEntry.id);
+    } catch (error) {
+      console.error('Failed to leave waitlist:', error);
+    }
+    localStorage.removeItem(waitlistKey);
+    setWaitlistEntry(null);
+  };
+
+  // Claiming creates the booking; payment then works as for any booking
+  const handleClaimOffer = async () => {
+    if (!waitlistEntry?.offer || !exhibition || !currentUser) return;
+    try {
+      const booking = await claimWaitlistOffer(waitlistEntry.id, {
+        name: currentUser.name,
+        email: currentUser.email,
+        phone: currentUser.phone || '',
+      });
+      localStorage.removeItem(waitlistKey);
+      localStorage.setItem('pendingOrder', JSON.stringify({
+        type: 'exhibition',
+        itemId: exhibition.id,
+        bookingId: booking.bookingId,
+        entryTime: `${booking.date} ${booking.startTime}`,
+        title: exhibition.title,
+        slots: booking.slots,
+        pricePerSlot: exhibition.ticketPrice,
+        totalAmount: booking.totalAmount,
+        name: currentUser.name,
+        email: currentUser.email,
+        phone: currentUser.phone,
+      }));
+      navigate('/payment');
+    } catch (error) {
+      toast({
+        title: "Offer unavailable",
+        description: error instanceof Error ? error.message : "This offer can no longer be claimed.",
+        variant: "destructive",
+      });
+    }
+  };
+
   if (loading) {
     return (
       <div className="py-16 px-4 text-center">
@@ -176,6 +267,47 @@ const ExhibitionDetail = () => {
                   </div>
                 )}
                 
+                {isSoldOut && !isPast && !waitlistEntry && (
+                  <div className="space-y-2">
+                    <Label htmlFor="waitlist-slots">Tickets wanted</Label>
+                    <Input
+                      id="waitlist-slots"
+                      type="number"
+                      min={1}
+                      value={slots}
+                      onChange={(e) => setSlots(parseInt(e.target.value) || 1)}
+                    />
+                    <Button variant="outline" className="w-full" onClick={handleJoinWaitlist}>
+                      Join Waitlist
+                    </Button>
+                  </div>
+                )}
+
+                {waitlistEntry && (
+                  <div className="bg-secondary rounded-lg p-4 space-y-3">
+                    {waitlistEntry.status === 'offered' && waitlistEntry.offer ? (
+                      <>
+                        <p className="font-medium">
+                          {waitlistEntry.slots} ticket(s) are held for you on {waitlistEntry.offer.date} at {waitlistEntry.offer.startTime}.
+                        </p>
+                        <p className="text-sm text-gray-600">
+                          Claim them before {new Date(waitlistEntry.offer.expiresAt).toLocaleTimeString()}.
+                        </p>
+                        <Button className="w-full bg-gold hover:bg-gold-dark text-white" onClick={handleClaimOffer}>
+                          Claim Tickets
+                        </Button>
+                      </>
+                    ) : (
+                      <p className="font-medium">
+                        You're on the waitlist{waitlistEntry.position ? ` (number ${waitlistEntry.position} in line)` : ''}.
+                      </p>
+                    )}
+                    <Button variant="ghost" size="sm" onClick={handleLeaveWaitlist}>
+                      Leave waitlist
+                    </Button>
+                  </div>
+                )}
+                
                 <Button 
                   onClick={handleBookNow}
                   className={`w-full py-6 text-lg ${
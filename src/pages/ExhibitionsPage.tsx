@@ -6,7 +6,7 @@ import { Label } from '@/components/ui/label';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Search } from 'lucide-react';
 import { Exhibition } from '@/types';
-import { getAllExhibitions } from '@/services/api';
+import { getAllExhibitions, ExhibitionFilters } from '@/services/api';
 import { useToast } from '@/hooks/use-toast';
 
 const ExhibitionsPage = () => {
@@ -20,7 +20,9 @@ const ExhibitionsPage = () => {
     const fetchExhibitions = async () => {
       try {
         setLoading(true);
-        const data = await getAllExhibitions();
+        // The server picks the exhibitions with this status as of today
+        const status = statusFilter === 'all' ? undefined : statusFilter as ExhibitionFilters['status'];
+        const data = await getAllExhibitions(undefined, { status });
         setExhibitions(data);
       } catch (error) {
         console.error('Failed to fetch exhibitions:', error);
@@ -35,18 +37,15 @@ const ExhibitionsPage = () => {
     };
     
     fetchExhibitions();
-  }, [toast]);
+  }, [toast, statusFilter]);
 
-  // Filter exhibitions based on search term and status filter
+  // Filter exhibitions based on search term
   const filteredExhibitions = exhibitions.filter((exhibition) => {
-    const matchesSearch = 
+    return (
       exhibition.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
       exhibition.location.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      exhibition.description.toLowerCase().includes(searchTerm.toLowerCase());
-    
-    const matchesStatus = statusFilter === 'all' || exhibition.status === statusFilter;
-    
-    return matchesSearch && matchesStatus;
+      exhibition.description.toLowerCase().includes(searchTerm.toLowerCase())
+    );
   });
 
   return (
@@ -26,7 +26,7 @@ const Home = () => {
       try {
         setLoading(true);
         const artworksData = await getAllArtworks();
-        const exhibitionsData = await getAllExhibitions();
+        const exhibitionsData = await getAllExhibitions(undefined, { status: 'upcoming' });
         
         // Get first 3 artworks
         setFeaturedArtworks(artworksData.slice(0, 3));
@@ -20,6 +20,8 @@ type PendingOrder = {
   phone?: string;
   deliveryAddress?: string;
   slots?: number;
+  bookingId?: string;
+  entryTime?: string;
   pricePerSlot?: number;
   price?: number;
   deliveryFee?: number;
@@ -199,7 +201,7 @@ const Payment = () => {
         phoneNumber,
         order.totalAmount,
         order.type,
-        order.itemId,
+        order.bookingId || order.itemId,
         accountReference
       );
       
@@ -285,6 +287,13 @@ const Payment = () => {
                     </div>
                   )}
                   
+                  {order.entryTime && (
+                    <div className="flex justify-between mb-1">
+                      <span>Entry:</span>
+                      <span>{order.entryTime}</span>
+                    </div>
+                  )}
+                  
                   <div className="flex justify-between font-bold text-lg mt-2">
                     <span>Total:</span>
                     <span>{formatPrice(order.totalAmount)}</span>
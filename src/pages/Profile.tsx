@@ -7,7 +7,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { useNavigate } from 'react-router-dom';
 import { formatPrice, formatDate } from '@/utils/formatters';
 import { CalendarIcon, MapPinIcon, UserIcon, PhoneIcon, MailIcon, Loader2 } from 'lucide-react';
-import { getUserOrders, generateExhibitionTicket } from '@/utils/mpesa';
+import { getUserOrders, generateExhibitionTicket } from '@/services/api';
 import { useToast } from '@/hooks/use-toast';
 
 type UserOrder = {
@@ -42,6 +42,8 @@ const Profile = () => {
   const [orders, setOrders] = useState<UserOrder[]>([]);
   const [bookings, setBookings] = useState<UserBooking[]>([]);
   const [loading, setLoading] = useState(false);
+  const [nextCursors, setNextCursors] = useState<{ orders?: string; bookings?: string }>({});
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     if (currentUser) {
@@ -68,6 +70,11 @@ const Profile = () => {
       if (response.bookings) {
         setBookings(response.bookings);
       }
+
+      setNextCursors({
+        orders: response.nextOrdersCursor || undefined,
+        bookings: response.nextBookingsCursor || undefined,
+      });
     } catch (error) {
       console.error('Error fetching user orders:', error);
       toast({
@@ -80,6 +87,32 @@ const Profile = () => {
     }
   };
 
+  const loadMore = async (list: 'orders' | 'bookings') => {
+    const cursor = nextCursors[list];
+    if (!currentUser.id || !cursor) return;
+
+    setLoadingMore(true);
+    try {
+      const response = await getUserOrders(currentUser.id, { [list]: cursor });
+      if (list === 'orders') {
+        setOrders((current) => [...current, ...(response.orders || [])]);
+        setNextCursors((current) => ({ ...current, orders: response.nextOrdersCursor || undefined }));
+      } else {
+        setBookings((current) => [...current, ...(response.bookings || [])]);
+        setNextCursors((current) => ({ ...current, bookings: response.nextBookingsCursor || undefined }));
+      }
+    } catch (error) {
+      console.error(`Error loading more ${list}:`, error);
+      toast({
+        title: "Error",
+        description: `Failed to load more ${list}`,
+        variant: "destructive"
+      });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleLogout = () => {
     logout();
     navigate('/');
@@ -226,6 +259,13 @@ const Profile = () => {
                     </CardContent>
                   </Card>
                 ))}
+                {nextCursors.bookings && (
+                  <div className="text-center">
+                    <Button variant="outline" disabled={loadingMore} onClick={() => loadMore('bookings')}>
+                      {loadingMore ? 'Loading...' : 'Load more'}
+                    </Button>
+                  </div>
+                )}
               </div>
             ) : (
               <div className="text-center py-10">
@@ -291,6 +331,13 @@ const Profile = () => {
                     </CardContent>
                   </Card>
                 ))}
+                {nextCursors.orders && (
+                  <div className="text-center">
+                    <Button variant="outline" disabled={loadingMore} onClick={() => loadMore('orders')}>
+                      {loadingMore ? 'Loading...' : 'Load more'}
+                    </Button>
+                  </div>
+                )}
               </div>
             ) : (
               <div className="text-center py-10">
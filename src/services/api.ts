@@ -38,6 +38,7 @@ export interface ArtworkData {
   medium?: string;
   year?: number;
   status: 'available' | 'sold';
+  version?: number;
 }
 
 // Interface for exhibition data
@@ -53,6 +54,7 @@ export interface ExhibitionData {
   totalSlots: number;
   availableSlots: number;
   status: 'upcoming' | 'ongoing' | 'past';
+  version?: number;
 }
 
 // Interface for contact message
@@ -297,15 +299,30 @@ export const createArtwork = async (artworkData: ArtworkData) => {
   });
 };
 
-// Update existing artwork (admin only)
+// If-Match header for a write based on the given version ('*' when unknown)
+const ifMatch = (version?: number) => ({
+  'If-Match': version !== undefined ? `"${version}"` : '*',
+});
+
+// Update existing artwork (admin only); fails with 412 if it changed since it was loaded
 export const updateArtwork = async (id: string, artworkData: ArtworkData) => {
   console.log(`Updating artwork ${id} with data:`, artworkData);
   return await authFetch(`/api/artworks/${id}`, {
     method: 'PUT',
+    headers: ifMatch(artworkData.version),
     body: JSON.stringify(artworkData),
   });
 };
 
+// Update only the given fields of an artwork; resolves with the fields that changed (admin only)
+export const patchArtwork = async (id: string, changes: Partial<ArtworkData>, version?: number) => {
+  return await authFetch(`/api/artworks/${id}`, {
+    method: 'PATCH',
+    headers: ifMatch(version),
+    body: JSON.stringify(changes),
+  });
+};
+
 // Delete artwork (admin only)
 export const deleteArtwork = async (id: string) => {
   console.log(`Deleting artwork ${id}`);
@@ -323,15 +340,25 @@ export const createExhibition = async (exhibitionData: ExhibitionData) => {
   });
 };
 
-// Update existing exhibition (admin only)
+// Update existing exhibition (admin only); fails with 412 if it changed since it was loaded
 export const updateExhibition = async (id: string, exhibitionData: ExhibitionData) => {
   console.log(`Updating exhibition ${id} with data:`, exhibitionData);
   return await authFetch(`/api/exhibitions/${id}`, {
     method: 'PUT',
+    headers: ifMatch(exhibitionData.version),
     body: JSON.stringify(exhibitionData),
   });
 };
 
+// Update only the given fields of an exhibition; resolves with the fields that changed (admin only)
+export const patchExhibition = async (id: string, changes: Partial<ExhibitionData>, version?: number) => {
+  return await authFetch(`/api/exhibitions/${id}`, {
+    method: 'PATCH',
+    headers: ifMatch(version),
+    body: JSON.stringify(changes),
+  });
+};
+
 // Delete exhibition (admin only)
 export const deleteExhibition = async (id: string) => {
   console.log(`Deleting exhibition ${id}`);
@@ -340,10 +367,53 @@ export const deleteExhibition = async (id: string) => {
   });
 };
 
-// Get all artworks
-export const getAllArtworks = async () => {
+export interface BulkOperation {
+  op: 'create' | 'update' | 'delete' | 'status';
+  id?: string;
+  data?: Partial<ArtworkData> | Partial<ExhibitionData>;
+  status?: string;
+}
+
+// Apply many artwork or exhibition changes in one request (admin only)
+export const bulkUpdate = async (
+  kind: 'artworks' | 'exhibitions',
+  operations: BulkOperation[],
+  atomic = false
+) => {
+  return await authFetch(`/api/${kind}/bulk`, {
+    method: 'POST',
+    body: JSON.stringify({ operations, atomic }),
+  });
+};
+
+export interface SalesCounters {
+  attempts: number;
+  completed: number;
+  failed: number;
+  units: number;
+  revenue: number;
+  conversion: number | null;
+}
+
+export interface SalesAnalytics {
+  days: number;
+  since: string;
+  totals: Record<'artwork' | 'exhibition', SalesCounters>;
+  window: Record<'artwork' | 'exhibition', SalesCounters>;
+  daily: (SalesCounters & { date: string; orderType: 'artwork' | 'exhibition' })[];
+  topArtists: (SalesCounters & { artist: string })[];
+  topExhibitions: (SalesCounters & { exhibitionId: string; title: string | null })[];
+}
+
+// Revenue, sales and conversion for the admin dashboard (admin only)
+export const getSalesAnalytics = async (days = 30): Promise<SalesAnalytics> => {
+  return await authFetch(`/api/admin/analytics?days=${days}`);
+};
+
+// Get all artworks, newest first or (sort = 'popular') most viewed recently
+export const getAllArtworks = async (sort?: 'popular') => {
   try {
-    const response = await fetch(`${API_URL}/api/artworks`);
+    const response = await fetch(`${API_URL}/api/artworks${sort ? `?sort=${sort}` : ''}`);
     if (!response.ok) {
       throw new Error('Failed to fetch artworks');
     }
@@ -369,10 +439,38 @@ export const getArtwork = async (id: string) => {
   }
 };
 
-// Get all exhibitions
-export const getAllExhibitions = async () => {
+// Get artworks similar to the given one
+export const getSimilarArtworks = async (id: string, limit = 3) => {
   try {
-    const response = await fetch(`${API_URL}/api/exhibitions`);
+    const response = await fetch(`${API_URL}/api/artworks/${id}/similar?limit=${limit}`);
+    if (!response.ok) {
+      throw new Error('Failed to fetch similar artworks');
+    }
+    const data = await response.json();
+    return data.similar || [];
+  } catch (error) {
+    console.error('Error fetching similar artworks:', error);
+    throw error;
+  }
+};
+
+// Get all exhibitions, in catalogue order or (sort = 'popular') most viewed recently
+export interface ExhibitionFilters {
+  status?: 'upcoming' | 'ongoing' | 'past';
+  from?: string;
+  to?: string;
+}
+
+// Get exhibitions; status is worked out from today's date, from/to (YYYY-MM-DD) keep those running in the range
+export const getAllExhibitions = async (sort?: 'popular', filters: ExhibitionFilters = {}) => {
+  try {
+    const params = new URLSearchParams();
+    if (sort) params.set('sort', sort);
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value) params.set(key, value);
+    });
+    const query = params.toString();
+    const response = await fetch(`${API_URL}/api/exhibitions${query ? `?${query}` : ''}`);
     if (!response.ok) {
       throw new Error('Failed to fetch exhibitions');
     }
@@ -398,6 +496,140 @@ export const getExhibition = async (id: string) => {
   }
 };
 
+export interface TimeSlot {
+  id: string;
+  startTime: string;
+  capacity: number;
+  available: number;
+}
+
+export interface SlotCalendarDay {
+  date: string;
+  slots: number;
+  capacity: number;
+  available: number;
+  soldOut: boolean;
+}
+
+// Timed-entry slots of an exhibition on one day (date is YYYY-MM-DD)
+export const getTimeSlots = async (exhibitionId: string, date: string): Promise<{ slots: TimeSlot[] }> => {
+  const response = await fetch(`${API_URL}/api/exhibitions/${exhibitionId}/time-slots?date=${date}`);
+  if (!response.ok) {
+    throw new Error('Failed to fetch time slots');
+  }
+  return await response.json();
+};
+
+// Slot availability for every day of a month that has slots (month is YYYY-MM)
+export const getSlotCalendar = async (exhibitionId: string, month: string): Promise<{ days: SlotCalendarDay[] }> => {
+  const response = await fetch(`${API_URL}/api/exhibitions/${exhibitionId}/time-slots/calendar?month=${month}`);
+  if (!response.ok) {
+    throw new Error('Failed to fetch slot calendar');
+  }
+  return await response.json();
+};
+
+// Hold places in a slot; returns the pending booking to pay for
+export const bookTimeSlot = async (
+  exhibitionId: string,
+  slotId: string,
+  booking: { name: string; email: string; phone: string; slots: number }
+) => {
+  return await authFetch(`/api/exhibitions/${exhibitionId}/time-slots/${slotId}/bookings`, {
+    method: 'POST',
+    body: JSON.stringify(booking),
+  });
+};
+
+export interface WaitlistEntry {
+  id: string;
+  exhibitionId: string;
+  slots: number;
+  status: 'waiting' | 'offered' | 'claimed' | 'expired' | 'cancelled';
+  position: number | null;
+  bookingId: string | null;
+  offer: { timeSlotId: string; date: string; startTime: string; expiresAt: string } | null;
+}
+
+// Join a sold-out exhibition's waitlist; date (YYYY-MM-DD) limits offers to that day
+export const joinWaitlist = async (exhibitionId: string, slots: number, date?: string): Promise<WaitlistEntry> => {
+  return await authFetch(`/api/exhibitions/${exhibitionId}/waitlist`, {
+    method: 'POST',
+    body: JSON.stringify({ slots, date }),
+  });
+};
+
+export const getWaitlistEntry = async (entryId: string): Promise<WaitlistEntry> => {
+  return await authFetch(`/api/waitlist/${entryId}`);
+};
+
+export const leaveWaitlist = async (entryId: string) => {
+  return await authFetch(`/api/waitlist/${entryId}`, { method: 'DELETE' });
+};
+
+// Turn an offer into a pending booking to pay for
+export const claimWaitlistOffer = async (
+  entryId: string,
+  details: { name: string; email: string; phone: string }
+) => {
+  return await authFetch(`/api/waitlist/${entryId}/claim`, {
+    method: 'POST',
+    body: JSON.stringify(details),
+  });
+};
+
+// Search artworks and exhibitions
+export const searchCatalogue = async (
+  query: string,
+  type: 'all' | 'artworks' | 'exhibitions' = 'all',
+  limit = 20
+) => {
+  try {
+    const params = new URLSearchParams({ q: query, type, limit: String(limit) });
+    const response = await fetch(`${API_URL}/api/search?${params}`);
+    if (!response.ok) {
+      throw new Error('Failed to search catalogue');
+    }
+    const data = await response.json();
+    return data.results || [];
+  } catch (error) {
+    console.error('Error searching catalogue:', error);
+    throw error;
+  }
+};
+
+export interface Suggestion {
+  value: string;
+  field: 'title' | 'artist' | 'medium' | 'location';
+  count: number;
+}
+
+// As-you-type suggestions for the search box
+export const getSuggestions = async (prefix: string, limit = 8): Promise<Suggestion[]> => {
+  try {
+    const params = new URLSearchParams({ q: prefix, limit: String(limit) });
+    const response = await fetch(`${API_URL}/api/autocomplete?${params}`);
+    if (!response.ok) {
+      throw new Error('Failed to fetch suggestions');
+    }
+    const data = await response.json();
+    return data.suggestions || [];
+  } catch (error) {
+    console.error('Error fetching suggestions:', error);
+    throw error;
+  }
+};
+
+// Record a page view or click for popularity ranking; failures are ignored
+export const recordEvent = (kind: 'artwork' | 'exhibition', id: string, event: 'view' | 'click' = 'view') => {
+  fetch(`${API_URL}/api/events`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ kind, id, event }),
+    keepalive: true,
+  }).catch(() => undefined);
+};
+
 // Submit a contact message
 export const submitContactMessage = async (messageData: ContactMessage) => {
   try {
@@ -451,29 +683,159 @@ export const bookExhibition = async (bookingData: any) => {
 };
 
 // Get all tickets (admin only)
-export const getAllTickets = async () => {
-  return await authFetch('/tickets');
+export interface TicketFilters {
+  exhibitionId?: string;
+  status?: 'pending' | 'completed' | 'failed';
+  from?: string;
+  to?: string;
+  cursor?: string;
+}
+
+export interface ExhibitionTicketTotals {
+  exhibitionId: string;
+  title: string;
+  totalSlots: number;
+  sold: number;
+  remaining: number;
+  paidBookings: number;
+  revenue: number;
+  checkedIn: number;
+}
+
+// Get a page of tickets, newest first; pass nextCursor back as cursor for the next page
+export const getAllTickets = async (filters: TicketFilters = {}) => {
+  const params = new URLSearchParams();
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value) params.set(key, value);
+  });
+  const query = params.toString();
+  return await authFetch(`/tickets${query ? `?${query}` : ''}`);
 };
 
-// Generate exhibition ticket
+// Generate exhibition ticket; ticketUrl points at the cached PDF
 export const generateExhibitionTicket = async (bookingId: string) => {
   try {
-    return await authFetch(`/tickets/generate/${bookingId}`);
+    const response = await authFetch(`/tickets/generate/${bookingId}`);
+    return { ...response, ticketUrl: `${API_URL}${response.ticketUrl}` };
   } catch (error) {
     console.error('Ticket generation error:', error);
     throw error;
   }
 };
 
+export interface TicketPackProgress {
+  packId: string;
+  exhibitionId: number;
+  total: number;
+  written: number;
+  cached: number;
+  rendered: number;
+  failed: number;
+  status: 'running' | 'finished' | 'aborted';
+}
+
+// Download every paid ticket of an exhibition as one ZIP, reporting progress while it streams
+export const downloadTicketPack = async (
+  exhibitionId: string,
+  onProgress?: (progress: TicketPackProgress) => void
+): Promise<void> => {
+  const token = getToken();
+  if (!token) {
+    throw new Error('No authentication token found');
+  }
+
+  const response = await fetch(`${API_URL}/api/admin/exhibitions/${exhibitionId}/tickets.zip`, {
+    headers: { 'Authorization': `Bearer ${token}` },
+  });
+  if (!response.ok) {
+    throw new Error(`Ticket pack download failed (${response.status})`);
+  }
+
+  const packId = response.headers.get('X-Pack-Id');
+  const reportProgress = () => {
+    if (packId && onProgress) {
+      authFetch(`/api/admin/ticket-packs/${packId}`)
+        .then(onProgress)
+        .catch((error) => console.error('Ticket pack progress error:', error));
+    }
+  };
+  const timer = setInterval(reportProgress, 1000);
+  let blob: Blob;
+  try {
+    blob = await response.blob();
+  } finally {
+    clearInterval(timer);
+  }
+  reportProgress();
+
+  const url = URL.createObjectURL(blob);
+  const link = document.createElement('a');
+  link.href = url;
+  link.download = `tickets-exhibition-${exhibitionId}.zip`;
+  link.click();
+  URL.revokeObjectURL(url);
+};
+
+export interface CheckInResult {
+  status: 'admitted' | 'already_checked_in';
+  bookingId: number;
+  exhibitionId?: number;
+  slots: number;
+  checkedInAt?: string;
+}
+
+// Admit a scanned ticket at the door
+export const checkInTicket = async (code: string, exhibitionId?: string): Promise<CheckInResult> => {
+  return await authFetch('/api/tickets/check-in', {
+    method: 'POST',
+    body: JSON.stringify({ code, exhibitionId: exhibitionId ? Number(exhibitionId) : undefined }),
+  });
+};
+
+// Signing key and used tickets for scanning an exhibition's tickets offline
+export const getCheckInManifest = async (exhibitionId: string) => {
+  return await authFetch(`/api/admin/exhibitions/${exhibitionId}/checkin-manifest`);
+};
+
+// Upload scans made offline; scannedAt is in unix seconds
+export const syncCheckIns = async (
+  exhibitionId: string,
+  scans: { code: string; scannedAt: number }[]
+) => {
+  return await authFetch('/api/tickets/check-in/sync', {
+    method: 'POST',
+    body: JSON.stringify({ exhibitionId: Number(exhibitionId), scans }),
+  });
+};
+
 // Get user tickets
 export const getUserTickets = async (userId: string) => {
   return await authFetch(`/tickets/user/${userId}`);
 };
 
-// Get user orders
-export const getUserOrders = async (userId: string) => {
+export interface UserOrdersPage {
+  orders?: any[];
+  bookings?: any[];
+  nextOrdersCursor?: string | null;
+  nextBookingsCursor?: string | null;
+}
+
+// Get user orders and bookings, newest first; pass a cursor to load the next page of that list
+export const getUserOrders = async (
+  userId: string,
+  cursors: { orders?: string; bookings?: string } = {}
+): Promise<UserOrdersPage> => {
   try {
-    return await authFetch(`/orders/user/${userId}`);
+    const params = new URLSearchParams();
+    if (cursors.orders) {
+      params.set('type', 'orders');
+      params.set('ordersCursor', cursors.orders);
+    } else if (cursors.bookings) {
+      params.set('type', 'bookings');
+      params.set('bookingsCursor', cursors.bookings);
+    }
+    const query = params.toString();
+    return await authFetch(`/orders/user/${userId}${query ? `?${query}` : ''}`);
   } catch (error) {
     console.error('Get user orders error:', error);
     throw error;